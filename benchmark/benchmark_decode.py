@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Decodes a synthetic capture file (1 Hz stream with some garbage bytes) with the pure Python and the NumPy decoder.
+
+    python -m benchmark.benchmark_decode [frames]
+"""
+
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+
+from src.sds011 import capture
+from src.sds011.capture import MAGIC, RECORD_HEADER, RX
+
+DEFAULT_FRAMES = 2_592_000  # 30 days at 1 Hz
+GARBAGE_EVERY_N_FRAMES = 1000
+
+
+def write_capture(path, frame_count):
+    random.seed(0)
+    with open(path, "wb") as file:  # like `CaptureWriter`, but without the real time stamps
+        file.write(MAGIC)
+        timestamp = 1.6e9
+        for i in range(frame_count):
+            data = struct.pack('<HH', random.randint(0, 999), random.randint(0, 999)) + b'\xab\xcd'
+            frame = b'\xaa\xc0' + data + bytes([sum(data) % 256]) + b'\xab'
+            if i % GARBAGE_EVERY_N_FRAMES == 0:
+                frame = b'\xaa\x17' + frame
+            file.write(RECORD_HEADER.pack(timestamp, RX, len(frame)) + frame)
+            timestamp += 1.0
+
+
+def run_decode(title, path, use_numpy, frame_count):
+    time_start = time.perf_counter()
+    series = capture.decode_file(path, use_numpy=use_numpy)
+    time_used = time.perf_counter() - time_start
+    assert len(series) == frame_count
+    print(f"{title:10}: {len(series) / time_used:12.0f} frames/s; {time_used:8.2f} s")
+
+
+def main():
+    frame_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_FRAMES
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "benchmark.cap")
+        write_capture(path, frame_count)
+        print(f"{frame_count} frames, {os.path.getsize(path) / 1e6:.1f} MB")
+
+        run_decode("python", path, False, frame_count)
+        if capture.numpy is not None:
+            run_decode("numpy", path, True, frame_count)
+        else:
+            print("numpy     : not installed")
+
+
+if __name__ == '__main__':
+    main()
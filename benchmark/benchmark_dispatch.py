@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Dispatches incoming messages over hundreds of subscription filters (exact topics, `+` and `#` wildcards): topic trie
+(`SubscriptionIndex`) against a linear scan with paho's filter check. Target: >= 10k messages/s.
+
+    python -m benchmark.benchmark_dispatch [messages] [filters]
+"""
+
+import json
+import random
+import sys
+import time
+
+import paho.mqtt.client as mqtt
+
+from src.config_key import ConfigKey
+from src.subscription import OnHoldSubscription, RangeSubscription, SubscriptionIndex
+
+DEFAULT_MESSAGES = 100_000
+DEFAULT_FILTERS = 500
+ROOMS = 50
+TARGET_RATE = 10_000
+
+
+def create_subscriptions(filter_count):
+    subscriptions = []
+    for i in range(filter_count):
+        kind = i % 4
+        if kind == 0:
+            subscription = RangeSubscription(ConfigKey.MQTT_CHANNEL_IN_TEMP)
+            subscription.config([f"house{i}/room{i % ROOMS}/climate", "temp"])
+            subscription.set_range((-20, 40))
+        elif kind == 1:
+            subscription = RangeSubscription(ConfigKey.MQTT_CHANNEL_IN_HUMI)
+            subscription.config([f"house{i}/+/climate", "humi"])
+            subscription.set_range((0, 80))
+        elif kind == 2:
+            subscription = OnHoldSubscription(ConfigKey.MQTT_CHANNEL_IN_HOLD)
+            subscription.config(f"house{i}/+/window")
+        else:
+            subscription = OnHoldSubscription(ConfigKey.MQTT_CHANNEL_IN_HOLD)
+            subscription.config(f"house{i}/alarm/#")
+        subscriptions.append(subscription)
+    return subscriptions
+
+
+def create_messages(message_count, filter_count):
+    random.seed(0)
+    climate = json.dumps({"temp": 21.5, "humi": 55}).encode()
+    messages = []
+    for _ in range(message_count):
+        house = random.randrange(filter_count)
+        room = random.randrange(ROOMS)
+        kind = random.randrange(3)
+        if kind == 0:
+            messages.append((f"house{house}/room{room}/climate", climate))
+        elif kind == 1:
+            messages.append((f"house{house}/room{room}/window", b"false"))
+        else:
+            messages.append((f"house{house}/alarm/zone{room}/state", b"OFF"))
+    return messages
+
+
+def dispatch_trie(subscriptions, messages):
+    index = SubscriptionIndex(subscriptions)
+    matched = 0
+    for topic, payload in messages:
+        matching = index.subscriptions(topic)
+        if matching:
+            SubscriptionIndex.extract(matching, topic, payload)
+            matched += len(matching)
+    return matched
+
+
+def dispatch_linear(subscriptions, messages):
+    matched = 0
+    for topic, payload in messages:
+        matching = [s for s in subscriptions if mqtt.topic_matches_sub(s.topic, topic)]
+        if matching:
+            SubscriptionIndex.extract(matching, topic, payload)
+            matched += len(matching)
+    return matched
+
+
+def run(title, dispatch, subscriptions, messages):
+    time_start = time.perf_counter()
+    matched = dispatch(subscriptions, messages)
+    time_used = time.perf_counter() - time_start
+    rate = len(messages) / time_used
+    print(f"{title:7}: {rate:10.0f} msg/s ({'ok' if rate >= TARGET_RATE else 'below target'}); "
+          f"{matched} matches; {time_used:6.2f} s")
+    return matched
+
+
+def main():
+    message_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_MESSAGES
+    filter_count = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_FILTERS
+    subscriptions = create_subscriptions(filter_count)
+    messages = create_messages(message_count, filter_count)
+    print(f"{message_count} messages, {filter_count} filters")
+
+    run("trie", dispatch_trie, subscriptions, messages)
+    linear_messages = messages[:max(1, message_count // 100)]  # too slow for all
+    matched = run("linear", dispatch_linear, subscriptions, linear_messages)
+    assert dispatch_trie(subscriptions, linear_messages) == matched
+
+
+if __name__ == '__main__':
+    main()
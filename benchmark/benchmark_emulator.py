@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+End to end throughput of the real `SDS011`/`Sensor` path against the PTY emulator (no hardware).
+
+"query" measures command/reply round trips, "stream" the active report mode with a sped up emulator
+(`time_factor`), including a fraction of injected faults.
+
+    python -m benchmark.benchmark_emulator
+"""
+
+import logging
+import time
+
+from src.config_key import ConfigKey
+from src.sds011 import SDS011
+from src.sds011.emulator import SDS011Emulator, Fault
+from src.sensor import Sensor, MeasureMode
+
+QUERY_COUNT = 500
+STREAM_SECONDS = 2
+STREAM_TIME_FACTOR = 0.001  # 1000 frames/s
+FAULT_EVERY_N_FRAMES = 50
+
+
+def run_query():
+    with SDS011Emulator() as emulator:
+        sds011 = SDS011(emulator.port, timeout=0.5)
+        sds011.open()
+        time_start = time.perf_counter()
+        failed = sum(1 for _ in range(QUERY_COUNT) if sds011.query() is None)
+        time_used = time.perf_counter() - time_start
+        sds011.close()
+
+    print(f"{'query':10}: {QUERY_COUNT / time_used:10.0f} round trips/s; {failed} failed")
+
+
+def run_stream():
+    with SDS011Emulator(time_factor=STREAM_TIME_FACTOR) as emulator:
+        sensor = Sensor({ConfigKey.SERIAL_PORT.value: emulator.port,
+                         ConfigKey.MEASURE_MODE.value: MeasureMode.STREAM.value})
+        sensor.open(warm_up=True)
+        sensor.start_measuring(STREAM_SECONDS / STREAM_TIME_FACTOR)
+
+        faults = [Fault.CHECKSUM, Fault.SHORT_READ, Fault.GARBAGE, Fault.GLITCH]
+        faults_injected = 0
+        frames_start = emulator.frames_sent
+        time_start = time.perf_counter()
+        time_cpu = 0
+        while time.perf_counter() - time_start < STREAM_SECONDS:
+            while faults_injected < (emulator.frames_sent - frames_start) // FAULT_EVERY_N_FRAMES:
+                emulator.inject(faults[faults_injected % len(faults)])
+                faults_injected += 1
+            time.sleep(0.01)
+            time_collect = time.perf_counter()
+            sensor.collect()
+            time_cpu += time.perf_counter() - time_collect
+
+        frames_sent = emulator.frames_sent - frames_start
+        result = sensor.measure()
+        sensor.disconnect()
+
+    print(f"{'stream':10}: {frames_sent / STREAM_SECONDS:10.0f} frames/s; {result.samples} samples accepted; "
+          f"{faults_injected} faults; collect cpu time {time_cpu * 1000:8.1f} ms")
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    run_query()
+    run_stream()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Encodes typical (aggregated) results with every registered encoder: encode time and bytes per message.
+Encoders whose package is not installed are skipped.
+
+    python -m benchmark.benchmark_encoders [results]
+"""
+
+import datetime
+import random
+import sys
+import time
+
+from src.encoder import ENCODERS
+from src.result import Result, ResultState
+
+DEFAULT_RESULTS = 100_000
+
+
+def create_results(count):
+    random.seed(0)
+    timestamp = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+    results = []
+    for i in range(count):
+        result = Result(ResultState.OK, pm10=round(random.uniform(0, 100), 1), pm25=round(random.uniform(0, 50), 1),
+                        timestamp=timestamp + datetime.timedelta(minutes=i))
+        result.warm_up = 30
+        if i % 2:  # streaming mode
+            result.samples = 10
+            result.rejected = 1
+            result.pm10_mean, result.pm10_min, result.pm10_max, result.pm10_stdev = result.pm10, 1.0, 99.9, 2.51
+            result.pm25_mean, result.pm25_min, result.pm25_max, result.pm25_stdev = result.pm25, 0.5, 49.9, 1.23
+        results.append(result)
+    return results
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_RESULTS
+    results = create_results(count)
+    print(f"{count} results (half of them aggregated)")
+
+    for name, encoder_class in ENCODERS.items():
+        if not encoder_class.available():
+            print(f"{name:8}: not installed")
+            continue
+
+        encoder = encoder_class()
+        time_start = time.perf_counter()
+        size = sum(len(encoder.encode(result)) for result in results)
+        time_used = time.perf_counter() - time_start
+        print(f"{name:8}: {time_used / count * 1e6:6.1f} us/message; {size / count:6.1f} bytes/message")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Simulates some days of dust values with wood stove smoke events and compares the interval policies:
+detection latency (true value crosses the threshold => first measurement above) against sensor on time (laser hours).
+
+    python -m benchmark.benchmark_interval_policy
+"""
+
+import datetime
+import logging
+import random
+import statistics
+
+from src.config_key import ConfigKey
+from src.interval_policy import IntervalPolicy
+from src.process import Process
+from src.result import Result, ResultState
+
+SIMULATED_DAYS = 14
+EVENTS_PER_DAY = 2
+DETECTION_THRESHOLD = 40  # µg/m³
+
+TIME_WARM_UP = Process.DEFAULT_TIME_WARM_UP
+TIME_COOL_DOWN = Process.DEFAULT_TIME_COOL_DOWN
+TIME_INTERVAL_MIN = 30
+TIME_INTERVAL_MAX = Process.DEFAULT_TIME_INTERVAL_MAX
+
+
+class DustModel:
+    """clean air (noise) + smoke events (ramp up, plateau, decay)"""
+
+    def __init__(self, seconds):
+        self.events = []  # (start, ramp, plateau, decay, peak)
+        for _ in range(int(EVENTS_PER_DAY * seconds / 86400)):
+            start = random.uniform(0, seconds - 7200)
+            self.events.append((start, random.uniform(300, 2400), random.uniform(900, 3600),
+                                random.uniform(900, 2400), random.uniform(60, 300)))
+        self.events.sort()
+
+    def value(self, t):
+        value = max(0.0, random.gauss(6, 1.5))
+        for start, ramp, plateau, decay, peak in self.events:
+            if t < start:
+                continue
+            if t < start + ramp:
+                value += peak * (t - start) / ramp
+            elif t < start + ramp + plateau:
+                value += peak
+            elif t < start + ramp + plateau + decay:
+                value += peak * (1 - (t - start - ramp - plateau) / decay)
+        return value
+
+    def crossing(self, start, ramp, peak):
+        """time when the event crosses the detection threshold"""
+        return start + ramp * max(0.0, DETECTION_THRESHOLD - 6) / peak
+
+
+def simulate(title, policy, model, seconds):
+    time_start = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+    t = 0.0
+    time_on = 0.0
+    measurements = []  # (t, value)
+    last_result = None
+
+    while t < seconds:
+        if policy is None:
+            interval = TIME_INTERVAL_MAX
+        else:
+            now = time_start + datetime.timedelta(seconds=t)
+            policy.set_limits(TIME_INTERVAL_MIN, TIME_INTERVAL_MAX,
+                              Process.DEFAULT_ADAPTIVE_DUST_LOWER, Process.DEFAULT_ADAPTIVE_DUST_UPPER)
+            interval = policy.interval(last_result, now)
+        interval = max(interval, TIME_WARM_UP + TIME_COOL_DOWN)
+
+        # like `Process`: the sensor isn't sent to sleep for short breaks
+        t_measure = t + TIME_WARM_UP
+        cycle_on = TIME_WARM_UP + TIME_COOL_DOWN
+        time_on += interval if interval - cycle_on <= Process.NO_SENSOR_CLOSE_BELOW else cycle_on
+
+        value = model.value(t_measure)
+        measurements.append((t_measure, value))
+        last_result = Result(ResultState.OK, pm10=round(value, 1), pm25=round(value * 0.7, 1),
+                             timestamp=time_start + datetime.timedelta(seconds=t_measure))
+        if policy is not None:
+            policy.add_result(last_result)
+        t += interval
+
+    latencies = []
+    for start, ramp, _plateau, _decay, peak in model.events:
+        if peak <= DETECTION_THRESHOLD:
+            continue
+        crossing = model.crossing(start, ramp, peak)
+        detected = next((m for m, v in measurements if m >= crossing and v >= DETECTION_THRESHOLD), None)
+        if detected is not None:
+            latencies.append(detected - crossing)
+
+    hours_per_day = time_on / 3600 / (seconds / 86400)
+    print(f"{title:10}: latency mean {statistics.mean(latencies):6.0f} s, max {max(latencies):6.0f} s; "
+          f"sensor on {hours_per_day:5.1f} h/day; {len(measurements) / (seconds / 86400):6.0f} measurements/day")
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    seconds = SIMULATED_DAYS * 86400
+
+    for title, config in [("max", None),
+                          ("linear", {ConfigKey.INTERVAL_POLICY.value: "linear"}),
+                          ("trend", {ConfigKey.INTERVAL_POLICY.value: "trend"})]:
+        random.seed(1)
+        model = DustModel(seconds)
+        policy = IntervalPolicy.create(config) if config is not None else None
+        simulate(title, policy, model, seconds)
+
+
+if __name__ == '__main__':
+    main()
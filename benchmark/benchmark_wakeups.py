@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Counts the wake-ups of the `Process` main loop per hour (simulated time, no real sleeping).
+
+"polling" emulates the former loop which woke up every 50 ms, "deadline" is the scheduler which sleeps
+until the next state transition.
+
+    python -m benchmark.benchmark_wakeups
+"""
+
+import logging
+import random
+import time
+
+from src.process import Process
+from src.sensor import MockSensor
+
+SIMULATED_SECONDS = 3600
+POLLING_TIME_STEP = 0.05
+
+
+class StubMqttConnector:
+
+    def __init__(self):
+        self.published = 0
+
+    def set_notify_callback(self, callback):
+        pass
+
+    def is_open(self):
+        return True
+
+    def subscribe(self, channels):
+        pass
+
+    def get_messages(self):
+        return []
+
+    def publish(self, message, channel=None, retain=None, store=False):
+        self.published += 1
+
+    def close(self):
+        pass
+
+
+class SimulatedProcess(Process):
+
+    def __init__(self, time_step=None):
+        super().__init__()
+        self.time_step = time_step
+        self.virtual_clock = 0
+        self.wakeups = 0
+
+        self._mqtt = StubMqttConnector()
+        self._sensor = MockSensor({})
+
+    def _clock(self):
+        return self.virtual_clock
+
+    def _wait(self, seconds: float, fds=None):
+        if self.time_step is not None:
+            seconds = min(seconds, self.time_step)
+        seconds = max(0, seconds)
+        self.virtual_clock += seconds
+        self._time_counter += seconds
+        self.wakeups += 1
+        if self.virtual_clock >= SIMULATED_SECONDS:
+            self._shutdown = True
+
+
+def run_simulation(title, time_step):
+    random.seed(0)  # MockSensor
+    process = SimulatedProcess(time_step)
+    mqtt = process._mqtt
+
+    time_start = time.perf_counter()
+    process.run()
+    time_cpu = time.perf_counter() - time_start
+
+    wakeups_per_hour = process.wakeups * 3600 / SIMULATED_SECONDS
+    print(f"{title:10}: {wakeups_per_hour:10.0f} wake-ups/h; {mqtt.published:3} publishes; "
+          f"loop cpu time {time_cpu * 1000:8.1f} ms")
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    run_simulation("polling", POLLING_TIME_STEP)
+    run_simulation("deadline", None)
+
+
+if __name__ == '__main__':
+    main()
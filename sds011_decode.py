@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""Decodes serial capture files (see `serial_capture`) into a PM time series (CSV)."""
+
+import csv
+import datetime
+import sys
+from argparse import ArgumentParser
+
+from src.sds011 import capture
+from src.sensor import Sensor
+
+
+def main():
+    parser = ArgumentParser(description="Decodes SDS011 capture files into a PM time series (CSV).")
+    parser.add_argument("files", nargs="+", help="capture files")
+    parser.add_argument("-o", "--output", help="CSV file (default: stdout)")
+    parser.add_argument("--no-numpy", action="store_true", help="don't use NumPy (even if installed)")
+    args = parser.parse_args()
+
+    series = capture.decode_files(args.files, use_numpy=not args.no_numpy)
+
+    output = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        writer = csv.writer(output)
+        writer.writerow(["timestamp", "pm25", "pm10", "valid"])
+        for timestamp, pm25, pm10 in series:
+            time = datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc)
+            valid = Sensor.check_measurement(pm25=pm25, pm10=pm10)
+            writer.writerow([time.isoformat(), pm25, pm10, int(valid)])
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(f"{len(series)} frames decoded", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,13 +5,13 @@ import sys
 
 from src.config import Config
 from src.logging_helper import LoggingHelper
-from src.process import Process
+from src.bridge import Bridge
 
 _logger = logging.getLogger(__name__)
 
 
 def main():
-    process = None
+    bridge = None
 
     try:
         config = {}
@@ -19,9 +19,9 @@ def main():
 
         LoggingHelper.init(config)
 
-        process = Process()
-        process.open(config)
-        process.run()
+        bridge = Bridge()
+        bridge.open(config)
+        bridge.run()
 
         return 0
 
@@ -33,8 +33,8 @@ def main():
         return 1
 
     finally:
-        if process is not None:
-            process.close()
+        if bridge is not None:
+            bridge.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,183 @@
+import logging
+import signal
+
+from src.config_key import ConfigKey
+from src.mqtt_connector import MqttConnector
+from src.process import Process
+from src.scheduler import Scheduler
+
+_logger = logging.getLogger(__name__)
+
+
+class Bridge:
+    """
+    Drives N sensors (one `Process` state machine each) with one MQTT connection and one scheduler.
+
+    Without a `sensors` list in the configuration there is exactly one sensor (former behaviour). A sensor, which
+    fails, is closed (last will on its channel); the others keep running.
+    """
+
+    # files and devices, which are exclusive to one sensor
+    EXCLUSIVE_KEYS = (ConfigKey.SERIAL_PORT, ConfigKey.SERIAL_CAPTURE, ConfigKey.LIFETIME_FILE)
+    # settings of the shared MQTT connection, which can't be set per sensor
+    CONNECTION_KEYS = (ConfigKey.MQTT_OUTBOX, )
+
+    TIME_WAIT_FOR_MQTT_CONNECT = Process.TIME_WAIT_FOR_MQTT_CONNECT
+    TIME_WAIT_FOR_RETAINED = Process.TIME_WAIT_FOR_RETAINED
+
+    def __init__(self):
+        self._mqtt = None
+        self._scheduler = Scheduler()
+        self._processes = []
+        self._shutdown = False
+
+        signal.signal(signal.SIGINT, self._shutdown_gracefully)
+        signal.signal(signal.SIGTERM, self._shutdown_gracefully)
+
+    def __del__(self):
+        self.close()
+
+    def _shutdown_gracefully(self, sig, _frame):
+        _logger.info("shutdown signaled (%s)", sig)
+        self._shutdown = True
+        self._scheduler.wake_up()
+
+    @classmethod
+    def sensor_configs(cls, config):
+        """
+        Splits the configuration into one configuration per sensor. The entries of `sensors` overwrite the global
+        settings (e.g. serial port, output channel, intervals, subscriptions). Serial ports, capture and lifetime files
+        must differ between the sensors.
+        """
+        sensors = config.get(ConfigKey.SENSORS.value)
+        if not sensors:
+            return [config]
+        if not isinstance(sensors, list) or not all(isinstance(s, dict) for s in sensors):
+            raise ValueError(f"expected a list of dictionaries for '{ConfigKey.SENSORS.value}'!")
+
+        base = {k: v for k, v in config.items() if k != ConfigKey.SENSORS.value}
+        configs = []
+        for sensor in sensors:
+            for key in cls.CONNECTION_KEYS:
+                if key.value in sensor:
+                    raise ValueError(f"'{key.value}' belongs to the shared MQTT connection, not to a sensor!")
+            sensor_config = dict(base)
+            sensor_config.update(sensor)
+            configs.append(sensor_config)
+
+        for key in cls.EXCLUSIVE_KEYS:
+            values = [c.get(key.value) for c in configs if c.get(key.value)]
+            duplicates = sorted(set(v for v in values if values.count(v) > 1))
+            if duplicates:
+                raise ValueError(f"'{key.value}' must be configured per sensor, used several times: {duplicates}!")
+        return configs
+
+    def open(self, config):
+        if self._mqtt is not None:
+            raise RuntimeError("Initialisation alread done!")
+
+        self._mqtt = self._create_mqtt_connector(config)
+        self._mqtt.set_notify_callback(self._scheduler.wake_up)
+
+        for sensor_config in self.sensor_configs(config):
+            process = self._create_process()
+            process.open(sensor_config)
+            self._processes.append(process)
+
+        self._mqtt.open(config)
+        _logger.info("%s sensor(s) configured", len(self._processes))
+
+    def _create_mqtt_connector(self, _config):
+        return MqttConnector()
+
+    def _create_process(self):
+        return Process(scheduler=self._scheduler, mqtt=self._mqtt)
+
+    def close(self):
+        for process in self._processes:
+            try:
+                process.close()
+            except Exception as ex:
+                _logger.exception(ex)
+        self._processes = []
+
+        if self._mqtt is not None:
+            self._mqtt.set_notify_callback(None)  # no late wake ups of the closed scheduler
+            self._mqtt.close()
+            self._mqtt = None
+
+        if self._scheduler is not None:
+            self._scheduler.close()
+            self._scheduler = None
+
+    def _clock(self):
+        return self._scheduler.now()
+
+    def _wait(self, seconds: float, fds=None):
+        """overwriteable for tests"""
+        self._scheduler.wait(seconds, fds)
+        for process in self._processes:
+            process.update_timer()
+
+    def run(self):
+        try:
+            self._wait_for_mqtt_connection()
+
+            for process in self._processes:
+                process.start()
+
+            while not self._shutdown:
+                messages = self._mqtt.get_messages()
+
+                timeout = None
+                fds = []
+                for process in list(self._processes):
+                    try:
+                        process.dispatch_mqtt_messages(messages)
+                        process_timeout, process_fds = process.step()
+                    except Exception as ex:
+                        self._close_failed(process, ex)
+                        continue
+                    timeout = process_timeout if timeout is None else min(timeout, process_timeout)
+                    fds.extend(process_fds or [])
+
+                self._wait(timeout, fds)
+
+        finally:
+            self.close()
+
+    def _close_failed(self, process, ex):
+        """closes a failed sensor, the others keep running; raises if none is left"""
+        _logger.exception("sensor failed (%s), closing it", ex)
+        self._processes.remove(process)
+        try:
+            process.close()
+        except Exception as close_ex:
+            _logger.exception(close_ex)
+
+        if not self._processes:
+            raise RuntimeError("all sensors failed!") from ex
+
+    def _wait_for_mqtt_connection(self):
+        """wait for getting mqtt connect callback called"""
+        time_start = self._clock()
+        while not self._shutdown:
+            if self._mqtt.is_open():
+                topics = []
+                for process in self._processes:
+                    topics.extend(t for t in process.topics if t not in topics)
+                self._mqtt.subscribe(topics)
+                break
+
+            time_elapsed = self._clock() - time_start
+            if time_elapsed >= self.TIME_WAIT_FOR_MQTT_CONNECT:
+                raise RuntimeError("Couldn't connect to MQTT, callback was not called!?")
+            self._wait(self.TIME_WAIT_FOR_MQTT_CONNECT - time_elapsed)
+
+        # wait for delivering retained subscribtions
+        time_start = self._clock()
+        while not self._shutdown:
+            time_elapsed = self._clock() - time_start
+            if time_elapsed >= self.TIME_WAIT_FOR_RETAINED:
+                break
+            self._wait(self.TIME_WAIT_FOR_RETAINED - time_elapsed)
@@ -10,26 +10,55 @@ class ConfigKey(Enum):
     LOG_PRINT = "log_print"
     MOCK_SENSOR = "mock_sensor"
     SERIAL_PORT = "serial_port"
+    SERIAL_KEEP_OPEN = "serial_keep_open"
+    SERIAL_CAPTURE = "serial_capture"
+    MEASURE_MODE = "measure_mode"
+    WORK_PERIOD = "work_period"
     SYSTEMD = "systemd"
+    SENSORS = "sensors"
 
     TIME_INTERVAL_MAX = "time_interval_max"
     TIME_INTERVAL_MIN = "time_interval_min"
     TIME_WARM_UP = "time_warm_up"
+    TIME_WARM_UP_MIN = "time_warm_up_min"
+    WARM_UP_TOLERANCE = "warm_up_tolerance"
+    TIME_MEASURING = "time_measuring"
+    TIME_BETWEEN_MEASUREMENTS = "time_between_measurements"
+    COUNT_MEASUREMENTS = "count_measurements"
     TIME_COOL_DOWN = "time_cool_down"
     TIME_WAIT_FOR_ACTOR = "time_wait_for_actor"
 
+    INTERVAL_POLICY = "interval_policy"
+    INTERVAL_EWMA_TIME = "interval_ewma_time"
+    INTERVAL_RISE_THRESHOLD = "interval_rise_threshold"
+
+    LIFETIME_FILE = "lifetime_file"
+    LIFETIME_TARGET = "lifetime_target"
+    LIFETIME_RATED_HOURS = "lifetime_rated_hours"
+    WAKE_UP_COST = "wake_up_cost"
+
+    DEADBAND = "deadband"
+    HEARTBEAT_INTERVAL = "heartbeat_interval"
+    RESULT_ENCODER = "result_encoder"
+
     ABORT_AFTER_N_ERRORS = "abort_after_n_errors"
     TEMPERATURE_RANGE = "temperatur_range"
     HUMIDITY_RANGE = "humidity_range"
     DEACTIVATION_TIME_RANGES = "deactivation_time_ranges"
+    DEACTIVATION_SCHEDULE = "deactivation_schedule"
+    DEACTIVATION_EXCEPTIONS = "deactivation_exceptions"
 
     MQTT_CHANNEL_OUT_STATE = "mqtt_channel_out_state"
+    MQTT_CHANNELS_OUT_RESULT = "mqtt_channels_out_result"
     MQTT_CHANNEL_OUT_ACTOR = "mqtt_channel_out_actor"
     MQTT_CHANNEL_IN_TEMP = "mqtt_channel_in_temp"
     MQTT_CHANNEL_IN_HUMI = "mqtt_channel_in_humi"
     MQTT_CHANNEL_IN_HOLD = "mqtt_channel_in_hold"
+    MQTT_CHANNEL_IN_TRIGGER = "mqtt_channel_in_trigger"
 
     MQTT_LAST_WILL = "mqtt_last_will"
+    MQTT_OUTBOX = "mqtt_outbox"
+    MQTT_OUTBOX_MAX = "mqtt_outbox_max"
     MQTT_QUALITY = "mqtt_quality"
     MQTT_RETAIN = "mqtt_retain"
 
@@ -37,6 +66,15 @@ class ConfigKey(Enum):
     MQTT_PORT = "mqtt_port"
     MQTT_PROTOCOL = "mqtt_protocol"
     MQTT_CLIENT_ID = "mqtt_client_id"
+    MQTT_CLEAN_SESSION = "mqtt_clean_session"
+    MQTT_SESSION_EXPIRY = "mqtt_session_expiry"
+    MQTT_RECONNECT_MAX_DELAY = "mqtt_reconnect_max_delay"
+    MQTT_PROTOCOL_FALLBACK = "mqtt_protocol_fallback"
+    MQTT_TOPIC_ALIAS = "mqtt_topic_alias"
+    MQTT_MESSAGE_EXPIRY = "mqtt_message_expiry"
+    MQTT_USER_PROPERTIES = "mqtt_user_properties"
+    MQTT_MAX_INFLIGHT = "mqtt_max_inflight"
+    MQTT_FLUSH_TIMEOUT = "mqtt_flush_timeout"
     MQTT_KEEPALIVE = "mqtt_keepalive"
     MQTT_SSL_CA_CERTS = "mqtt_ssl_ca_certs"
     MQTT_SSL_CERTFILE = "mqtt_ssl_certfile"
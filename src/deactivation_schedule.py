@@ -0,0 +1,172 @@
+import bisect
+import datetime
+import re
+
+from src.config_key import ConfigKey
+
+
+class DeactivationSchedule:
+    """
+    Times when the sensor is deactivated, compiled once into sorted, merged minute intervals:
+    - `ranges`: [[minute from, minute to], ...] every day (upper minute included; `deactivation_time_ranges`),
+    - `rules`: [{"weekdays": ["sat", "sun"], "from": "22:00", "to": "07:30"}, ...] weekly; with "dates" instead of
+      "weekdays" on these dates only. A rule with "to" <= "from" ends the next day.
+    - `exceptions`: dates, on which the daily and weekly rules don't apply (dated rules still do).
+
+    Local wall clock time. The rules are expanded into a table of timezone aware transitions (see `build`), the
+    lookup (bisect) returns the current state and the time of the next transition; real seconds over DST changes.
+    """
+
+    WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+    MINUTES_PER_DAY = 1440
+    LOOKAHEAD_DAYS = 8  # weekly rules: there is always a transition within a week (if any)
+    TABLE_DAYS = 2 * LOOKAHEAD_DAYS  # expanded days; rebuilt when less than the lookahead is left
+
+    def __init__(self):
+        self._weekly = [[] for _ in range(7)]  # weekday => [(minute from, minute to)], minutes may exceed the day
+        self._dated = {}  # date => [(minute from, minute to)]
+        self._exceptions = set()
+
+        self._transitions = []  # sorted (aware) times; deactivated from even to odd indices
+        self._table_start = None
+        self._table_valid_until = None
+
+    @classmethod
+    def compile(cls, ranges=None, rules=None, exceptions=None):
+        schedule = DeactivationSchedule()
+
+        try:
+            for deactivation_range in ranges or []:
+                lower, upper = min(deactivation_range), max(deactivation_range)
+                for weekday in range(7):
+                    schedule._weekly[weekday].append((int(lower), int(upper) + 1))
+        except (TypeError, ValueError) as ex:
+            raise ValueError(f"Iterable[Iterable] expected for '{ConfigKey.DEACTIVATION_TIME_RANGES.value}'!"
+                             f" E.g.: '((60,300),(660,900),)' ({ex})")
+
+        try:
+            for rule in rules or []:
+                interval = cls._parse_interval(rule)
+                if "dates" in rule:
+                    for date in rule["dates"]:
+                        schedule._dated.setdefault(cls._parse_date(date), []).append(interval)
+                else:
+                    for weekday in cls._parse_weekdays(rule.get("weekdays")):
+                        schedule._weekly[weekday].append(interval)
+
+            schedule._exceptions = {cls._parse_date(d) for d in exceptions or []}
+        except (TypeError, ValueError, KeyError, AttributeError) as ex:
+            raise ValueError(f"Invalid '{ConfigKey.DEACTIVATION_SCHEDULE.value}' or "
+                             f"'{ConfigKey.DEACTIVATION_EXCEPTIONS.value}' ({ex})!")
+
+        schedule._weekly = [cls._merge(intervals) for intervals in schedule._weekly]
+        schedule._dated = {date: cls._merge(intervals) for date, intervals in schedule._dated.items()}
+        return schedule
+
+    @property
+    def empty(self):
+        return not self._dated and not any(self._weekly)
+
+    @classmethod
+    def _parse_interval(cls, rule):
+        lower = cls._parse_minute(rule["from"])
+        upper = cls._parse_minute(rule["to"])
+        if upper <= lower:
+            upper += cls.MINUTES_PER_DAY  # over midnight
+        return lower, upper
+
+    @classmethod
+    def _parse_minute(cls, value):
+        """minute of day: int or "HH:MM" ("24:00" is the end of the day)"""
+        if isinstance(value, str):
+            match = re.fullmatch(r"\s*(\d{1,2}):(\d{2})\s*", value)
+            if not match:
+                raise ValueError(f"'HH:MM' expected ({value})")
+            value = int(match.group(1)) * 60 + int(match.group(2))
+        if not 0 <= value <= cls.MINUTES_PER_DAY:
+            raise ValueError(f"minute of day out of range ({value})")
+        return int(value)
+
+    @classmethod
+    def _parse_weekdays(cls, values):
+        if values is None:
+            return range(7)
+        weekdays = []
+        for value in values:
+            if isinstance(value, int):
+                if not 0 <= value <= 6:
+                    raise ValueError(f"weekday 0 (mon) .. 6 (sun) expected ({value})")
+                weekdays.append(value)
+            else:
+                weekdays.append(cls.WEEKDAYS.index(str(value).lower().strip()[:3]))
+        return weekdays
+
+    @classmethod
+    def _parse_date(cls, value):
+        if isinstance(value, datetime.date):  # YAML parses dates itself
+            return value
+        return datetime.datetime.strptime(str(value).strip(), "%Y-%m-%d").date()
+
+    @classmethod
+    def _merge(cls, intervals):
+        merged = []
+        for lower, upper in sorted(intervals):
+            if merged and lower <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], upper))
+            else:
+                merged.append((lower, upper))
+        return merged
+
+    def _intervals_of_day(self, date):
+        """intervals which start on `date` (minutes relative to its midnight)"""
+        intervals = self._dated.get(date, [])
+        if date not in self._exceptions:
+            intervals = intervals + self._weekly[date.weekday()]
+        return intervals
+
+    @classmethod
+    def _localize(cls, wall_time: datetime.datetime, tz):
+        if tz is None:
+            return wall_time
+        if hasattr(tz, "localize"):  # pytz (tzlocal)
+            return tz.localize(wall_time)
+        return wall_time.replace(tzinfo=tz)
+
+    def build(self, now: datetime.datetime):
+        """expands the rules into the transition table, starting the day before `now` (time zone of `now`)"""
+        first_date = now.date() - datetime.timedelta(days=1)
+        timeline = []
+        for day in range(self.TABLE_DAYS + 1):
+            offset = day * self.MINUTES_PER_DAY
+            date = first_date + datetime.timedelta(days=day)
+            timeline.extend((lower + offset, upper + offset) for lower, upper in self._intervals_of_day(date))
+
+        midnight = datetime.datetime.combine(first_date, datetime.time())
+        transitions = []
+        for interval in self._merge(timeline):
+            transitions.extend(self._localize(midnight + datetime.timedelta(minutes=m), now.tzinfo) for m in interval)
+
+        self._transitions = transitions
+        self._table_start = self._localize(midnight, now.tzinfo)
+        self._table_valid_until = self._localize(
+            midnight + datetime.timedelta(days=self.TABLE_DAYS + 1 - self.LOOKAHEAD_DAYS), now.tzinfo)
+
+    def state(self, now: datetime.datetime):
+        """
+        :param now: local time
+        :return: (deactivated, seconds until the next transition or None if there is none within the lookahead)
+        """
+        if self.empty:
+            return False, None
+
+        if self._table_start is None or not self._table_start <= now < self._table_valid_until:
+            self.build(now)
+
+        index = bisect.bisect_right(self._transitions, now)
+        deactivated = index % 2 == 1
+        if index >= len(self._transitions):
+            return deactivated, None
+        return deactivated, (self._transitions[index] - now).total_seconds()
+
+    def is_active(self, now: datetime.datetime) -> bool:
+        return self.state(now)[0]
@@ -0,0 +1,81 @@
+import logging
+
+from src.config import Config
+from src.config_key import ConfigKey
+from src.result import ResultKey
+
+_logger = logging.getLogger(__name__)
+
+
+class Deadband:
+    """
+    Suppresses results whose values didn't change beyond the sensor noise since the last published result:
+    a field counts as changed if it moved more than max(absolute, relative * |last value|). State changes are always
+    published, unchanged results at least every heartbeat interval.
+    """
+
+    DEFAULT_HEARTBEAT_INTERVAL = 3600  # seconds
+
+    def __init__(self):
+        self._bands = {}  # result attribute => (absolute, relative)
+        self._heartbeat_interval = self.DEFAULT_HEARTBEAT_INTERVAL
+
+        self._last_published = None  # type: Result
+        self._suppressed = 0
+
+    def config(self, config):
+        bands = config.get(ConfigKey.DEADBAND.value) or {}
+        if not isinstance(bands, dict):
+            raise ValueError(f"'{ConfigKey.DEADBAND.value}' must be a dict, e.g. "
+                             "{PM25: {absolute: 1, relative: 0.1}} ({bands})!")
+
+        for key, band in bands.items():
+            try:
+                field = ResultKey(str(key).upper())
+            except ValueError:
+                raise ValueError(f"'{ConfigKey.DEADBAND.value}': unknown result field '{key}'!")
+            band = band or {}
+            absolute = float(band.get("absolute", 0))
+            relative = float(band.get("relative", 0))
+            if absolute < 0 or relative < 0:
+                raise ValueError(f"'{ConfigKey.DEADBAND.value}': deadbands of '{key}' must be >= 0!")
+            self._bands[field.value.lower()] = (absolute, relative)
+
+        self._heartbeat_interval = Config.get_float(config, ConfigKey.HEARTBEAT_INTERVAL, self._heartbeat_interval)
+        if self._heartbeat_interval <= 0:
+            raise ValueError(f"'{ConfigKey.HEARTBEAT_INTERVAL.value}' must be > 0!")
+
+    @property
+    def enabled(self):
+        return bool(self._bands)
+
+    def accept(self, result) -> bool:
+        """
+        :return: True if the result is to be published; its `suppressed` is set to the number of results suppressed
+            since the last published one
+        """
+        if not self.enabled:
+            return True
+
+        last = self._last_published
+        if last is None or last.state != result.state or self._heartbeat_due(last, result) \
+                or any(self._changed(getattr(last, f, None), getattr(result, f, None), band)
+                       for f, band in self._bands.items()):
+            result.suppressed = self._suppressed
+            self._suppressed = 0
+            self._last_published = result
+            return True
+
+        self._suppressed += 1
+        _logger.debug("result within the deadband, not published (%s suppressed)", self._suppressed)
+        return False
+
+    def _heartbeat_due(self, last, result):
+        return (result.timestamp - last.timestamp).total_seconds() >= self._heartbeat_interval
+
+    @classmethod
+    def _changed(cls, last_value, value, band):
+        if last_value is None or value is None:
+            return last_value is not value
+        absolute, relative = band
+        return abs(value - last_value) > max(absolute, relative * abs(last_value))
@@ -0,0 +1,116 @@
+import abc
+import json
+
+try:
+    import msgpack
+except ImportError:  # optional
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # optional
+    cbor2 = None
+
+from src.result import ResultKey
+
+
+class Encoder(abc.ABC):
+    """Encodes a `Result` into a MQTT payload."""
+
+    name = None
+
+    @classmethod
+    def available(cls) -> bool:
+        """False if a required (optional) package is not installed"""
+        return True
+
+    @abc.abstractmethod
+    def encode(self, result):
+        """:return: payload (str or bytes)"""
+        raise NotImplementedError()
+
+
+class JsonEncoder(Encoder):
+    """`ResultKey` names, ISO timestamp (default, see `Result.create_message`)"""
+
+    name = "json"
+
+    def encode(self, result):
+        return result.create_message()
+
+
+class CompactEncoder(Encoder):
+    """Short keys, epoch timestamp (seconds), no empty values; for constrained links"""
+
+    name = "compact"
+
+    KEYS = {
+        ResultKey.PM10: "p10",
+        ResultKey.PM25: "p25",
+        ResultKey.STATE: "s",
+        ResultKey.TIMESTAMP: "t",
+        ResultKey.WARM_UP: "wu",
+        ResultKey.ON_HOURS: "oh",
+        ResultKey.END_OF_LIFE: "eol",
+        ResultKey.SUPPRESSED: "sup",
+        ResultKey.SAMPLES: "n",
+        ResultKey.REJECTED: "rej",
+        ResultKey.PM25_MEAN: "p25m",
+        ResultKey.PM25_MIN: "p25l",
+        ResultKey.PM25_MAX: "p25h",
+        ResultKey.PM25_STDEV: "p25s",
+        ResultKey.PM10_MEAN: "p10m",
+        ResultKey.PM10_MIN: "p10l",
+        ResultKey.PM10_MAX: "p10h",
+        ResultKey.PM10_STDEV: "p10s",
+    }
+
+    _KEYS_BY_NAME = {key.value: short for key, short in KEYS.items()}
+
+    @classmethod
+    def to_compact_dict(cls, result):
+        keys = cls._KEYS_BY_NAME
+        payload = {keys[key]: value for key, value in result.to_dict().items() if value is not None}
+        payload[keys[ResultKey.TIMESTAMP.value]] = int(result.timestamp.timestamp())
+        return payload
+
+    def encode(self, result):
+        return json.dumps(self.to_compact_dict(result), separators=(",", ":"))
+
+
+class MsgpackEncoder(Encoder):
+    """MessagePack with the compact keys (requires `msgpack`)"""
+
+    name = "msgpack"
+
+    @classmethod
+    def available(cls) -> bool:
+        return msgpack is not None
+
+    def encode(self, result):
+        return msgpack.packb(CompactEncoder.to_compact_dict(result))
+
+
+class CborEncoder(Encoder):
+    """CBOR with the compact keys (requires `cbor2`)"""
+
+    name = "cbor"
+
+    @classmethod
+    def available(cls) -> bool:
+        return cbor2 is not None
+
+    def encode(self, result):
+        return cbor2.dumps(CompactEncoder.to_compact_dict(result))
+
+
+ENCODERS = {encoder.name: encoder for encoder in [JsonEncoder, CompactEncoder, MsgpackEncoder, CborEncoder]}
+
+
+def create_encoder(name: str) -> Encoder:
+    encoder_class = ENCODERS.get(str(name).lower().strip())
+    if encoder_class is None:
+        raise ValueError(f"unknown result encoder '{name}' (available: {', '.join(ENCODERS)})!")
+    if not encoder_class.available():
+        raise ValueError(f"result encoder '{name}' requires a package, which is not installed (pip install)!")
+    return encoder_class()
@@ -0,0 +1,48 @@
+import threading
+from collections import OrderedDict
+
+
+class Inbox:
+    """
+    Incoming MQTT messages, only the latest per topic is kept until it is taken (older ones are stale anyway).
+    Bounded by the number of topics (wildcard subscriptions), the least recently updated topic is dropped first.
+    Thread safe: filled by the MQTT thread.
+    """
+
+    DEFAULT_MAX_TOPICS = 1000
+
+    def __init__(self, max_topics=DEFAULT_MAX_TOPICS):
+        if max_topics < 1:
+            raise ValueError(f"inbox size must be >= 1 ({max_topics})!")
+
+        self._max_topics = max_topics
+        self._lock = threading.Lock()
+        self._messages = OrderedDict()  # topic => message, least recently updated first
+
+        self.received = 0
+        self.overwritten = 0  # replaced by a newer message of the same topic before it was taken
+        self.dropped = 0  # removed to make room for another topic
+
+    def __len__(self):
+        with self._lock:
+            return len(self._messages)
+
+    def put(self, message):
+        with self._lock:
+            self.received += 1
+            if self._messages.pop(message.topic, None) is not None:
+                self.overwritten += 1
+            elif len(self._messages) >= self._max_topics:
+                self._messages.popitem(last=False)
+                self.dropped += 1
+            self._messages[message.topic] = message
+
+    def take(self):
+        """:return: the latest message of each topic (in order of arrival), the inbox is empty afterwards"""
+        with self._lock:
+            messages = list(self._messages.values())
+            self._messages.clear()
+        return messages
+
+    def __str__(self):
+        return "received={}, overwritten={}, dropped={}".format(self.received, self.overwritten, self.dropped)
@@ -0,0 +1,213 @@
+import abc
+import logging
+import math
+from collections import deque
+from enum import Enum
+
+from src.config import Config
+from src.config_key import ConfigKey
+from src.result import Result, ResultState
+
+_logger = logging.getLogger(__name__)
+
+
+class IntervalPolicyType(Enum):
+    LINEAR = "linear"  # interval linear to the last dust value
+    TREND = "trend"  # EWMA level and slope of the recent results
+
+    @classmethod
+    def parse(cls, value):
+        if value is None:
+            return cls.LINEAR
+        try:
+            return cls(str(value).lower().strip())
+        except ValueError:
+            raise ValueError(f"Invalid '{ConfigKey.INTERVAL_POLICY.value}' ({value})!")
+
+
+class IntervalPolicy(abc.ABC):
+    """Determines the time between two measurements from the recent results."""
+
+    HISTORY_SIZE = 32
+    MIN_TIME_STALE = 300  # seconds; results are outdated after max(MIN_TIME_STALE, 2 * time_interval_max)
+
+    def __init__(self):
+        self._time_interval_min = None
+        self._time_interval_max = None
+        self._dust_lower = None  # µg/m³
+        self._dust_upper = None
+
+        self._history = deque(maxlen=self.HISTORY_SIZE)  # (timestamp, dust value) of valid results
+
+    @classmethod
+    def create(cls, config):
+        policy_type = IntervalPolicyType.parse(config.get(ConfigKey.INTERVAL_POLICY.value))
+        policy = TrendIntervalPolicy() if policy_type == IntervalPolicyType.TREND else LinearIntervalPolicy()
+        policy.config(config)
+        return policy
+
+    def config(self, config):
+        pass
+
+    def set_limits(self, time_interval_min, time_interval_max, dust_lower, dust_upper):
+        self._time_interval_min = time_interval_min
+        self._time_interval_max = time_interval_max
+        self._dust_lower = dust_lower
+        self._dust_upper = dust_upper
+
+    @property
+    def history(self):
+        return list(self._history)
+
+    @property
+    def time_stale(self):
+        return max(self.MIN_TIME_STALE, 2 * self._time_interval_max) if self._time_interval_max else \
+            self.MIN_TIME_STALE
+
+    def add_result(self, result: Result):
+        """collects the valid results (see `_add_value`)"""
+        if result is None or result.state != ResultState.OK or result.timestamp is None:
+            return
+        value = self.dust_value(result)
+        if value is None:
+            return
+
+        if self._history and (result.timestamp - self._history[-1][0]).total_seconds() > self.time_stale:
+            _logger.debug("trend is outdated (last result %s)", self._history[-1][0])
+            self.reset()  # a gap (hold, deactivation, errors): the old trend doesn't matter anymore
+        self._add_value(result.timestamp, value)
+        self._history.append((result.timestamp, value))
+
+    def _add_value(self, timestamp, value):
+        pass
+
+    def reset(self):
+        self._history.clear()
+
+    @abc.abstractmethod
+    def interval(self, last_result: Result, now) -> float:
+        """:return: seconds until the next measurement"""
+        raise NotImplementedError()
+
+    def is_stale(self, result: Result, now) -> bool:
+        if result is None or result.timestamp is None:
+            return True
+        age = (now - result.timestamp).total_seconds()
+        return age > self.time_stale
+
+    @classmethod
+    def dust_value(cls, result: Result):
+        values = [v for v in [result.pm10, result.pm25] if v is not None]
+        return max(values) if values else None
+
+    def interval_of_level(self, value) -> float:
+        """linear between `time_interval_max` (dust lower) and `time_interval_min` (dust upper)"""
+        max_time = self._time_interval_max
+        min_time = self._time_interval_min
+
+        if value <= self._dust_lower:
+            return max_time
+        elif value >= self._dust_upper:
+            return min_time
+        else:
+            m = (max_time - min_time) / (self._dust_lower - self._dust_upper)
+            n = max_time - m * self._dust_lower
+            return m * value + n
+
+
+class LinearIntervalPolicy(IntervalPolicy):
+    """The last dust value is mapped linearly between the interval limits (former behaviour)."""
+
+    def interval(self, last_result: Result, now) -> float:
+        if last_result is None or last_result.state != ResultState.OK:
+            return self._time_interval_max
+        if self.is_stale(last_result, now):
+            return self._time_interval_max
+
+        return self.interval_of_level(self.dust_value(last_result))
+
+
+class TrendIntervalPolicy(IntervalPolicy):
+    """
+    Exponentially weighted level and slope of the dust values (time aware, irregular intervals):
+    - a rising trend (slope above threshold) shortens the interval to the minimum (catch smoke fast),
+    - stable or falling readings lengthen the interval step by step up to the maximum (save laser hours),
+    - otherwise the interval follows the (peak preserving) level like the linear policy.
+    """
+
+    DEFAULT_EWMA_TIME = 600  # seconds, time constant of the level
+    SLOPE_EWMA_FACTOR = 0.25  # the slope reacts faster (time constant: factor * ewma time)
+    DEFAULT_RISE_THRESHOLD = 1.0  # µg/m³ per minute
+    STABLE_FACTOR = 0.25  # slope below STABLE_FACTOR * rise threshold is stable (or falling)
+    STABLE_GROWTH = 1.5  # interval growth per stable reading
+
+    def __init__(self):
+        super().__init__()
+        self._ewma_time = self.DEFAULT_EWMA_TIME
+        self._rise_threshold = self.DEFAULT_RISE_THRESHOLD
+
+        self._level = None
+        self._slope = 0.0  # µg/m³ per minute
+        self._last_value = None
+        self._last_timestamp = None
+        self._interval = None
+
+    def config(self, config):
+        self._ewma_time = Config.get_float(config, ConfigKey.INTERVAL_EWMA_TIME, self.DEFAULT_EWMA_TIME)
+        self._rise_threshold = Config.get_float(config, ConfigKey.INTERVAL_RISE_THRESHOLD,
+                                                self.DEFAULT_RISE_THRESHOLD)
+        if self._ewma_time <= 0 or self._rise_threshold <= 0:
+            raise ValueError(f"'{ConfigKey.INTERVAL_EWMA_TIME.value}' and "
+                             f"'{ConfigKey.INTERVAL_RISE_THRESHOLD.value}' must be > 0!")
+
+    @property
+    def level(self):
+        return self._level
+
+    @property
+    def slope(self):
+        return self._slope
+
+    def reset(self):
+        super().reset()
+        self._level = None
+        self._slope = 0.0
+        self._last_value = None
+        self._last_timestamp = None
+        self._interval = None
+
+    def _add_value(self, timestamp, value):
+        if self._level is None:
+            self._level = value
+            self._slope = 0.0
+        else:
+            seconds = max(1.0, (timestamp - self._last_timestamp).total_seconds())
+            slope = (value - self._level) / seconds * 60  # deviation from the smoothed level per minute
+            alpha = 1 - math.exp(-seconds / self._ewma_time)
+            self._level += alpha * (value - self._level)
+            alpha = 1 - math.exp(-seconds / (self._ewma_time * self.SLOPE_EWMA_FACTOR))
+            self._slope += alpha * (slope - self._slope)
+
+        self._last_value = value
+        self._last_timestamp = timestamp
+        if self._time_interval_max is not None:
+            self._interval = self._next_interval(self._interval)
+
+    def _next_interval(self, previous):
+        """the interval after the latest result, `previous`: the one after the result before (grown if stable)"""
+        if self._slope >= self._rise_threshold:
+            return self._time_interval_min
+
+        interval = self.interval_of_level(max(self._level, self._last_value))
+        if self._slope < self.STABLE_FACTOR * self._rise_threshold and previous is not None:
+            interval = max(interval, min(self._time_interval_max, previous * self.STABLE_GROWTH))
+        return interval
+
+    def interval(self, last_result: Result, now) -> float:
+        if self._level is None or self._last_timestamp is None or \
+                (now - self._last_timestamp).total_seconds() > self.time_stale:
+            return self._time_interval_max  # outdated, reset with the next result (see `add_result`)
+
+        if self._interval is None:
+            return self._next_interval(None)
+        return min(self._time_interval_max, max(self._time_interval_min, self._interval))  # limits may have changed
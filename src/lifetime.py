@@ -0,0 +1,153 @@
+import datetime
+import json
+import logging
+import os
+
+from src.config import Config
+from src.config_key import ConfigKey
+
+_logger = logging.getLogger(__name__)
+
+
+class SensorLifetime:
+    """
+    Persisted on time (laser and fan) of a sensor and a governor, which spreads the rated lifetime over a target
+    lifetime:
+    - intervals are stretched while more on time was used than planned (see `stretch_interval`),
+    - the sensor is kept running between two cycles only if the gap costs less than a wake up (see `keep_warm`).
+    """
+
+    DEFAULT_RATED_HOURS = 8000  # laser lifetime (datasheet)
+    SAVE_INTERVAL = 600  # seconds; the state file is written at most every SAVE_INTERVAL (SD card wear)
+    GRACE_TIME = 86400  # seconds of service before the consumption is judged (or projected)
+    MAX_INTERVAL_STRETCH = 10  # the governor stretches an interval up to this factor
+
+    def __init__(self):
+        self._path = None
+        self._rated_hours = self.DEFAULT_RATED_HOURS
+        self._target_years = None
+
+        self._on_seconds = 0.0
+        self._first_use = None  # type: datetime.datetime
+        self._time_saved = None  # type: datetime.datetime
+        self._dirty = False
+
+    def config(self, config):
+        self._path = Config.get_str(config, ConfigKey.LIFETIME_FILE)
+        self._rated_hours = Config.get_float(config, ConfigKey.LIFETIME_RATED_HOURS, self._rated_hours)
+        self._target_years = Config.get_float(config, ConfigKey.LIFETIME_TARGET, self._target_years)
+        if self._rated_hours <= 0 or (self._target_years is not None and self._target_years <= 0):
+            raise ValueError(f"'{ConfigKey.LIFETIME_RATED_HOURS.value}' and "
+                             f"'{ConfigKey.LIFETIME_TARGET.value}' must be > 0!")
+        if self._target_years is not None and not self._path:
+            raise ValueError(f"'{ConfigKey.LIFETIME_TARGET.value}' requires '{ConfigKey.LIFETIME_FILE.value}'!")
+
+    @property
+    def enabled(self):
+        """on time is persisted (and published)"""
+        return bool(self._path)
+
+    @property
+    def on_hours(self):
+        return self._on_seconds / 3600
+
+    @property
+    def first_use(self):
+        return self._first_use
+
+    def open(self, now):
+        """loads the persisted state (a missing file starts a new sensor)"""
+        self._first_use = now
+        if not self._path or not os.path.isfile(self._path):
+            return
+
+        try:
+            with open(self._path, "r") as file:
+                data = json.load(file)
+            self._on_seconds = float(data["on_seconds"])
+            self._first_use = datetime.datetime.fromtimestamp(float(data["first_use"]), tz=now.tzinfo)
+        except (OSError, ValueError, KeyError, TypeError) as ex:
+            raise ValueError(f"cannot read lifetime file '{self._path}' ({ex})!")
+
+        _logger.info("sensor on time: %.1f h since %s", self.on_hours, self._first_use.isoformat())
+
+    def close(self, now):
+        if self._dirty:
+            self.save(now)
+
+    def save(self, now):
+        if not self._path:
+            return
+
+        data = {"on_seconds": round(self._on_seconds, 1), "first_use": self._first_use.timestamp()}
+        temp_path = self._path + ".tmp"
+        try:
+            with open(temp_path, "w") as file:
+                json.dump(data, file)
+            os.replace(temp_path, self._path)  # atomic, no corrupted file on power loss
+            self._dirty = False
+        except OSError as ex:
+            _logger.error("cannot write lifetime file '%s': %s", self._path, ex)
+        self._time_saved = now
+
+    def add_on_time(self, seconds, now):
+        if seconds <= 0:
+            return
+        self._on_seconds += seconds
+        self._dirty = True
+        if self._time_saved is None or (now - self._time_saved).total_seconds() >= self.SAVE_INTERVAL:
+            self.save(now)
+
+    def _service_seconds(self, now):
+        return max((now - self._first_use).total_seconds(), self.GRACE_TIME)
+
+    def pressure(self, now) -> float:
+        """used on time / planned on time so far (> 1: ahead of the budget), 1 without target"""
+        if self._target_years is None or self._first_use is None:
+            return 1.0
+
+        target_seconds = self._target_years * 365.25 * 86400
+        planned = self._rated_hours * 3600 * self._service_seconds(now) / target_seconds
+        return self._on_seconds / planned
+
+    def duty_budget(self, now) -> float:
+        """allowed share of on time for the rest of the target lifetime (1: no limit)"""
+        if self._target_years is None or self._first_use is None:
+            return 1.0
+
+        target_end = self._first_use + datetime.timedelta(days=self._target_years * 365.25)
+        remaining_time = (target_end - now).total_seconds()
+        if remaining_time <= 0:
+            return 1.0
+        remaining_on_time = self._rated_hours * 3600 - self._on_seconds
+        return min(1.0, max(0.0, remaining_on_time / remaining_time))
+
+    def stretch_interval(self, interval, time_on, now):
+        """
+        :param interval: planned seconds between two measurements
+        :param time_on: seconds the sensor runs per cycle
+        :return: interval, stretched to the remaining duty budget while more on time was used than planned
+        """
+        if self.pressure(now) <= 1:
+            return interval
+
+        duty = self.duty_budget(now)
+        stretched = time_on / duty if duty > 0 else float("inf")
+        return min(max(interval, stretched), interval * self.MAX_INTERVAL_STRETCH)
+
+    def keep_warm(self, gap, wake_up_cost, now) -> bool:
+        """
+        :param gap: seconds between the end of a cycle and the next wake up
+        :param wake_up_cost: on time (seconds), which a wake up is worth (fan start, warm up)
+        :return: True if the sensor should keep running instead of sleeping
+        """
+        return gap * max(1.0, self.pressure(now)) <= wake_up_cost
+
+    def end_of_life(self, now):
+        """projected date when the rated hours are used up (current consumption), None if unknown"""
+        if self._first_use is None or self._on_seconds <= 0:
+            return None
+
+        duty = self._on_seconds / self._service_seconds(now)
+        remaining_on_time = max(0.0, self._rated_hours * 3600 - self._on_seconds)
+        return now + datetime.timedelta(seconds=remaining_on_time / duty)
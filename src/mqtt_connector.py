@@ -1,13 +1,17 @@
 import logging
-import os
-import signal
+import random
 import threading
-from queue import Queue, Empty
+import time
 
 import paho.mqtt.client as mqtt
 
 from src.config import Config
 from src.config_key import ConfigKey
+from src.inbox import Inbox
+from src.mqtt_v5 import Client as MqttV5Client
+from src.mqtt_v5 import TopicAliases, create_connect_properties, create_publish_properties
+from src.outbox import Outbox
+from src.publish_tracker import PublishTracker
 
 _logger = logging.getLogger(__name__)
 
@@ -19,6 +23,27 @@ class MqttConnector:
     DEFAULT_MQTT_PORT_SSL = 8883
     DEFAULT_MQTT_PROTOCOL = 4  # 5==MQTTv5, default: 4==MQTTv311, 3==MQTTv31
     DEFAULT_MQTT_QUALITY = 1
+    DEFAULT_MQTT_SESSION_EXPIRY = 86400  # seconds (MQTTv5), the broker keeps subscriptions and queued messages
+
+    # MQTTv5 explicitly refused before the first connection: reconnect with MQTTv311 (not if the broker is unreachable)
+    PROTOCOL_REFUSED = (1, 132)  # MQTTv3 "unacceptable protocol version", MQTTv5 "unsupported protocol version"
+
+    # refused connects, which don't heal by retrying (e.g. bad credentials); others (e.g. 3 "server unavailable") do
+    CONNECT_FATAL = (1, 2, 4, 5,  # MQTTv3: protocol version, identifier rejected, bad credentials, not authorised
+                     129, 130, 132, 133, 134, 135, 138, 140)  # MQTTv5: malformed, protocol error, ..., bad auth method
+
+    # reconnect (paho network thread): exponential backoff from a jittered min. delay, reset on success
+    RECONNECT_MIN_DELAY = 1
+    DEFAULT_RECONNECT_MAX_DELAY = 120
+    RECONNECT_JITTER = 0.5  # min. delay * uniform(1 - jitter, 1 + jitter), clients don't reconnect in lockstep
+
+    # another client with the same id: both kick each other out, the connections last only a short time
+    DUPLICATE_CLIENT_TIME = 10  # seconds; a connection lost earlier counts as short
+    DUPLICATE_CLIENT_COUNT = 5  # short connections in a row
+    DUPLICATE_CLIENT_DELAY = 300  # min. reconnect delay while suspected
+
+    DEFAULT_MAX_INFLIGHT = 20  # messages sent but not acknowledged (paho queues more; outbox batches are bounded)
+    DEFAULT_FLUSH_TIMEOUT = 5  # seconds to wait for outstanding acks on close
 
     def __init__(self):
         self._mqtt = None
@@ -26,14 +51,37 @@ class MqttConnector:
 
         self._channel = None
         self._last_will = None
+        self._last_will_sent = set()  # channels
         self._qos = None
         self._retain = None
 
-        self._message_queue = Queue()  # synchronized
+        self._inbox = Inbox()  # synchronized, latest message per topic
         self._lock = threading.Lock()
+        self._notify_callback = None  # called from MQTT thread on connect and incoming messages
 
         self._stored_thread_rc = 0
         self._disconnect_error_count = 0
+        self._short_connection_count = 0
+        self._time_connected = None  # monotonic
+        self._reconnect_max_delay = self.DEFAULT_RECONNECT_MAX_DELAY
+        self._subscriptions = []  # renewed after a reconnect without a stored session
+
+        self._outbox = None  # type: Outbox
+        self._outbox_sent_id = 0  # stored messages up to this id were handed to paho (resent by paho itself)
+        self._outbox_more = False  # the last batch was limited, more stored messages are waiting
+        self._outbox_resend_id = None  # set on disconnect: stored QoS 0 messages after this id were lost
+        self._tracker = PublishTracker(self.DEFAULT_MAX_INFLIGHT)
+        self._flush_timeout = self.DEFAULT_FLUSH_TIMEOUT
+
+        self._connect_params = None  # see `_connect`
+        self._protocol = self.DEFAULT_MQTT_PROTOCOL
+        self._protocol_fallback = True
+        self._protocol_refused = False
+        self._connected_once = False
+        self._topic_aliases = TopicAliases()
+        self._topic_alias = True
+        self._message_expiry = None  # seconds (results)
+        self._user_properties = []  # [(name, value)]
 
     def is_open(self):
         self.check_connection_error()
@@ -47,11 +95,31 @@ class MqttConnector:
         self._qos = Config.get_int(config, ConfigKey.MQTT_QUALITY, self.DEFAULT_MQTT_QUALITY)
         self._retain = Config.get_bool(config, ConfigKey.MQTT_RETAIN, False)
 
+        max_inflight = Config.get_int(config, ConfigKey.MQTT_MAX_INFLIGHT, self.DEFAULT_MAX_INFLIGHT)
+        self._tracker = PublishTracker(max_inflight)
+        self._flush_timeout = Config.get_float(config, ConfigKey.MQTT_FLUSH_TIMEOUT, self.DEFAULT_FLUSH_TIMEOUT)
+
+        outbox_path = Config.get_str(config, ConfigKey.MQTT_OUTBOX)
+        if outbox_path:
+            self._outbox = Outbox(outbox_path, Config.get_int(config, ConfigKey.MQTT_OUTBOX_MAX,
+                                                              Outbox.DEFAULT_MAX_MESSAGES))
+
         host = Config.get_str(config, ConfigKey.MQTT_HOST)
         port = Config.get_int(config, ConfigKey.MQTT_PORT)
         protocol = Config.get_int(config, ConfigKey.MQTT_PROTOCOL, self.DEFAULT_MQTT_PROTOCOL)
         keepalive = Config.get_int(config, ConfigKey.MQTT_KEEPALIVE, self.DEFAULT_MQTT_KEEPALIVE)
         client_id = Config.get_str(config, ConfigKey.MQTT_CLIENT_ID)
+        clean_session = Config.get_bool(config, ConfigKey.MQTT_CLEAN_SESSION, False)
+        session_expiry = Config.get_int(config, ConfigKey.MQTT_SESSION_EXPIRY, self.DEFAULT_MQTT_SESSION_EXPIRY)
+        self._protocol_fallback = Config.get_bool(config, ConfigKey.MQTT_PROTOCOL_FALLBACK, True)
+        self._topic_alias = Config.get_bool(config, ConfigKey.MQTT_TOPIC_ALIAS, True)
+        self._message_expiry = Config.get_int(config, ConfigKey.MQTT_MESSAGE_EXPIRY)
+        user_properties = config.get(ConfigKey.MQTT_USER_PROPERTIES.value) or {}
+        if not isinstance(user_properties, dict):
+            raise ValueError(f"'{ConfigKey.MQTT_USER_PROPERTIES.value}' must be a dict (name: value)!")
+        self._user_properties = [(str(k), str(v)) for k, v in user_properties.items()]
+        self._reconnect_max_delay = Config.get_float(config, ConfigKey.MQTT_RECONNECT_MAX_DELAY,
+                                                     self.DEFAULT_RECONNECT_MAX_DELAY)
         ssl_ca_certs = Config.get_str(config, ConfigKey.MQTT_SSL_CA_CERTS)
         ssl_certfile = Config.get_str(config, ConfigKey.MQTT_SSL_CERTFILE)
         ssl_keyfile = Config.get_str(config, ConfigKey.MQTT_SSL_KEYFILE)
@@ -68,11 +136,38 @@ class MqttConnector:
                 ConfigKey.MQTT_HOST.value, ConfigKey.MQTT_CLIENT_ID.value
             ))
 
-        self._mqtt = mqtt.Client(client_id=client_id, protocol=protocol)
-
-        if is_ssl:
+        self._connect_params = {
+            "host": host, "port": port, "keepalive": keepalive, "client_id": client_id,
+            "clean_session": clean_session, "session_expiry": session_expiry,
+            "ssl": (ssl_ca_certs, ssl_certfile, ssl_keyfile) if is_ssl else None, "ssl_insecure": ssl_insecure,
+            "user": (user_name, user_pwd) if user_name or user_pwd else None,
+        }
+        self._connect(protocol)
+
+    def _connect(self, protocol):
+        """creates the paho client and connects (asynchronously, see `_on_connect`)"""
+        params = self._connect_params
+        self._protocol = protocol
+        self._connected_once = False
+        self._protocol_refused = False
+
+        # persistent session: the broker keeps the subscriptions and queues messages (QoS > 0) while disconnected
+        connect_args = {}
+        if protocol == mqtt.MQTTv5:
+            self._mqtt = MqttV5Client(client_id=params["client_id"], protocol=protocol)
+            connect_args["clean_start"] = params["clean_session"]
+            if not params["clean_session"]:
+                connect_args["properties"] = create_connect_properties(params["session_expiry"])
+        else:
+            self._mqtt = mqtt.Client(client_id=params["client_id"], clean_session=params["clean_session"],
+                                     protocol=protocol)
+        self._mqtt.reconnect_delay_set(*self.reconnect_delay())  # once, paho doubles the delay with every attempt
+        self._mqtt.max_inflight_messages_set(self._tracker.max_inflight)
+
+        if params["ssl"]:
+            ssl_ca_certs, ssl_certfile, ssl_keyfile = params["ssl"]
             self._mqtt.tls_set(ca_certs=ssl_ca_certs, certfile=ssl_certfile, keyfile=ssl_keyfile)
-            if ssl_insecure:
+            if params["ssl_insecure"]:
                 _logger.info("disabling SSL certificate verification")
                 self._mqtt.tls_insecure_set(True)
 
@@ -83,68 +178,171 @@ class MqttConnector:
 
         self.set_last_will()
 
-        if user_name or user_pwd:
-            self._mqtt.username_pw_set(user_name, user_pwd)
-        self._mqtt.connect_async(host, port=port, keepalive=keepalive)
+        if params["user"]:
+            self._mqtt.username_pw_set(*params["user"])
+        self._mqtt.connect_async(params["host"], port=params["port"], keepalive=params["keepalive"], **connect_args)
         self._mqtt.loop_start()
 
+    def _fall_back_to_v311(self):
+        """MQTTv5 was refused by the broker: a new client (the old one never connected); main thread only"""
+        _logger.warning("MQTTv5 refused, falling back to MQTTv311 (no topic aliases, message expiry, ...)")
+        self._mqtt.disconnect()  # no further reconnects of the old client
+        self._mqtt.loop_stop()
+        self._tracker = PublishTracker(self._tracker.max_inflight)  # queued messages are dropped with the client
+        self._outbox_sent_id = 0
+        self._connect(mqtt.MQTTv311)
+
     def close(self):
-        if self._mqtt is not None:
-            self.publish_last_will()
-
-            self._mqtt.loop_stop()
-            self._mqtt.disconnect()
-            self._mqtt.loop_forever()  # will block until disconnect complete
-            self._mqtt = None
-            _logger.debug("mqtt closed.")
-
-    def publish_last_will(self):
-        if self._last_will:
-            if not self.is_open():
-                _logger.error("cannot sent last will (not open)!")
-            else:
-                self.publish(self._last_will)
+        try:
+            if self._mqtt is not None:
+                try:
+                    self.publish_last_will()
+                    self.flush(self._flush_timeout)
+                    for qos, histogram in sorted(self._tracker.histograms().items()):
+                        _logger.info("publish latency (qos=%s): %s", qos, histogram)
+                    _logger.info("incoming messages: %s", self._inbox)
+                finally:
+                    self._mqtt.loop_stop()
+                    self._mqtt.disconnect()
+                    self._mqtt.loop_forever()  # will block until disconnect complete
+                    self._mqtt = None
+                    _logger.debug("mqtt closed.")
+        finally:
+            if self._outbox is not None:
+                self._outbox.close()  # not confirmed messages are sent with the next start
+                self._outbox = None
+
+    def flush(self, timeout) -> bool:
+        """
+        Waits (bounded) until the broker acknowledged all sent messages.
+        :return: True if nothing is outstanding
+        """
+        flushed = len(self._tracker) == 0
+        if not flushed and self.is_open():
+            flushed = self._tracker.wait_empty(timeout)
+
+        for message in self._tracker.pending():
+            _logger.warning("message %s to '%s' not acknowledged: '%s'", message.mid, message.topic, message.payload)
+        return flushed
+
+    def publish_last_will(self, channel: str = None):
+        """publishes the last will once per channel (shared connection: each sensor, then `close`)"""
+        if channel is None:
+            channel = self._channel
+        if not self._last_will or not channel or channel in self._last_will_sent:
+            return
+
+        if not self.is_open():
+            _logger.error("cannot sent last will (not open)!")
+        else:
+            self.publish(self._last_will, channel)
+            self._last_will_sent.add(channel)
+
+    def set_notify_callback(self, callback):
+        """Callback (without parameters) is called (from the MQTT thread) on connect and for every incoming message."""
+        self._notify_callback = callback
+
+    def _notify(self):
+        if self._notify_callback is not None:
+            self._notify_callback()
 
     def check_connection_error(self):
         with self._lock:
             stored_thread_rc = self._stored_thread_rc
+            fall_back = (self._protocol == mqtt.MQTTv5 and self._protocol_fallback and not self._connected_once
+                         and self._mqtt is not None and self._protocol_refused)
+
+        if fall_back:
+            self._fall_back_to_v311()
+            return
 
         if stored_thread_rc != 0:
             raise RuntimeError(f"MQTT connection error rc={stored_thread_rc}!")
 
     def get_messages(self):
-        messages = []
-
+        """:return: the latest incoming message of each topic since the last call"""
         self.check_connection_error()
+        self.send_outbox()
+        return self._inbox.take()
 
-        while True:
-            try:
-                message = self._message_queue.get(block=False)
-                messages.append(message)
-            except Empty:
-                break
-
-        return messages
-
-    def publish(self, message: str, channel: str = None, retain: bool = None):
-        if not self.is_open:
-            raise RuntimeError("mqtt is not connected!")
-
+    def publish(self, message: str, channel: str = None, retain: bool = None, store: bool = False):
+        """
+        :param store: results: recorded in the outbox (if configured) before publishing, kept until confirmed
+        """
         if channel is None:
             channel = self._channel
         if retain is None:
             retain = self._retain
 
-        self._mqtt.publish(
-            topic=channel,
+        if store and self._outbox is not None:
+            self._outbox.add(channel, message, self._qos, retain)
+            _logger.info("store to '%s': '%s'", channel, message)
+            self.send_outbox()
+            return
+
+        if not self.is_open():
+            _logger.warning("mqtt is not connected, message to '%s' is queued in memory only", channel)
+
+        time_sent = self._tracker.clock()
+        topic, properties = self._publish_properties(channel, self._qos, store)
+        info = self._mqtt.publish(
+            topic=topic,
             payload=message,
             qos=self._qos,
-            retain=retain
+            retain=retain,
+            properties=properties
         )
+        if info.rc == mqtt.MQTT_ERR_SUCCESS or self._qos > 0:  # qos > 0: queued and resent by paho
+            self._tracker.sent(info.mid, channel, message, self._qos, time_sent)
         _logger.info("publish to '%s': '%s'", channel, message)
 
+    def send_outbox(self):
+        """Hands the next stored messages (oldest first, bounded batch) to paho, if connected."""
+        if self._outbox is None or not self.is_open():
+            return
+
+        with self._lock:
+            resend_id, self._outbox_resend_id = self._outbox_resend_id, None
+        if resend_id is not None:
+            self._outbox_sent_id = min(self._outbox_sent_id, resend_id)
+
+        free = self._tracker.free
+        if free <= 0:
+            return
+
+        batch = self._outbox.pending(self._outbox_sent_id, free)
+        self._outbox_more = len(batch) >= free
+        inflight_ids = self._tracker.row_ids() if resend_id is not None else ()
+        for row_id, topic, payload, qos, retain in batch:
+            if row_id in inflight_ids:
+                self._outbox_sent_id = row_id  # QoS > 0, still queued by paho
+                continue
+            time_sent = self._tracker.clock()
+            alias_topic, properties = self._publish_properties(topic, qos, True)
+            info = self._mqtt.publish(topic=alias_topic, payload=payload, qos=qos, retain=retain, properties=properties)
+            if info.rc != mqtt.MQTT_ERR_SUCCESS and qos == 0:
+                _logger.warning("sending stored message %s failed (rc=%s), retried later", row_id, info.rc)
+                break  # qos > 0: queued and resent by paho
+
+            self._outbox_sent_id = row_id
+            if self._tracker.sent(info.mid, topic, payload, qos, time_sent, row_id) is not None:
+                self._outbox.confirm(row_id)  # acknowledged before `publish` returned
+
+    def _publish_properties(self, topic, qos, result):
+        """
+        :return: (topic, MQTTv5 properties or None); the topic is empty if an alias of the connection replaces it
+        """
+        if self._protocol != mqtt.MQTTv5:
+            return topic, None
+
+        alias = None
+        if self._topic_alias and qos == 0:  # QoS > 0: paho resends verbatim after a reconnect, the aliases are lost
+            topic, alias = self._topic_aliases.resolve(topic)
+        message_expiry = self._message_expiry if result else None
+        return topic, create_publish_properties(message_expiry, self._user_properties, alias)
+
     def set_last_will(self):
-        if self._last_will:
+        if self._last_will and self._channel:
             self._mqtt.will_set(
                 topic=self._channel,
                 payload=self._last_will,
@@ -162,50 +360,104 @@ class MqttConnector:
                 text = "could not subscripte to mqtt #{} ({})".format(result, subscriptions)
                 raise RuntimeError(text)
 
+            self._subscriptions = subscriptions
             _logger.info("subscripted to MQTT channels (%s)", channels)
 
-    def _on_connect(self, _mqtt_client, _userdata, flags, rc):
+    def _on_connect(self, mqtt_client, _userdata, flags, rc, properties=None):
         """MQTT callback is called when client connects to MQTT server."""
+        if rc == 0 and self._protocol == mqtt.MQTTv5:
+            self._topic_aliases.reset(getattr(properties, "TopicAliasMaximum", 0) if self._topic_alias else 0)
+
         with self._lock:
             if rc == 0:
                 self._open = True
+                self._connected_once = True
+                self._time_connected = time.monotonic()
                 _logger.info("successfully connected to MQTT: flags=%s, rc=%s", flags, rc)
-            else:
+                if self._subscriptions and not flags.get("session present"):
+                    mqtt_client.subscribe(self._subscriptions)  # reconnected, the broker forgot the session
+            elif self._protocol == mqtt.MQTTv5 and self._protocol_fallback and not self._connected_once \
+                    and rc in self.PROTOCOL_REFUSED:
+                self._protocol_refused = True  # handled in the main thread, see `check_connection_error`
+                _logger.warning("MQTTv5 refused: rc=%s", rc)
+            elif rc in self.CONNECT_FATAL:
                 self._open = False
-                self._stored_thread_rc = rc
+                self._stored_thread_rc = rc  # raised in the main thread, see `check_connection_error`
                 _logger.error("connect to MQTT failed: flags=%s, rc=%s", flags, rc)
-                self.check_connection_error()
+            else:
+                self._open = False
+                _logger.warning("connect to MQTT refused: rc=%s, retrying", rc)  # paho reconnects (backoff)
+
+        self._notify()
 
-    def _on_disconnect(self, _mqtt_client, _userdata, rc):
-        """MQTT callback for when the client disconnects from the MQTT server."""
-        disconnect_error_count = 0
-        disconnect_error_kill_at = 10
+    def _on_disconnect(self, mqtt_client, _userdata, rc, _properties=None):
+        """
+        MQTT callback for when the client disconnects from the MQTT server. Unexpected disconnects are reconnected
+        by the paho network thread (backoff, see `reconnect_delay`), the process (sensor) carries on meanwhile.
+        """
+        self._topic_aliases.reset(0)  # aliases are valid for one connection
+
+        # paho drops QoS 0 messages with the connection: free their slots, stored ones are sent again
+        lost = self._tracker.discard(0)
+        lost_row_ids = [m.row_id for m in lost if m.row_id is not None]
+        if lost:
+            _logger.warning("%s QoS 0 message(s) lost with the connection (%s stored)", len(lost), len(lost_row_ids))
 
         with self._lock:
             self._open = False
+            if lost_row_ids:
+                resend_id = min(lost_row_ids) - 1
+                if self._outbox_resend_id is not None:
+                    resend_id = min(resend_id, self._outbox_resend_id)
+                self._outbox_resend_id = resend_id
             if rc == 0:
                 _logger.info("disconnected from MQTT: rc=%s", rc)
-            else:
-                self._disconnect_error_count += 1
-                disconnect_error_count = self._disconnect_error_count
-                self._stored_thread_rc = rc
-                _logger.error("Unexpectedly disconnected from MQTT broker: rc=%s (kill when %s >= %s)",
-                              rc, disconnect_error_count, disconnect_error_kill_at)
-
-        # no way to get out of the process if there is another client with same name
-        if disconnect_error_count >= disconnect_error_kill_at:
-            os.kill(os.getpid(), signal.SIGKILL)
+                return
+
+            self._disconnect_error_count += 1
+            disconnect_error_count = self._disconnect_error_count
+            connected_for = time.monotonic() - self._time_connected if self._time_connected is not None else None
+            self._time_connected = None
+            was_duplicate_client = self._short_connection_count >= self.DUPLICATE_CLIENT_COUNT
+            if connected_for is not None and connected_for < self.DUPLICATE_CLIENT_TIME:
+                self._short_connection_count += 1
+            elif connected_for is not None:
+                self._short_connection_count = 0
+            short_connection_count = self._short_connection_count
+
+        duplicate_client = short_connection_count >= self.DUPLICATE_CLIENT_COUNT
+        if duplicate_client:
+            # no way to get out if there is another client with same name: back off long, both stay alive
+            _logger.error("%s short MQTT connections in a row, is another client using the same client id?",
+                          short_connection_count)
+        if duplicate_client != was_duplicate_client:
+            # only on changes, setting the delay resets paho's backoff (a successful connect does it anyway)
+            mqtt_client.reconnect_delay_set(*self.reconnect_delay(duplicate_client))
+
+        _logger.error("unexpectedly disconnected from MQTT broker: rc=%s (%s. time)", rc, disconnect_error_count)
+
+    def reconnect_delay(self, duplicate_client=False):
+        """:return: (jittered min. delay, max. delay) of the exponential reconnect backoff (paho)"""
+        min_delay = self.DUPLICATE_CLIENT_DELAY if duplicate_client else self.RECONNECT_MIN_DELAY
+        min_delay *= random.uniform(1 - self.RECONNECT_JITTER, 1 + self.RECONNECT_JITTER)
+        return min_delay, max(min_delay, self._reconnect_max_delay)
 
     def _on_message(self, mqtt_client, userdata, message):
         """MQTT callback when a message is received from MQTT server"""
         try:
             _logger.debug('_on_message: topic="%s" payload="%s"', message.topic, message.payload)
             if message is not None:
-                self._message_queue.put(message)
+                self._inbox.put(message)
+                self._notify()
         except Exception as ex:
             _logger.exception(ex)
 
-    @classmethod
-    def _on_publish(cls, _mqtt_client, _userdata, mid):
+    def _on_publish(self, _mqtt_client, _userdata, mid):
         """MQTT callback is invoked when message was successfully sent to the MQTT server."""
         _logger.debug("published message %s", str(mid))
+
+        message = self._tracker.acked(mid)
+        if message is not None and message.row_id is not None and self._outbox is not None:
+            self._outbox.confirm(message.row_id)
+        if self._outbox_more and len(self._tracker) == 0:
+            self._notify()  # send the next batch
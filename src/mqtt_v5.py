@@ -0,0 +1,83 @@
+import struct
+import threading
+
+import paho.mqtt.client as mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+
+
+class TopicAliases:
+    """
+    Topic aliases (MQTTv5, client to broker) of one network connection: the first publish to a topic carries the
+    topic and its alias, the following ones only the alias (empty topic). Reset with every connect, up to the
+    broker's "Topic Alias Maximum" (0: not supported).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._maximum = 0
+        self._aliases = {}  # topic => alias
+
+    def reset(self, maximum: int):
+        with self._lock:
+            self._maximum = max(0, int(maximum or 0))
+            self._aliases = {}
+
+    def resolve(self, topic: str):
+        """:return: (topic to send ("" if aliased), alias or None)"""
+        with self._lock:
+            alias = self._aliases.get(topic)
+            if alias is not None:
+                return "", alias
+            if len(self._aliases) < self._maximum:
+                alias = len(self._aliases) + 1
+                self._aliases[topic] = alias
+                return topic, alias
+        return topic, None
+
+
+class Client(mqtt.Client):
+    """
+    MQTTv5 client, which reports a MQTTv3 CONNACK (broker without MQTTv5, e.g. "unacceptable protocol version") to
+    `on_connect` as plain int return code. paho fails to parse it as MQTTv5 reason code and the network thread dies.
+    """
+
+    def _handle_connack(self):
+        if self._protocol != mqtt.MQTTv5 or self._in_packet["remaining_length"] != 2:
+            return super()._handle_connack()  # MQTTv5 CONNACKs contain at least the properties length
+
+        flags, result = struct.unpack("!BB", self._in_packet["packet"])
+        self._easy_log(mqtt.MQTT_LOG_DEBUG, "Received MQTTv3 CONNACK (%s, %s)", flags, result)
+        with self._callback_mutex:
+            if self.on_connect:
+                with self._in_callback_mutex:
+                    try:
+                        self.on_connect(self, self._userdata, {"session present": flags & 0x01}, result or 1, None)
+                    except Exception as err:
+                        self._easy_log(mqtt.MQTT_LOG_ERR, "Caught exception in on_connect: %s", err)
+        return mqtt.MQTT_ERR_PROTOCOL
+
+
+def create_publish_properties(message_expiry=None, user_properties=None, topic_alias=None):
+    """:return: MQTTv5 PUBLISH properties, None if there are none"""
+    if message_expiry is None and not user_properties and topic_alias is None:
+        return None
+
+    properties = Properties(PacketTypes.PUBLISH)
+    if message_expiry is not None:
+        properties.MessageExpiryInterval = message_expiry
+    if user_properties:
+        properties.UserProperty = list(user_properties)
+    if topic_alias is not None:
+        properties.TopicAlias = topic_alias
+    return properties
+
+
+def create_connect_properties(session_expiry=None):
+    """:return: MQTTv5 CONNECT properties, None if there are none"""
+    if session_expiry is None:
+        return None
+
+    properties = Properties(PacketTypes.CONNECT)
+    properties.SessionExpiryInterval = session_expiry
+    return properties
@@ -0,0 +1,79 @@
+import logging
+import sqlite3
+import threading
+import time
+
+_logger = logging.getLogger(__name__)
+
+
+class Outbox:
+    """
+    Persistent store-and-forward queue (SQLite) for published results: messages are recorded before they are
+    published and deleted when the broker confirmed them (see `MqttConnector`). Survives broker outages and restarts,
+    the number of stored messages is bounded (the oldest are dropped).
+    """
+
+    DEFAULT_MAX_MESSAGES = 100000
+
+    def __init__(self, path, max_messages=DEFAULT_MAX_MESSAGES):
+        if max_messages < 1:
+            raise ValueError(f"outbox size must be >= 1 ({max_messages})!")
+
+        self._path = path
+        self._max_messages = max_messages
+        self._lock = threading.Lock()  # confirmed from the MQTT thread
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")  # less writes (SD card)
+        self._db.execute("CREATE TABLE IF NOT EXISTS outbox ("
+                         "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                         "created REAL NOT NULL, "
+                         "topic TEXT NOT NULL, "
+                         "payload BLOB NOT NULL, "
+                         "qos INTEGER NOT NULL, "
+                         "retain INTEGER NOT NULL)")
+
+        count = len(self)
+        if count:
+            _logger.info("outbox '%s': %s messages to be sent", path, count)
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def add(self, topic: str, payload, qos: int, retain: bool) -> int:
+        """:return: id of the stored message"""
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+
+        with self._lock:
+            cursor = self._db.execute("INSERT INTO outbox (created, topic, payload, qos, retain) "
+                                      "VALUES (?, ?, ?, ?, ?)", (time.time(), topic, payload, qos, int(retain)))
+            row_id = cursor.lastrowid
+
+            dropped = self._db.execute("DELETE FROM outbox WHERE id <= ?", (row_id - self._max_messages,)).rowcount
+            if dropped > 0:
+                _logger.warning("outbox full, %s oldest messages dropped!", dropped)
+
+        return row_id
+
+    def confirm(self, row_id: int):
+        """the message was delivered"""
+        with self._lock:
+            if self._db is not None:
+                self._db.execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+
+    def pending(self, after_id: int = 0, limit: int = 100):
+        """
+        :return: the oldest (not confirmed) messages with id > after_id (bounded batch)
+        @rtype: list(tuple(int, str, bytes, int, bool)) - (id, topic, payload, qos, retain)
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT id, topic, payload, qos, retain FROM outbox WHERE id > ? "
+                                    "ORDER BY id LIMIT ?", (after_id, limit)).fetchall()
+        return [(row_id, topic, payload, qos, bool(retain)) for row_id, topic, payload, qos, retain in rows]
@@ -1,17 +1,23 @@
 import datetime
 import logging
 import signal
-import time
 from enum import IntEnum, Enum
 
 from tzlocal import get_localzone
 
 from src.config import Config
 from src.config_key import ConfigKey
+from src.deactivation_schedule import DeactivationSchedule
+from src.deadband import Deadband
+from src.encoder import JsonEncoder, create_encoder
+from src.interval_policy import IntervalPolicy, LinearIntervalPolicy
+from src.lifetime import SensorLifetime
 from src.mqtt_connector import MqttConnector
 from src.result import Result, ResultState
+from src.scheduler import Scheduler
 from src.sensor import Sensor, MockSensor
-from src.subscription import OnHoldSubscription, RangeSubscription
+from src.serial_worker import SerialWorker
+from src.subscription import OnHoldSubscription, RangeSubscription, SubscriptionIndex, TriggerSubscription
 
 _logger = logging.getLogger(__name__)
 
@@ -40,14 +46,29 @@ class LoopParams:
         self.use_switch_actor = False
         self.on_hold = False
         self.missing_subscriptions = False
+        self.time_transition = None  # seconds until the deactivation schedule changes (None: not within a week)
 
         # time limits
         self.tlim_interval = None
         self.tlim_interval_min = None
         self.tlim_switching_on = None
         self.tlim_warming_up = None
+        self.tlim_measuring = None
+
+        # convergence based early end of the warm up (streaming)
+        self.warm_up_check = False
+        self.tlim_warming_up_min = None
+        self.tlim_next_check = None
+        self.time_warm_up_start = None  # time counter when the sensor was woken up
+        self.time_warm_up = None  # seconds the sensor was actually warmed up
         self.tlim_cool_down = None
 
+        # burst sampling (query mode)
+        self.count_measurements = 1
+        self.time_between_measurements = 0
+        self.tlim_next_sample = None
+        self.samples_taken = 0
+
         self.sensor_sleep = True
 
 
@@ -56,9 +77,10 @@ class Process:
     DEFAULT_TIME_COOL_DOWN = 2
     DEFAULT_TIME_INTERVAL_MAX = 180
     DEFAULT_TIME_INTERVAL_MIN = 15
-    DEFAULT_TIME_STEP = 0.05
     DEFAULT_TIME_SWITCHING_ON = 7
-    DEFAULT_TIME_WARM_UP = 30
+    DEFAULT_TIME_WARM_UP = 30  # upper bound if the warm up ends on converged readings (`warm_up_tolerance`)
+    DEFAULT_TIME_WARM_UP_MIN = 10
+    DEFAULT_TIME_MEASURING = 10  # measuring window in streaming mode
 
     DEFAULT_COUNT_MEASUREMENTS = 1
     DEFAULT_TIME_BETWEEN_MEASUREMENT = 5
@@ -69,21 +91,52 @@ class Process:
     DEFAULT_ADAPTIVE_DUST_UPPER = 80
     DEFAULT_ADAPTIVE_DUST_LOWER = 10  # µg/m³
 
-    NO_SENSOR_CLOSE_BELOW = 15
-
-    def __init__(self):
+    NO_SENSOR_CLOSE_BELOW = 15  # default wake up cost (seconds), see `SensorLifetime.keep_warm`
+    WORK_PERIOD_ON_TIME = 30  # seconds the sensor runs per work period (pushed frame)
+
+    TIME_WAIT_FOR_MQTT_CONNECT = 15
+    WORK_PERIOD_FRAME_MARGIN = 60  # seconds, tolerated delay of pushed frames (sensor warms up 30s by itself)
+    TIME_WAIT_FOR_RETAINED = 1
+    TIME_WAIT_FOR_IO = 60  # max. sleep while sensor I/O is running (woken up when done)
+    TIME_STOP_WORKER = 1
+    TIME_TRANSITION_TOLERANCE = 1  # seconds; a deactivation transition just ahead counts as passed (timer precision)
+    TIME_WARM_UP_CHECK = 1  # seconds between the convergence checks while warming up (streamed frames: 1 Hz)
+
+    def __init__(self, scheduler: Scheduler = None, mqtt: MqttConnector = None):
+        """
+        :param scheduler: shared scheduler (several processes, see `Bridge`); otherwise an own one is created
+        :param mqtt: shared MQTT connection (see `Bridge`); otherwise an own connection is opened by `open`
+        """
         self._sensor = None
-        self._mqtt = None
+        self._worker = None  # blocking sensor I/O, None: executed inline (mocked sensor)
+        self._io_key = None
+        self._io_future = None
+        self._mqtt = mqtt
+        self._shared = mqtt is not None
         self._shutdown = False
 
-        self._time_step = self.DEFAULT_TIME_STEP
-        self._time_counter = 0
+        self._scheduler = scheduler if scheduler is not None else Scheduler()
+        self._time_start = 0  # monotonic clock
+        self._time_counter = 0  # seconds since last timer reset
+
+        # state machine, see `start` and `step`
+        self._state = SensorState.START
+        self._loop_params = None  # type: LoopParams
+        self._first_measurement = True
+        self._work_period_on_hold = None
+        self._hold_changed = False  # subscription messages arrived, see `_check_hold_change`
+        self._warm_start = False  # the next cycle reuses the running sensor (no warm up), see `_check_trigger`
 
         self._time_cool_down = self.DEFAULT_TIME_COOL_DOWN
         self._time_interval_max = self.DEFAULT_TIME_INTERVAL_MAX
         self._time_interval_min = self.DEFAULT_TIME_INTERVAL_MIN
         self._time_switching_on = self.DEFAULT_TIME_SWITCHING_ON
         self._time_warm_up = self.DEFAULT_TIME_WARM_UP
+        self._time_warm_up_min = self.DEFAULT_TIME_WARM_UP_MIN
+        self._warm_up_tolerance = None  # relative; None: fixed warm up time
+        self._time_measuring = self.DEFAULT_TIME_MEASURING
+        self._count_measurements = self.DEFAULT_COUNT_MEASUREMENTS
+        self._time_between_measurements = self.DEFAULT_TIME_BETWEEN_MEASUREMENT
 
         # µg/m³
         self._adaptive_dust_upper = self.DEFAULT_ADAPTIVE_DUST_UPPER
@@ -93,27 +146,39 @@ class Process:
         self._temp_range = None
 
         self._mqtt_out_actor = None
+        self._mqtt_out_state = None
+        self._result_topics = [(self._mqtt_out_state, JsonEncoder())]  # [(topic, Encoder)]; results go to all
 
         self._mqtt_in_hold = OnHoldSubscription(ConfigKey.MQTT_CHANNEL_IN_HOLD)
         self._mqtt_in_humi = RangeSubscription(ConfigKey.MQTT_CHANNEL_IN_HUMI)
         self._mqtt_in_temp = RangeSubscription(ConfigKey.MQTT_CHANNEL_IN_TEMP)
-        self._subscriptions = [self._mqtt_in_hold, self._mqtt_in_humi, self._mqtt_in_temp]
+        self._mqtt_in_trigger = TriggerSubscription(ConfigKey.MQTT_CHANNEL_IN_TRIGGER)
+        self._subscriptions = [self._mqtt_in_hold, self._mqtt_in_humi, self._mqtt_in_temp, self._mqtt_in_trigger]
+        self._subscription_index = SubscriptionIndex()  # built by `start`
 
         self._last_result = None  # type: Result
+        self._interval_policy = LinearIntervalPolicy()  # type: IntervalPolicy
+
+        self._deactivation = DeactivationSchedule()
 
-        self._deactivation_ranges = None
+        self._lifetime = SensorLifetime()
+        self._deadband = Deadband()
+        self._wake_up_cost = self.NO_SENSOR_CLOSE_BELOW
+        self._sensor_on_since = None  # time counter, None: sensor is sleeping (or switched off)
 
-        signal.signal(signal.SIGINT, self._shutdown_gracefully)
-        signal.signal(signal.SIGTERM, self._shutdown_gracefully)
+        if not self._shared:
+            signal.signal(signal.SIGINT, self._shutdown_gracefully)
+            signal.signal(signal.SIGTERM, self._shutdown_gracefully)
 
     def _shutdown_gracefully(self, sig, _frame):
         _logger.debug("shutdown signaled (%s)", sig)
         self._shutdown = True
+        self._scheduler.wake_up()
 
     def open(self, config):
         _logger.debug("open(%s)", config)
 
-        if self._mqtt is not None or self._sensor is not None:
+        if (self._mqtt is not None and not self._shared) or self._sensor is not None:
             raise RuntimeError("Initialisation alread done!")
 
         self._time_cool_down = Config.get_float(config, ConfigKey.TIME_COOL_DOWN, self._time_cool_down)
@@ -121,23 +186,58 @@ class Process:
         self._time_interval_min = Config.get_float(config, ConfigKey.TIME_INTERVAL_MIN, self._time_interval_min)
         self._time_switching_on = Config.get_float(config, ConfigKey.TIME_WAIT_FOR_ACTOR, self._time_switching_on)
         self._time_warm_up = Config.get_float(config, ConfigKey.TIME_WARM_UP, self._time_warm_up)
+        self._time_warm_up_min = Config.get_float(config, ConfigKey.TIME_WARM_UP_MIN, self._time_warm_up_min)
+        self._warm_up_tolerance = Config.get_float(config, ConfigKey.WARM_UP_TOLERANCE, self._warm_up_tolerance)
+        if self._warm_up_tolerance is not None and self._warm_up_tolerance < 0:
+            raise ValueError(f"'{ConfigKey.WARM_UP_TOLERANCE.value}' must be >= 0!")
+        self._time_measuring = Config.get_float(config, ConfigKey.TIME_MEASURING, self._time_measuring)
+        self._count_measurements = Config.get_int(config, ConfigKey.COUNT_MEASUREMENTS, self._count_measurements)
+        self._time_between_measurements = Config.get_float(config, ConfigKey.TIME_BETWEEN_MEASUREMENTS,
+                                                           self._time_between_measurements)
+        if self._count_measurements < 1:
+            raise ValueError(f"'{ConfigKey.COUNT_MEASUREMENTS.value}' must be >= 1!")
 
         self._adaptive_dust_upper = self.DEFAULT_ADAPTIVE_DUST_UPPER
         self._adaptive_dust_lower = self.DEFAULT_ADAPTIVE_DUST_LOWER
-        self._deactivation_ranges = config.get(ConfigKey.DEACTIVATION_TIME_RANGES.value)
+        self._interval_policy = IntervalPolicy.create(config)
+        self._deactivation = DeactivationSchedule.compile(
+            ranges=config.get(ConfigKey.DEACTIVATION_TIME_RANGES.value),
+            rules=config.get(ConfigKey.DEACTIVATION_SCHEDULE.value),
+            exceptions=config.get(ConfigKey.DEACTIVATION_EXCEPTIONS.value))
+        self._deactivation.build(self._now())
+
+        self._wake_up_cost = Config.get_float(config, ConfigKey.WAKE_UP_COST, self._wake_up_cost)
+        self._lifetime = SensorLifetime()
+        self._lifetime.config(config)
+        self._deadband = Deadband()
+        self._deadband.config(config)
+        self._lifetime.open(self._now())
 
         self._mqtt_in_hold.config(config.get(ConfigKey.MQTT_CHANNEL_IN_HOLD.value))
         self._mqtt_in_humi.config(config.get(ConfigKey.MQTT_CHANNEL_IN_HUMI.value))
         self._mqtt_in_humi.set_range(config.get(ConfigKey.HUMIDITY_RANGE.value) or self.DEFAULT_SENSOR_HUMI_RANGE)
         self._mqtt_in_temp.config(config.get(ConfigKey.MQTT_CHANNEL_IN_TEMP.value))
         self._mqtt_in_temp.set_range(config.get(ConfigKey.TEMPERATURE_RANGE.value) or self.DEFAULT_SENSOR_TEMP_RANGE)
+        self._mqtt_in_trigger.config(config.get(ConfigKey.MQTT_CHANNEL_IN_TRIGGER.value))
 
         self._mqtt_out_actor = config.get(ConfigKey.MQTT_CHANNEL_OUT_ACTOR.value)
-
-        self._mqtt = self._create_mqtt_connector(config)
-        self._mqtt.open(config)
+        self._mqtt_out_state = Config.get_str(config, ConfigKey.MQTT_CHANNEL_OUT_STATE)
+        self._result_topics = [(self._mqtt_out_state,
+                                create_encoder(Config.get_str(config, ConfigKey.RESULT_ENCODER, JsonEncoder.name)))]
+        extra_topics = config.get(ConfigKey.MQTT_CHANNELS_OUT_RESULT.value) or {}
+        if not isinstance(extra_topics, dict):
+            raise ValueError(f"'{ConfigKey.MQTT_CHANNELS_OUT_RESULT.value}' must be a dict (topic: encoder)!")
+        self._result_topics.extend((topic, create_encoder(name)) for topic, name in extra_topics.items())
+
+        if not self._shared:
+            self._mqtt = self._create_mqtt_connector(config)
+            self._mqtt.set_notify_callback(self._scheduler.wake_up)
+            self._mqtt.open(config)
 
         self._sensor = self._create_sensor(config)
+        if self._sensor.blocking_io:
+            port = Config.get_str(config, ConfigKey.SERIAL_PORT)
+            self._worker = SerialWorker(f"sds011-{port}", self._scheduler.wake_up)
 
     @classmethod
     def _create_mqtt_connector(cls, _config):
@@ -150,109 +250,451 @@ class Process:
         return sensor_class(config)
 
     def close(self):
+        self._count_on_time(switched_off=True)
+        self._lifetime.close(self._now())
+
+        worker_stopped = True
+        if self._worker is not None:
+            if self._worker.busy and self._sensor:
+                self._sensor.cancel_io()  # e.g. hanging read, don't delay the shutdown
+            worker_stopped = self._worker.stop(self.TIME_STOP_WORKER)
+            self._worker = None
+            self._io_future = None
+            self._io_key = None
+
         if self._sensor:
-            self._sensor.close()
+            if worker_stopped:
+                self._sensor.close()
+            self._sensor.disconnect()
             self._sensor = None
 
         if self._mqtt is not None:
-            self._switch_sensor(SwitchSensor.OFF)
-            self._mqtt.close()
+            if self._shared:
+                self._switch_sensor(SwitchSensor.OFF)
+                self._mqtt.publish_last_will(self._mqtt_out_state)
+            else:
+                self._mqtt.set_notify_callback(None)  # no late wake ups of the closed scheduler
+                self._switch_sensor(SwitchSensor.OFF)
+                self._mqtt.close()
             self._mqtt = None
 
-    def _wait(self, seconds: float):
-        """time.sleep but overwriteable for tests"""
-        time.sleep(seconds)
-        self._time_counter += seconds
+        if not self._shared:
+            self._scheduler.close()
+
+    @property
+    def topics(self):
+        """subscribed MQTT topics"""
+        return list(dict.fromkeys(s.topic for s in self._subscriptions if s.topic))  # a topic may be shared
+
+    def _clock(self):
+        """monotonic clock - overwriteable for tests"""
+        return self._scheduler.now()
+
+    def _wait(self, seconds: float, fds=None):
+        """Sleeps until timeout, wake up (MQTT message, shutdown) or readable fds - overwriteable for tests"""
+        self._scheduler.wait(seconds, fds)
+        self.update_timer()
+
+    def update_timer(self):
+        """updates the time counter after waiting (shared scheduler)"""
+        self._time_counter = self._clock() - self._time_start
 
     def _reset_timer(self):
         """reset time counter - overwriteable for tests"""
+        self._time_start = self._clock()
         self._time_counter = 0
 
     def run(self):
-        first_meassurement = True
-        loop_params = None
-        state = SensorState.START
-
         try:
             self._wait_for_mqtt_connection()
 
-            self._reset_timer()  # better testing
+            self.start()
             while not self._shutdown:
+                self._process_mqtt_messages()
+                timeout, fds = self.step()
+                self._wait(timeout, fds)
+
+        finally:
+            self.close()
 
+    def start(self):
+        """Resets the state machine, call after the MQTT connection is established."""
+        self._state = SensorState.START
+        self._loop_params = None
+        self._first_measurement = True
+        self._work_period_on_hold = None
+        self._hold_changed = False
+        self._warm_start = False
+        self._subscription_index = SubscriptionIndex(self._subscriptions)
+        self._reset_timer()  # better testing
+
+    def step(self):
+        """
+        Executes all due state transitions.
+        :return: (seconds until the next transition, file descriptors to wait for (or None))
+        """
+        if self._sensor.work_period:
+            self._hold_changed = False  # loop params are determined with every step anyway
+            if self._mqtt_in_trigger.take_request():
+                _logger.info("measurement request ignored, the sensor cycles by itself (work period)")
+            return self._step_work_period()
+        else:
+            self._check_hold_change()
+            self._check_trigger()
+            return self._step_cycles()
+
+    def _check_hold_change(self):
+        """
+        Subscription changes are evaluated at once, not with the next cycle: going on hold interrupts the running
+        cycle (e.g. warm up), clearing the last hold condition starts a measurement cycle right away.
+        """
+        if not self._hold_changed or self._io_future is not None:  # pending sensor I/O: checked when done
+            return
+        self._hold_changed = False
+
+        if self._loop_params is None or self._state == SensorState.START:
+            return
+
+        on_hold = self._deactivation_state()[0] or self._subscriptions_on_hold()[0]
+        if on_hold != self._loop_params.on_hold:
+            _logger.info("%s at once (state %s)", "go on hold" if on_hold else "resume", self._state.name)
+            self._restart_cycle()
+
+    def _run_io(self, key, func, *args, **kwargs):
+        """
+        Runs blocking sensor I/O on the worker thread; the scheduler is woken up when done.
+        :param key: identifies the call site, a pending job must be completed before anything else is started
+        :return: (True, result) when done (exceptions are re-raised here) or (False, None) while running
+        """
+        if self._worker is None:
+            return True, func(*args, **kwargs)
+
+        if self._io_future is None:
+            self._io_key = key
+            self._io_future = self._worker.submit(func, *args, **kwargs)
+        elif self._io_key != key:
+            raise RuntimeError(f"sensor I/O '{self._io_key}' is still running ('{key}')!")
+
+        if not self._io_future.done():
+            return False, None
+
+        future = self._io_future
+        self._io_future = None
+        self._io_key = None
+        return True, future.result()
+
+    def _close_sensor(self, loop_params):
+        """ends a cycle (worker thread)"""
+        if loop_params.on_hold:
+            self._sensor.open(warm_up=False)  # prepare for sending to sleep!
+        self._sensor.close(sleep=loop_params.sensor_sleep)
+
+    def _step_cycles(self):
+        """the host controls every measurement cycle (wake up, warm up, measure, sleep)"""
+        while True:
+            state = self._state
+            loop_params = self._loop_params
+
+            if state == SensorState.START:
+                loop_params = self._determine_loop_params()
+                self._loop_params = loop_params
+                self._warm_start = False
+
+            if loop_params.on_hold:
                 if state == SensorState.START:
-                    self._process_mqtt_messages()
-                    loop_params = self._determine_loop_params()
-
-                if loop_params.on_hold:
-                    if state == SensorState.START:
-                        if loop_params.use_switch_actor:
-                            self._switch_sensor(SwitchSensor.OFF)
-                            state = SensorState.SWITCHED_OFF
-                        else:
-                            self._sensor.open(warm_up=False)  # prepare for sending to sleep!
-                            state = SensorState.COOLING_DOWN
-
-                        # skip the first deativation message, hopefully all subscriptions are complete the next time
-                        if not first_meassurement or not loop_params.missing_subscriptions:
-                            self._handle_result(loop_params, Result(ResultState.DEACTIVATED))
-                else:
-                    if state == SensorState.START:
-                        if loop_params.use_switch_actor:
-                            self._switch_sensor(SwitchSensor.ON)
-                            state = SensorState.SWITCHING_ON
-                        else:
-                            state = SensorState.CONNECTING
-
-                    if state == SensorState.SWITCHING_ON and self._time_counter >= loop_params.tlim_switching_on:
-                        state = SensorState.CONNECTING
+                    if loop_params.use_switch_actor:
+                        self._sensor.disconnect()  # serial device will be gone
+                        self._switch_sensor(SwitchSensor.OFF)
+                        self._count_on_time(switched_off=True)
+                        state = SensorState.SWITCHED_OFF
+                    else:
+                        state = SensorState.COOLING_DOWN
 
-                    if state == SensorState.CONNECTING:
-                        self._sensor.open(warm_up=True)
-                        state = SensorState.WARMING_UP
+                    # skip the first deativation message, hopefully all subscriptions are complete the next time
+                    if not self._first_measurement or not loop_params.missing_subscriptions:
+                        self._handle_result(loop_params, Result(ResultState.DEACTIVATED))
+            else:
+                if state == SensorState.START:
+                    if loop_params.use_switch_actor:
+                        self._switch_sensor(SwitchSensor.ON)
+                        state = SensorState.SWITCHING_ON
+                    else:
+                        state = SensorState.CONNECTING
 
-                    if state == SensorState.WARMING_UP and self._time_counter >= loop_params.tlim_warming_up:
-                        result = self._sensor.measure()
+                if state == SensorState.SWITCHING_ON and self._time_counter >= loop_params.tlim_switching_on:
+                    state = SensorState.CONNECTING
+
+                if state == SensorState.CONNECTING:
+                    done, _ = self._run_io("open", self._sensor.open, warm_up=True)
+                    if not done:
+                        self._state = state
+                        return self.TIME_WAIT_FOR_IO, None
+                    state = SensorState.WARMING_UP
+                    loop_params.time_warm_up_start = self._time_counter
+                    if self._sensor_on_since is None:
+                        self._sensor_on_since = self._time_counter
+
+                if state == SensorState.WARMING_UP and self._warm_up_settled(loop_params):
+                    self._end_warm_up_early(loop_params)
+
+                if state == SensorState.WARMING_UP and self._time_counter >= loop_params.tlim_warming_up:
+                    loop_params.time_warm_up = self._time_counter - loop_params.time_warm_up_start
+                    self._sensor.start_measuring(loop_params.tlim_measuring - loop_params.tlim_warming_up)
+                    state = SensorState.MEASURING
+
+                if state == SensorState.MEASURING:
+                    if not self._take_burst_samples(loop_params):
+                        self._state = state
+                        return self.TIME_WAIT_FOR_IO, None
+                    if self._time_counter >= loop_params.tlim_measuring:
+                        done, result = self._run_io("measure", self._sensor.measure)
+                        if not done:
+                            self._state = state
+                            return self.TIME_WAIT_FOR_IO, None
+                        result.warm_up = round(loop_params.time_warm_up, 1)
                         self._handle_result(loop_params, result)
                         state = SensorState.COOLING_DOWN
+                    else:
+                        self._sensor.collect()
+
+            if state == SensorState.COOLING_DOWN and \
+                    (self._time_counter >= loop_params.tlim_cool_down or loop_params.on_hold):
+                done, _ = self._run_io("close", self._close_sensor, loop_params)
+                if not done:
+                    self._state = state
+                    return self.TIME_WAIT_FOR_IO, None
+                if loop_params.sensor_sleep:
+                    self._count_on_time(switched_off=True)
+                state = SensorState.WAITING_FOR_RESET
+
+            if self._time_counter >= loop_params.tlim_interval:  # any state
+                self._restart_cycle()
+                continue
+
+            self._state = state
+            return self._next_time_limit(state, loop_params) - self._time_counter, None
+
+    def _check_trigger(self):
+        """
+        Serves a measurement request (trigger topic) with the lowest latency of the current state: requests during
+        a running measurement are merged into it, a still running sensor (cooling down, kept warm) is measured
+        without warm up, otherwise a new cycle starts at once.
+        """
+        if self._io_future is not None:  # pending sensor I/O: checked when done
+            return
+        if not self._mqtt_in_trigger.take_request():
+            return
+
+        if self._loop_params is None or self._state == SensorState.START:
+            return  # a cycle starts anyway
+        if self._loop_params.on_hold:
+            _logger.info("measurement request ignored, on hold")
+            return
+        if self._state in [SensorState.SWITCHING_ON, SensorState.CONNECTING, SensorState.WARMING_UP,
+                           SensorState.MEASURING]:
+            _logger.debug("measurement request merged into the running measurement")
+            return
+
+        self._warm_start = self._sensor_on_since is not None
+        _logger.info("measurement requested (state %s, warm sensor: %s)", self._state.name, self._warm_start)
+        self._restart_cycle()
+
+    def _restart_cycle(self):
+        self._first_measurement = False
+        self._count_on_time()
+        self._reset_timer()
+        if self._sensor_on_since is not None:
+            self._sensor_on_since = 0  # kept running over the next cycle
+        self._state = SensorState.START
+
+    def _step_work_period(self):
+        """
+        The sensor cycles by itself (hardware work period) and pushes one frame per period. The process just waits
+        for incoming frames (serial port) or MQTT messages - no timer per cycle. On hold the sensor is sent to sleep.
+        """
+        if self._io_future is not None:
+            done, _ = self._run_io(self._io_key, None)  # the state was already changed when the job was started
+            if not done:
+                return self.TIME_WAIT_FOR_IO, None
+
+        loop_params = self._determine_loop_params()
+        self._loop_params = loop_params
+        time_frame_timeout = self._sensor.work_period * 60 + self.WORK_PERIOD_FRAME_MARGIN
+
+        if loop_params.on_hold != self._work_period_on_hold:
+            self._work_period_on_hold = loop_params.on_hold
+            if loop_params.on_hold:
+                if loop_params.use_switch_actor:
+                    self._sensor.disconnect()  # serial device will be gone
+                    self._switch_sensor(SwitchSensor.OFF)
+                    self._state = SensorState.SWITCHED_OFF
+                else:
+                    self._state = SensorState.WAITING_FOR_RESET
+                    self._run_io("sleep", self._close_sensor, loop_params)
+
+                # skip the first deativation message, hopefully all subscriptions are complete the next time
+                if not self._first_measurement or not loop_params.missing_subscriptions:
+                    self._handle_result(loop_params, Result(ResultState.DEACTIVATED))
+            else:
+                if loop_params.use_switch_actor:
+                    self._switch_sensor(SwitchSensor.ON)
+                    self._state = SensorState.SWITCHING_ON
+                else:
+                    self._state = SensorState.CONNECTING
+                self._reset_timer()
+            self._first_measurement = False
+
+        if loop_params.on_hold:
+            return loop_params.tlim_interval, None  # re-check the hold conditions (or woken up by MQTT)
+
+        if self._state == SensorState.SWITCHING_ON:
+            if self._time_counter < loop_params.tlim_switching_on:
+                return loop_params.tlim_switching_on - self._time_counter, None
+            self._state = SensorState.CONNECTING
+
+        if self._state == SensorState.CONNECTING:
+            self._reset_timer()
+            self._state = SensorState.MEASURING
+            done, _ = self._run_io("start", self._sensor.start_work_period)
+            if not done:
+                return self.TIME_WAIT_FOR_IO, None
+
+        for result in self._sensor.read_reports():
+            if result.state == ResultState.OK:
+                self._lifetime.add_on_time(self.WORK_PERIOD_ON_TIME, self._now())
+            self._handle_result(loop_params, result)
+            self._reset_timer()
+
+        if self._time_counter >= time_frame_timeout:
+            self._handle_result(loop_params, self._sensor.report_missing())
+            self._reset_timer()
+            done, _ = self._run_io("start", self._sensor.start_work_period)
+            if not done:
+                return self.TIME_WAIT_FOR_IO, None
+
+        timeout = time_frame_timeout - self._time_counter
+        if loop_params.time_transition is not None:
+            timeout = min(timeout, loop_params.time_transition)  # deactivated at the boundary
+        fileno = self._sensor.fileno()
+        return timeout, [fileno] if fileno is not None else None
+
+    def _warm_up_settled(self, loop_params) -> bool:
+        """checks the streamed readings for convergence (after the minimal warm up), see `Sensor.warm_up_settled`"""
+        if not loop_params.warm_up_check or self._time_counter < loop_params.tlim_next_check:
+            return False
 
-                if state == SensorState.COOLING_DOWN and \
-                        (self._time_counter >= loop_params.tlim_cool_down or loop_params.on_hold):
-                    self._sensor.close(sleep=loop_params.sensor_sleep)
-                    state = SensorState.WAITING_FOR_RESET
+        if self._sensor.warm_up_settled(self._warm_up_tolerance):
+            return True
 
-                if self._time_counter >= loop_params.tlim_interval:  # any state
-                    first_meassurement = False
-                    self._reset_timer()
-                    state = SensorState.START
+        loop_params.tlim_next_check = self._time_counter + self.TIME_WARM_UP_CHECK
+        return False
 
-                self._wait(self._time_step)
+    def _end_warm_up_early(self, loop_params):
+        """the measuring window starts now, the following time limits move ahead (the interval stays)"""
+        saved = loop_params.tlim_warming_up - self._time_counter
+        if saved <= 0:
+            return
+
+        _logger.debug("readings converged, warm up ends %.1fs early", saved)
+        loop_params.tlim_warming_up -= saved
+        loop_params.tlim_measuring -= saved
+        loop_params.tlim_next_sample -= saved
+        loop_params.tlim_cool_down -= saved
+        loop_params.tlim_interval_min -= saved
+        loop_params.warm_up_check = False
+
+    def _count_on_time(self, switched_off=False):
+        """adds the sensor on time up to now to the (persisted) lifetime counter"""
+        if self._sensor_on_since is None:
+            return
+
+        self._lifetime.add_on_time(self._time_counter - self._sensor_on_since, self._now())
+        self._sensor_on_since = None if switched_off else self._time_counter
+
+    def _take_burst_samples(self, loop_params) -> bool:
+        """
+        takes the due samples of a burst (query mode), `Sensor.measure` consolidates them
+        :return: False while a sample is being taken (worker thread)
+        """
+        if loop_params.count_measurements <= 1:
+            return True
+
+        # at the end of the measuring window all missing samples are taken (no sample gets lost)
+        while loop_params.samples_taken < loop_params.count_measurements and \
+                (self._time_counter >= loop_params.tlim_next_sample or
+                 self._time_counter >= loop_params.tlim_measuring):
+            done, _ = self._run_io("sample", self._sensor.sample)
+            if not done:
+                return False
+            loop_params.samples_taken += 1
+            # computed from the start, no accumulated floating point errors
+            loop_params.tlim_next_sample = \
+                loop_params.tlim_warming_up + loop_params.samples_taken * loop_params.time_between_measurements
+
+        return True
 
-        finally:
-            self.close()
+    @classmethod
+    def _next_time_limit(cls, state, loop_params):
+        """Time counter value of the next state transition (there is nothing to do before)."""
+        time_limit = loop_params.tlim_interval
+
+        if state == SensorState.SWITCHING_ON:
+            time_limit = min(time_limit, loop_params.tlim_switching_on)
+        elif state == SensorState.WARMING_UP:
+            time_limit = min(time_limit, loop_params.tlim_warming_up)
+            if loop_params.warm_up_check:
+                time_limit = min(time_limit, loop_params.tlim_next_check)
+        elif state == SensorState.MEASURING:
+            time_limit = min(time_limit, loop_params.tlim_measuring)
+            if 1 < loop_params.count_measurements and loop_params.samples_taken < loop_params.count_measurements:
+                time_limit = min(time_limit, loop_params.tlim_next_sample)
+        elif state == SensorState.COOLING_DOWN:
+            time_limit = min(time_limit, loop_params.tlim_cool_down)
+
+        return time_limit
 
     def _determine_loop_params(self):
         lp = LoopParams()
 
-        if self._active_deactivation_ranges():
+        deactivated, lp.time_transition = self._deactivation_state()
+        if deactivated:
             lp.on_hold = True
 
         if not lp.on_hold:
-            for subscription in self._subscriptions:
-                if not subscription.verify():
-                    lp.on_hold = True
-                    if subscription.missing_value():
-                        lp.missing_subscriptions = True
+            lp.on_hold, lp.missing_subscriptions = self._subscriptions_on_hold()
 
         lp.use_switch_actor = bool(self._mqtt_out_actor)
 
         # may be changed dynamically
         lp.tlim_switching_on = self._time_switching_on if lp.use_switch_actor else 0
-        lp.tlim_warming_up = self._time_warm_up + lp.tlim_switching_on
-        lp.tlim_cool_down = lp.tlim_warming_up + self._time_cool_down
-        lp.tlim_interval_min = self._time_warm_up + self._time_cool_down + lp.tlim_switching_on
+        if self._sensor.streaming:
+            time_measuring = self._time_measuring
+        else:
+            lp.count_measurements = self._count_measurements
+            lp.time_between_measurements = self._time_between_measurements
+            time_measuring = (lp.count_measurements - 1) * lp.time_between_measurements
+
+        time_warm_up = self._time_warm_up
+        if self._warm_start:  # the sensor is still running (measurement request)
+            lp.tlim_switching_on = 0
+            time_warm_up = 0
+        lp.tlim_warming_up = time_warm_up + lp.tlim_switching_on
+        lp.tlim_measuring = lp.tlim_warming_up + time_measuring
+        lp.tlim_next_sample = lp.tlim_warming_up
+
+        lp.warm_up_check = self._sensor.streaming and self._warm_up_tolerance is not None and \
+            self._time_warm_up_min < time_warm_up
+        lp.tlim_warming_up_min = min(self._time_warm_up_min, time_warm_up) + lp.tlim_switching_on
+        lp.tlim_next_check = lp.tlim_warming_up_min
+        lp.tlim_cool_down = lp.tlim_measuring + self._time_cool_down
+        lp.tlim_interval_min = lp.tlim_cool_down
 
         if lp.on_hold:
             lp.tlim_interval = self._time_interval_max
+            if deactivated and lp.time_transition is not None:
+                lp.tlim_interval = lp.time_transition  # sleep straight until the end of the deactivation
+            elif lp.time_transition is not None:
+                lp.tlim_interval = min(lp.tlim_interval, lp.time_transition)
         else:
             lp.tlim_interval = self._calc_interval_time()
             if lp.tlim_interval_min > lp.tlim_interval:
@@ -260,47 +702,51 @@ class Process:
                               lp.tlim_interval_min, lp.tlim_interval)
                 lp.tlim_interval = lp.tlim_interval_min
 
+            time_on = lp.tlim_interval_min - lp.tlim_switching_on
+            interval = self._lifetime.stretch_interval(lp.tlim_interval, time_on, self._now())
+            if interval > lp.tlim_interval:
+                _logger.debug("time interval is stretched to %.0f (%.0f) to save the sensor lifetime",
+                              interval, lp.tlim_interval)
+                lp.tlim_interval = interval
+
+            if lp.time_transition is not None and lp.time_transition < lp.tlim_interval:
+                # the next cycle starts at the deactivation boundary (at the earliest after the running one)
+                lp.tlim_interval = max(lp.tlim_interval_min, lp.time_transition)
+
         if lp.on_hold:
             lp.sensor_sleep = True
         else:
             diff_reset = lp.tlim_interval - lp.tlim_interval_min
-            lp.sensor_sleep = diff_reset > self.NO_SENSOR_CLOSE_BELOW
+            lp.sensor_sleep = not self._lifetime.keep_warm(diff_reset, self._wake_up_cost, self._now())
 
         return lp
 
-    def _calc_interval_time(self):
-        time_interval = self._time_interval_max
-
-        if self._last_result is None or self._last_result.state != ResultState.OK:
-            return time_interval
-
-        # reset old measurment
-        diff = (self._last_result.timestamp - self._now()).total_seconds()
-        if diff > 300:
-            return time_interval
-
-        max_time = self._time_interval_max
-        min_time = self._time_interval_min
-
-        pm_upper = self._adaptive_dust_upper  # µg/m³
-        pm_lower = self._adaptive_dust_lower  # µg/m³
+    def _subscriptions_on_hold(self):
+        """:return: (on hold by a subscription, a subscription value is still missing)"""
+        on_hold = False
+        missing_subscriptions = False
+        for subscription in self._subscriptions:
+            if not subscription.verify():
+                on_hold = True
+                if subscription.missing_value():
+                    missing_subscriptions = True
+        return on_hold, missing_subscriptions
 
-        pm_value = max([self._last_result.pm10, self._last_result.pm25])
-
-        if pm_value <= pm_lower:
-            time_interval = max_time
-        elif pm_value >= pm_upper:
-            time_interval = min_time
-        else:
-            m = (max_time - min_time) / (pm_lower - pm_upper)
-            n = max_time - m * pm_lower
-            time_interval = m * pm_value + n
-
-        return time_interval
+    def _calc_interval_time(self):
+        self._interval_policy.set_limits(self._time_interval_min, self._time_interval_max,
+                                         self._adaptive_dust_lower, self._adaptive_dust_upper)
+        return self._interval_policy.interval(self._last_result, self._now())
 
     def _handle_result(self, loop_params, result):
         result.timestamp = self._now()
         self._last_result = result
+        self._interval_policy.add_result(result)
+
+        if self._lifetime.enabled:
+            self._count_on_time()
+            result.on_hours = round(self._lifetime.on_hours, 2)
+            end_of_life = self._lifetime.end_of_life(result.timestamp)
+            result.end_of_life = end_of_life.date().isoformat() if end_of_life else None
 
         if self._last_result and self._last_result.state == ResultState.ERROR:
             # pump potential humidity out of sensor!?
@@ -308,68 +754,65 @@ class Process:
             # quick retry
             loop_params.tlim_interval = loop_params.tlim_interval_min
 
-        message = result.create_message()
-        self._mqtt.publish(message)
+        if not self._deadband.accept(result):
+            return
+
+        for topic, encoder in self._result_topics:
+            self._mqtt.publish(encoder.encode(result), topic, store=True)
 
     def _wait_for_mqtt_connection(self):
         """wait for getting mqtt connect callback called"""
         self._reset_timer()
         while not self._shutdown:
             # make sure mqtt was connected - notified via callback
-            if self._time_counter > 15:
-                raise RuntimeError("Couldn't connect to MQTT, callback was not called!?")
-
-            self._wait(self._time_step)
             if self._mqtt.is_open():
-                topics = [s.topic for s in self._subscriptions if s.topic]
-                self._mqtt.subscribe(topics)
+                self._mqtt.subscribe(self.topics)
                 break
 
+            if self._time_counter >= self.TIME_WAIT_FOR_MQTT_CONNECT:
+                raise RuntimeError("Couldn't connect to MQTT, callback was not called!?")
+
+            self._wait(self.TIME_WAIT_FOR_MQTT_CONNECT - self._time_counter)
+
         # wait for delivering retained subscribtions
         self._reset_timer()
-        while not self._shutdown:
-            self._wait(self._time_step)
-            if self._time_counter > 1:
-                break
+        while not self._shutdown and self._time_counter < self.TIME_WAIT_FOR_RETAINED:
+            self._wait(self.TIME_WAIT_FOR_RETAINED - self._time_counter)
 
     def _process_mqtt_messages(self):
-        messages = self._mqtt.get_messages()
+        self.dispatch_mqtt_messages(self._mqtt.get_messages())
+
+    def dispatch_mqtt_messages(self, messages):
+        """updates the subscriptions with incoming messages"""
         for message in messages:
-            payload = message.payload
-            if isinstance(payload, bytes):
-                payload = payload.decode("utf-8")
+            subscriptions = self._subscription_index.subscriptions(message.topic)
+            if not subscriptions:
+                continue
 
-            _logger.debug("incoming message %s: %s", message.topic, payload)
+            _logger.debug("incoming message %s: %s", message.topic, message.payload)
 
-            for subscription in self._subscriptions:
-                if subscription.matches_topic(message.topic):
-                    subscription.extract(payload)
+            if getattr(message, "retain", False) and self._mqtt_in_trigger in subscriptions:
+                _logger.info("retained measurement request ignored (%s)", message.topic)
+                subscriptions = [s for s in subscriptions if s is not self._mqtt_in_trigger]
+                if not subscriptions:
+                    continue
+
+            SubscriptionIndex.extract(subscriptions, message.topic, message.payload)
+            self._hold_changed = True
 
     def _switch_sensor(self, switch_state: SwitchSensor):
         if self._mqtt_out_actor:
             self._mqtt.publish(switch_state.value, self._mqtt_out_actor, True)
 
-    def _active_deactivation_ranges(self):
-        if not self._deactivation_ranges:
-            return False
-
-        now = self._now()
-        minute_of_day = now.minute + now.hour * 60
-
-        try:
-            for range in self._deactivation_ranges:
-                lower = min(range)
-                upper = max(range)
-                if lower <= minute_of_day <= upper:
-                    _logger.debug(f"deactivation range active [{lower} <= {minute_of_day} <= {upper}]!")
-                    return True
-
-        except (TypeError) as ex:
-            _logger.error(f"Iterable[Iterable] expected for '{ConfigKey.DEACTIVATION_TIME_RANGES.value}'!"
-                          " E.g.: '((60,300),(660,900),)'")
-            _logger.exception(ex)
-
-        return False
+    def _deactivation_state(self):
+        """:return: (deactivated by the schedule, seconds until the next transition or None)"""
+        now = self._now() + datetime.timedelta(seconds=self.TIME_TRANSITION_TOLERANCE)
+        deactivated, time_transition = self._deactivation.state(now)
+        if time_transition is not None:
+            time_transition += self.TIME_TRANSITION_TOLERANCE
+        if deactivated:
+            _logger.debug("deactivation schedule active (%s s left)", time_transition)
+        return deactivated, time_transition
 
     def _now(self):
         """overwrite in test to simulate different times"""
@@ -0,0 +1,160 @@
+import bisect
+import threading
+import time
+
+
+class InflightMessage:
+
+    def __init__(self, mid, topic, payload, qos, time_sent, row_id=None):
+        self.mid = mid
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+        self.row_id = row_id  # outbox id of a stored message
+        self.time_sent = time_sent  # monotonic
+        self.time_acked = None
+
+    @property
+    def latency(self):
+        return None if self.time_acked is None else self.time_acked - self.time_sent
+
+
+class LatencyHistogram:
+    """publish-to-ack latencies (seconds) in fixed buckets"""
+
+    BOUNDS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)  # upper bounds; plus one overflow bucket
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, latency):
+        self.counts[bisect.bisect_left(self.BOUNDS, latency)] += 1
+        self.count += 1
+        self.sum += latency
+        self.max = max(self.max, latency)
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+    def quantile(self, q):
+        """:return: upper bound of the bucket containing the quantile (max. for the overflow bucket)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulated = 0
+        for index, count in enumerate(self.counts):
+            cumulated += count
+            if cumulated >= rank and count:
+                return self.BOUNDS[index] if index < len(self.BOUNDS) else self.max
+        return self.max
+
+    def __str__(self):
+        if not self.count:
+            return "no acks"
+        return "{} acks, mean={:.3f}s, p50<={}s, p95<={}s, p99<={}s, max={:.3f}s".format(
+            self.count, self.mean, self.quantile(0.5), self.quantile(0.95), self.quantile(0.99), self.max)
+
+
+class PublishTracker:
+    """
+    Messages handed to paho until the broker acknowledged them (QoS 0: written to the socket), with latency
+    histograms per QoS. Thread safe: acks arrive in the MQTT thread, possibly before `sent` was called.
+    """
+
+    EARLY_ACK_TIMEOUT = 60  # seconds; acks without `sent` are forgotten afterwards
+
+    def __init__(self, max_inflight, clock=time.monotonic):
+        if max_inflight < 1:
+            raise ValueError(f"in-flight window must be >= 1 ({max_inflight})!")
+
+        self.max_inflight = max_inflight
+        self.clock = clock
+        self._condition = threading.Condition()
+        self._inflight = {}  # mid => InflightMessage
+        self._acked_early = {}  # mid => time acked
+        self._histograms = {}  # qos => LatencyHistogram
+
+    def __len__(self):
+        with self._condition:
+            return len(self._inflight)
+
+    @property
+    def free(self):
+        """free slots of the in-flight window"""
+        with self._condition:
+            return max(0, self.max_inflight - len(self._inflight))
+
+    def sent(self, mid, topic, payload, qos, time_sent, row_id=None):
+        """
+        :param time_sent: `clock()` before the message was handed to paho
+        :return: the message if it was already acknowledged, else None
+        @rtype: InflightMessage
+        """
+        with self._condition:
+            message = InflightMessage(mid, topic, payload, qos, time_sent, row_id)
+            time_acked = self._acked_early.pop(mid, None)
+            if time_acked is None:
+                self._inflight[mid] = message
+                return None
+
+            self._complete(message, time_acked)
+            return message
+
+    def acked(self, mid):
+        """
+        :return: the acknowledged message, None if not (yet) known
+        @rtype: InflightMessage
+        """
+        with self._condition:
+            now = self.clock()
+            message = self._inflight.pop(mid, None)
+            if message is None:
+                self._acked_early = {m: t for m, t in self._acked_early.items() if now - t < self.EARLY_ACK_TIMEOUT}
+                self._acked_early[mid] = now
+                return None
+
+            self._complete(message, now)
+            return message
+
+    def _complete(self, message, time_acked):
+        message.time_acked = time_acked
+        self._histograms.setdefault(message.qos, LatencyHistogram()).add(message.latency)
+        if not self._inflight:
+            self._condition.notify_all()
+
+    def discard(self, qos):
+        """
+        Forgets the not acknowledged messages of a QoS, e.g. QoS 0 on disconnect (dropped by paho, never acked).
+        @rtype: list(InflightMessage) - the discarded messages, oldest first
+        """
+        with self._condition:
+            discarded = sorted((m for m in self._inflight.values() if m.qos == qos), key=lambda m: m.time_sent)
+            for message in discarded:
+                del self._inflight[message.mid]
+            if discarded and not self._inflight:
+                self._condition.notify_all()
+            return discarded
+
+    def row_ids(self):
+        """:return: outbox ids of the not acknowledged messages"""
+        with self._condition:
+            return set(m.row_id for m in self._inflight.values() if m.row_id is not None)
+
+    def pending(self):
+        """@rtype: list(InflightMessage) - not acknowledged messages, oldest first"""
+        with self._condition:
+            return sorted(self._inflight.values(), key=lambda m: m.time_sent)
+
+    def histograms(self):
+        """@rtype: dict(int, LatencyHistogram) - per QoS"""
+        with self._condition:
+            return dict(self._histograms)
+
+    def wait_empty(self, timeout) -> bool:
+        """blocks until all messages were acknowledged or the timeout (seconds) expired; :return: True if flushed"""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._inflight, timeout)
@@ -14,6 +14,22 @@ class ResultKey(Enum):
     PM10 = "PM10"
     STATE = "STATE"
     TIMESTAMP = "TIMESTAMP"
+    WARM_UP = "WARM_UP"  # seconds the sensor was warmed up
+    ON_HOURS = "ON_HOURS"  # total sensor on time (laser, fan)
+    END_OF_LIFE = "END_OF_LIFE"  # projected date when the rated lifetime is used up
+    SUPPRESSED = "SUPPRESSED"  # results within the deadband (not published) since the last published result
+
+    # aggregated measurements (several samples per cycle)
+    SAMPLES = "SAMPLES"
+    REJECTED = "REJECTED"
+    PM25_MEAN = "PM25_MEAN"
+    PM25_MIN = "PM25_MIN"
+    PM25_MAX = "PM25_MAX"
+    PM25_STDEV = "PM25_STDEV"
+    PM10_MEAN = "PM10_MEAN"
+    PM10_MIN = "PM10_MIN"
+    PM10_MAX = "PM10_MAX"
+    PM10_STDEV = "PM10_STDEV"
 
 
 class ResultState(Enum):
@@ -36,8 +52,28 @@ class Result:
         self.pm10 = pm10
         self.pm25 = pm25
         self.timestamp = timestamp if timestamp else self._now()
+        self.warm_up = None
+        self.on_hours = None
+        self.end_of_life = None
+        self.suppressed = None
+
+        # aggregated measurements, published only if available (pm10/pm25 carry the median then)
+        self.samples = None
+        self.rejected = None
+        self.pm25_mean = None
+        self.pm25_min = None
+        self.pm25_max = None
+        self.pm25_stdev = None
+        self.pm10_mean = None
+        self.pm10_min = None
+        self.pm10_max = None
+        self.pm10_stdev = None
 
     def create_message(self):
+        """:return: JSON message (see `src.encoder` for other formats)"""
+        return json.dumps(self.to_dict())
+
+    def to_dict(self):
         payload = {
             ResultKey.PM10.value: self.pm10,
             ResultKey.PM25.value: self.pm25,
@@ -45,8 +81,29 @@ class Result:
             ResultKey.TIMESTAMP.value: self.timestamp.isoformat(),
         }
 
-        message = json.dumps(payload)
-        return message
+        if self.warm_up is not None:
+            payload[ResultKey.WARM_UP.value] = self.warm_up
+
+        if self.on_hours is not None:
+            payload[ResultKey.ON_HOURS.value] = self.on_hours
+            payload[ResultKey.END_OF_LIFE.value] = self.end_of_life
+
+        if self.suppressed is not None:
+            payload[ResultKey.SUPPRESSED.value] = self.suppressed
+
+        if self.samples is not None:
+            payload[ResultKey.SAMPLES.value] = self.samples
+            payload[ResultKey.REJECTED.value] = self.rejected
+            payload[ResultKey.PM10_MEAN.value] = self.pm10_mean
+            payload[ResultKey.PM10_MIN.value] = self.pm10_min
+            payload[ResultKey.PM10_MAX.value] = self.pm10_max
+            payload[ResultKey.PM10_STDEV.value] = self.pm10_stdev
+            payload[ResultKey.PM25_MEAN.value] = self.pm25_mean
+            payload[ResultKey.PM25_MIN.value] = self.pm25_min
+            payload[ResultKey.PM25_MAX.value] = self.pm25_max
+            payload[ResultKey.PM25_STDEV.value] = self.pm25_stdev
+
+        return payload
 
     @classmethod
     def _now(self):
@@ -0,0 +1,103 @@
+import statistics
+from collections import deque
+
+from src.result import Result, ResultState
+
+
+class SampleWindow:
+    """Bounded ring buffer of (pm25, pm10) samples, which are aggregated to one `Result` per measurement cycle."""
+
+    DEFAULT_MAX_SAMPLES = 180
+
+    # a sample is an outlier if PM2.5 or PM10 deviates from the median more than
+    # max(OUTLIER_MAD_FACTOR * scaled MAD, OUTLIER_MIN_DEVIATION, OUTLIER_MIN_DEVIATION_REL * median)
+    OUTLIER_MAD_FACTOR = 3.0
+    OUTLIER_MIN_DEVIATION = 2.0  # µg/m³, sensor noise
+    OUTLIER_MIN_DEVIATION_REL = 0.25
+    OUTLIER_MIN_SAMPLES = 3
+
+    def __init__(self, max_samples=DEFAULT_MAX_SAMPLES):
+        self._samples = deque(maxlen=max(1, max_samples))
+
+    def __len__(self):
+        return len(self._samples)
+
+    def clear(self):
+        self._samples.clear()
+
+    def resize(self, max_samples):
+        """Changes the buffer size, the newest samples are kept."""
+        max_samples = max(1, max_samples)
+        if max_samples != self._samples.maxlen:
+            self._samples = deque(self._samples, maxlen=max_samples)
+
+    def append(self, pm25: float, pm10: float):
+        self._samples.append((pm25, pm10))
+
+    def settled(self, count: int, tolerance: float) -> bool:
+        """
+        The newest `count` samples agree: the spread (max - min) of PM2.5 and PM10 is within
+        max(tolerance * median, OUTLIER_MIN_DEVIATION).
+        """
+        if count < 1 or len(self._samples) < count:
+            return False
+
+        recent = list(self._samples)[-count:]
+        for values in ([s[0] for s in recent], [s[1] for s in recent]):
+            if max(values) - min(values) > max(tolerance * statistics.median(values), self.OUTLIER_MIN_DEVIATION):
+                return False
+        return True
+
+    def create_result(self, reject_outliers=False) -> Result:
+        """Aggregates the buffered samples. The median is used as main value (robust against peaks)."""
+        samples = list(self._samples)
+        rejected = 0
+        if reject_outliers:
+            samples = self._reject_outliers(samples)
+            rejected = len(self._samples) - len(samples)
+
+        if not samples:
+            result = Result(ResultState.ERROR)
+            result.samples = 0
+            result.rejected = rejected
+            return result
+
+        pm25_values = [s[0] for s in samples]
+        pm10_values = [s[1] for s in samples]
+
+        result = Result(ResultState.OK, pm25=self._round(statistics.median(pm25_values)),
+                        pm10=self._round(statistics.median(pm10_values)))
+        result.samples = len(samples)
+        result.rejected = rejected
+        result.pm25_mean = self._round(statistics.mean(pm25_values))
+        result.pm25_min = min(pm25_values)
+        result.pm25_max = max(pm25_values)
+        result.pm25_stdev = self._round(statistics.pstdev(pm25_values))
+        result.pm10_mean = self._round(statistics.mean(pm10_values))
+        result.pm10_min = min(pm10_values)
+        result.pm10_max = max(pm10_values)
+        result.pm10_stdev = self._round(statistics.pstdev(pm10_values))
+        return result
+
+    @classmethod
+    def _reject_outliers(cls, samples):
+        if len(samples) < cls.OUTLIER_MIN_SAMPLES:
+            return samples
+
+        def limits(values):
+            median = statistics.median(values)
+            mad = statistics.median([abs(v - median) for v in values])
+            max_deviation = max(cls.OUTLIER_MAD_FACTOR * 1.4826 * mad,  # 1.4826: MAD => standard deviation
+                                cls.OUTLIER_MIN_DEVIATION,
+                                cls.OUTLIER_MIN_DEVIATION_REL * median)
+            return median - max_deviation, median + max_deviation
+
+        pm25_lower, pm25_upper = limits([s[0] for s in samples])
+        pm10_lower, pm10_upper = limits([s[1] for s in samples])
+
+        return [s for s in samples if pm25_lower <= s[0] <= pm25_upper and pm10_lower <= s[1] <= pm10_upper]
+
+    @classmethod
+    def _round(cls, value):
+        """aggregates get 2 decimals (sensor resolution is 0.1 µg/m³)"""
+        return round(value, 2)
@@ -0,0 +1,67 @@
+import logging
+import os
+import select
+import time
+
+_logger = logging.getLogger(__name__)
+
+
+class Scheduler:
+    """
+    Sleeps until a deadline (monotonic clock) is reached or until somebody calls `wake_up`.
+
+    Based on the self-pipe trick, so `wake_up` may be called from signal handlers and foreign threads (MQTT).
+    """
+
+    def __init__(self):
+        self._pipe_read, self._pipe_write = os.pipe()
+        os.set_blocking(self._pipe_read, False)
+        os.set_blocking(self._pipe_write, False)
+
+        self.wakeup_count = 0
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        for fd in [self._pipe_read, self._pipe_write]:
+            if fd is not None:
+                os.close(fd)
+        self._pipe_read = None
+        self._pipe_write = None
+
+    @classmethod
+    def now(cls) -> float:
+        return time.monotonic()
+
+    def wake_up(self):
+        """Interrupts a running or the next `wait` (thread and signal safe)."""
+        if self._pipe_write is None:
+            return
+        try:
+            os.write(self._pipe_write, b"\x00")
+        except BlockingIOError:
+            pass  # pipe full => wake up pending anyway
+        except OSError as ex:
+            _logger.debug("wake_up failed (closed?): %s", ex)  # late callback (MQTT thread) while closing
+
+    def wait(self, timeout: float, fds=None) -> bool:
+        """
+        Waits until timeout (seconds) elapsed, `wake_up` was called or one of the file descriptors (e.g. serial port)
+        gets readable.
+        :return: True if woken up by `wake_up` or file descriptors
+        """
+        timeout = max(0, timeout)
+        readable, _, _ = select.select([self._pipe_read] + list(fds or []), [], [], timeout)
+        self.wakeup_count += 1
+
+        if self._pipe_read in readable:
+            self._drain()
+        return bool(readable)
+
+    def _drain(self):
+        try:
+            while os.read(self._pipe_read, 512):
+                pass
+        except BlockingIOError:
+            pass
@@ -2,8 +2,14 @@
 """
 import logging
 import struct
+import time
+from collections import deque
+
 import serial  # pyserial
 
+from src.sds011.capture import RX, TX
+from src.sds011.frame_parser import FrameParser
+
 
 _logger = logging.getLogger(__name__)
 
@@ -27,6 +33,11 @@ class SDS011(object):
 
     QUERY_CMD = b"\x04"
 
+    # command no. of data frames (query reply or active report mode)
+    DATA_CMD = b"\xc0"
+    # command no. of replies to commands (report mode, sleep, work period)
+    REPLY_CMD = b"\xc5"
+
     # The sleep command ID
     SLEEP_CMD = b"\x06"
     # Sleep and work byte
@@ -36,16 +47,28 @@ class SDS011(object):
     # The work period command ID
     WORK_PERIOD_CMD = b'\x08'
 
-    def __init__(self, serial_port, baudrate=9600, timeout=2, use_query_mode=True):
-        """Initialise and open serial port."""
+    # unsolicited data frames (active report mode), which were received while waiting for a reply
+    MAX_QUEUED_DATA_FRAMES = 64
+
+    def __init__(self, serial_port, baudrate=9600, timeout=2, use_query_mode=True, capture=None):
+        """Initialise and open serial port.
+
+        :param capture: `CaptureWriter`, records all exchanged bytes
+        """
         self._serial = None
+        self._capture = capture
 
         self._serial_port = serial_port
         self._baudrate = baudrate
         self._timeout = timeout
         self._use_query_mode = use_query_mode
 
-    def open(self):
+        self._parser = FrameParser()  # keeps incomplete frames between reads
+        self._data_frames = deque(maxlen=self.MAX_QUEUED_DATA_FRAMES)
+        self._cancelled = False  # see `cancel_read`
+
+    def open(self, set_report_mode=True):
+        self._cancelled = False
         self._serial = serial.Serial(
             port=self._serial_port,
             baudrate=self._baudrate,
@@ -53,7 +76,21 @@ class SDS011(object):
         )
         self._serial.flush()
 
-        self.set_report_mode(active=not self._use_query_mode)
+        if set_report_mode:
+            self.set_report_mode(active=not self._use_query_mode)
+
+    def is_open(self):
+        return self._serial is not None
+
+    def fileno(self):
+        """File descriptor of the serial port, to wait for incoming data (select)."""
+        return self._serial.fileno()
+
+    def cancel_read(self):
+        """Aborts a blocking read of another thread. No replies are waited for anymore (until the next `open`)."""
+        self._cancelled = True
+        if self._serial is not None and hasattr(self._serial, "cancel_read"):
+            self._serial.cancel_read()
 
     def close(self):
         if self._serial is not None:
@@ -67,19 +104,54 @@ class SDS011(object):
                       "(" + log_info + ")" if log_info else "",
                       cmd_bytes)
         self._serial.write(cmd_bytes)
+        if self._capture is not None:
+            self._capture.write(TX, cmd_bytes)
 
-    def _get_reply(self):
-        """Read reply from device."""
-        expected = 10
-        raw = self._serial.read(size=expected)
-        _logger.debug("_get_reply: read %s (%s of expected %s)", raw, len(raw) if raw else "-", expected)
-        if len(raw) < 10:
-            return None
-        data = raw[2:8]
-        if (sum(d for d in data) & 255) != raw[8]:
-            _logger.error("_get_reply: checksum error")
-            return None  # TODO: also check cmd id
-        return raw
+    def _get_reply(self, cmd_id=None):
+        """Read the reply to a command from device.
+
+        Frames, which don't belong to the command, are skipped; data frames are queued for `read_available`.
+
+        :param cmd_id: command ID of the expected reply frame (0xC5), None: a data frame (0xC0) is expected (query)
+        @return: the raw frame or None on timeout
+        """
+        time_end = time.monotonic() + (self._timeout or 0)
+        while not self._cancelled:
+            reply = None
+            for frame in self._receive(blocking=True):
+                if reply is None and cmd_id is None and frame.is_data:
+                    reply = frame
+                elif reply is None and cmd_id is not None and frame.reply_to == cmd_id:
+                    reply = frame
+                elif frame.is_data:
+                    self._data_frames.append(frame)
+                else:
+                    _logger.debug("_get_reply: skip uncorrelated %s", frame)
+            if reply is not None:
+                return reply.raw
+
+            if time.monotonic() >= time_end:
+                _logger.debug("_get_reply: timeout (cmd_id=%s)", cmd_id)
+                return None
+
+        _logger.debug("_get_reply: cancelled (cmd_id=%s)", cmd_id)
+        return None
+
+    def _receive(self, blocking):
+        """Reads available bytes (blocking: waits up to the serial timeout for at least one byte) into the parser.
+        @rtype: list(Frame)
+        """
+        size = self._serial.in_waiting
+        if size <= 0:
+            if not blocking:
+                return []
+            size = 1
+        data = self._serial.read(size=size)
+        if not data:
+            return []
+        if self._capture is not None:
+            self._capture.write(RX, data)
+        return self._parser.feed(data)
 
     def cmd_begin(self):
         """Get command header and command ID bytes.
@@ -98,7 +170,19 @@ class SDS011(object):
                 + b"\x00" * 10)
         cmd = self._finish_cmd(cmd)
         self._execute(cmd, "set_report_mode")
-        self._get_reply()
+        return self._get_reply(self.REPORT_MODE_CMD)
+
+    def get_report_mode(self):
+        """Read back the report mode.
+
+        @return: True for active report mode, False for query mode, None if there was no valid reply.
+        @rtype: bool
+        """
+        raw = self.set_report_mode(read=True)
+        if raw is None:
+            _logger.warning("get_report_mode: unexpected reply %s", raw)
+            return None
+        return raw[4:5] == self.ACTIVE
 
     def query(self):
         """Query the device and read the data.
@@ -112,9 +196,10 @@ class SDS011(object):
         cmd = self._finish_cmd(cmd)
         self._execute(cmd, "query")
 
+        self._data_frames.clear()  # outdated
         raw = self._get_reply()
         if raw is None:
-            return None  # TODO:
+            return None
         data = struct.unpack('<HH', raw[2:6])
         pm25 = data[0] / 10.0
         pm10 = data[1] / 10.0
@@ -133,7 +218,7 @@ class SDS011(object):
                 + b"\x00" * 10)
         cmd = self._finish_cmd(cmd)
         self._execute(cmd, "sleep")
-        self._get_reply()
+        self._get_reply(self.SLEEP_CMD)
 
     def set_work_period(self, read=False, work_time=0):
         """Get work period command. Does not contain checksum and tail.
@@ -147,7 +232,19 @@ class SDS011(object):
                 + b"\x00" * 10)
         cmd = self._finish_cmd(cmd)
         self._execute(cmd, "set_work_period")
-        self._get_reply()
+        return self._get_reply(self.WORK_PERIOD_CMD)
+
+    def get_work_period(self):
+        """Read back the work period.
+
+        @return: work period in minutes (0 == continuous), None if there was no valid reply.
+        @rtype: int
+        """
+        raw = self.set_work_period(read=True)
+        if raw is None:
+            _logger.warning("get_work_period: unexpected reply %s", raw)
+            return None
+        return raw[4]
 
     def _finish_cmd(self, cmd, id1=b"\xff", id2=b"\xff"):
         """Add device ID, checksum and tail bytes.
@@ -171,7 +268,9 @@ class SDS011(object):
             8 - Checksum - sum of bytes 2-7
             9 - Tail
         """
-        raw = struct.unpack('<HHxxBBB', data[2:])
+        if len(data) < 10:
+            return None
+        raw = struct.unpack('<HH', data[2:6])
         checksum = sum(v for v in data[2:8]) % 256
         if checksum != data[8]:
             _logger.warning("checksum(%s) != data[8]: ", checksum)
@@ -186,12 +285,31 @@ class SDS011(object):
         @return: PM2.5 and PM10 concetration in micrograms per cude meter.
         @rtype: tuple(float, float) - first is PM2.5.
         """
-        byte = 0
-        while byte != self.HEAD:
-            byte = self._serial.read(size=1)
-            _logger.debug("read(byte): %s", byte)
-            d = self._serial.read(size=10)
-            _logger.debug("read(d): %s", d)
-            if d[0:1] == b"\xc0":
-                data = self.prepare_frame(byte + d)
-                return data
+        if self._data_frames:
+            return self._data_frames.popleft().values()
+        raw = self._get_reply()
+        if raw is None:
+            return None  # timeout
+        return self.prepare_frame(raw)
+
+    def read_available(self):
+        """Read all data frames (active report mode), which were already received.
+        Doesn't block: only the bytes waiting in the input buffer are read, incomplete frames are kept.
+
+        @rtype: list(tuple(float, float))
+        """
+        for frame in self._receive(blocking=False):
+            if frame.is_data:
+                self._data_frames.append(frame)
+            else:
+                _logger.debug("read_available: skip uncorrelated %s", frame)
+
+        frames = [f.values() for f in self._data_frames]
+        self._data_frames.clear()
+        return frames
+
+    def flush_input(self):
+        """Discard all received but not read data (e.g. outdated frames of the active report mode)."""
+        self._serial.reset_input_buffer()
+        self._parser.clear()
+        self._data_frames.clear()
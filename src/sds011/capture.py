@@ -0,0 +1,173 @@
+"""Raw serial capture files and a bulk decoder for them.
+
+File format: magic line, then one record per serial read/write:
+    <d timestamp (epoch)> <B direction> <H length> <length bytes>
+
+The decoder uses NumPy (vectorised frame search and checksum validation) if installed, otherwise `bytes.find`
+and `struct`. Both follow `FrameParser` (resync at the next head byte), but only data frames are decoded.
+"""
+import logging
+import os
+import struct
+import time
+
+try:
+    import numpy
+except ImportError:  # optional
+    numpy = None
+
+from src.sds011.frame_parser import FrameParser
+
+_logger = logging.getLogger(__name__)
+
+
+MAGIC = b"SDS011CAP1\n"
+RECORD_HEADER = struct.Struct("<dBH")
+
+RX = 0  # sensor => host
+TX = 1  # host => sensor
+
+
+class CaptureWriter(object):
+    """Appends every exchanged byte sequence to a capture file (with timestamp and direction)."""
+
+    def __init__(self, path):
+        self._path = path
+        self._file = None
+
+    def write(self, direction, data):
+        if not data:
+            return
+        try:
+            if self._file is None:
+                new_file = not os.path.isfile(self._path) or os.path.getsize(self._path) == 0
+                self._file = open(self._path, "ab")
+                if new_file:
+                    self._file.write(MAGIC)
+            for offset in range(0, len(data), 0xffff):
+                chunk = data[offset:offset + 0xffff]
+                self._file.write(RECORD_HEADER.pack(time.time(), direction, len(chunk)) + chunk)
+            self._file.flush()  # nothing gets lost if the process is killed
+        except OSError as ex:
+            _logger.error("cannot write capture file '%s': %s", self._path, ex)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_records(path):
+    """Reads a capture file.
+    @rtype: generator(tuple(float, int, bytes)) - (timestamp, direction, data)
+    """
+    with open(path, "rb") as file:
+        content = file.read()
+
+    if not content.startswith(MAGIC):
+        raise ValueError(f"'{path}' is not a capture file!")
+
+    pos = len(MAGIC)
+    while pos + RECORD_HEADER.size <= len(content):
+        timestamp, direction, length = RECORD_HEADER.unpack_from(content, pos)
+        pos += RECORD_HEADER.size
+        if pos + length > len(content):
+            _logger.warning("'%s': truncated record at the end", path)
+            break
+        yield timestamp, direction, content[pos:pos + length]
+        pos += length
+
+
+def _received_stream(path):
+    """@return: received bytes, [(end offset, timestamp)] of the received records"""
+    data = bytearray()
+    timestamps = []
+    for timestamp, direction, chunk in read_records(path):
+        if direction == RX:
+            data += chunk
+            timestamps.append((len(data), timestamp))
+    return bytes(data), timestamps
+
+
+def decode_file(path, use_numpy=True):
+    """Decodes the data frames (PM2.5, PM10) received in a capture file.
+
+    Same semantics as `SDS011.prepare_frame` (head, command no., checksum, tail; values in 0.1 µg/m³), a frame gets
+    the timestamp of the record which completed it.
+
+    @rtype: list(tuple(float, float, float)) - (timestamp, pm25, pm10)
+    """
+    data, record_ends = _received_stream(path)
+    if use_numpy and numpy is not None:
+        return _decode_numpy(data, record_ends)
+    return _decode_python(data, record_ends)
+
+
+def _decode_python(data, record_ends):
+    size = FrameParser.FRAME_SIZE
+    start_bytes = bytes([FrameParser.HEAD]) + FrameParser.DATA_CMD
+    unpack = struct.Struct("<HH").unpack_from
+
+    series = []
+    record = 0
+    pos = data.find(start_bytes)
+    while 0 <= pos <= len(data) - size:
+        if data[pos + 9] == FrameParser.TAIL and sum(data[pos + 2:pos + 8]) % 256 == data[pos + 8]:
+            while record_ends[record][0] < pos + size:
+                record += 1
+            pm25, pm10 = unpack(data, pos + 2)
+            series.append((record_ends[record][1], pm25 / 10.0, pm10 / 10.0))
+            pos += size
+        else:
+            pos += 1  # resync at next head byte
+        pos = data.find(start_bytes, pos)
+    return series
+
+
+def _decode_numpy(data, record_ends):
+    size = FrameParser.FRAME_SIZE
+    raw = numpy.frombuffer(data, dtype=numpy.uint8)
+    if len(raw) < size:
+        return []
+
+    # all positions which may start a data frame
+    count = len(raw) - size + 1
+    index = numpy.nonzero((raw[:count] == FrameParser.HEAD) &
+                          (raw[1:count + 1] == FrameParser.DATA_CMD[0]) &
+                          (raw[size - 1:count + size - 1] == FrameParser.TAIL))[0]
+    if len(index) == 0:
+        return []
+
+    frames = raw[index[:, None] + numpy.arange(size)].astype(numpy.uint16)
+    valid = (frames[:, 2:8].sum(axis=1) % 256) == frames[:, 8]
+    index = index[valid]
+    frames = frames[valid]
+
+    # overlapping candidates: compared with the last kept frame, the first one wins (like the sequential parser)
+    if len(index) > 1 and numpy.any(numpy.diff(index) < size):
+        keep = []
+        next_pos = 0
+        for position, pos in enumerate(index.tolist()):
+            if pos >= next_pos:
+                keep.append(position)
+                next_pos = pos + size
+        index = index[keep]
+        frames = frames[keep]
+
+    pm25 = (frames[:, 2] | (frames[:, 3] << 8)) / 10.0
+    pm10 = (frames[:, 4] | (frames[:, 5] << 8)) / 10.0
+
+    ends = numpy.array([e for e, _ in record_ends])
+    stamps = numpy.array([t for _, t in record_ends])
+    timestamps = stamps[numpy.searchsorted(ends, index + size, side="left")]
+
+    return list(zip(timestamps.tolist(), pm25.tolist(), pm10.tolist()))
+
+
+def decode_files(paths, use_numpy=True):
+    """@rtype: list(tuple(float, float, float)) - (timestamp, pm25, pm10) of all files, sorted by time"""
+    series = []
+    for path in paths:
+        series.extend(decode_file(path, use_numpy))
+    series.sort(key=lambda s: s[0])
+    return series
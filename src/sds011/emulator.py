@@ -0,0 +1,233 @@
+"""Emulates a SDS011 on a pseudo-terminal (tests and benchmarks without hardware).
+
+    with SDS011Emulator() as emulator:
+        sensor = SDS011(emulator.port)
+        ...
+"""
+import logging
+import os
+import random
+import select
+import struct
+import threading
+import time
+import tty
+from collections import deque
+from enum import Enum
+
+from src.sds011.frame_parser import FrameParser
+
+_logger = logging.getLogger(__name__)
+
+
+class Fault(Enum):
+    CHECKSUM = "checksum"  # wrong checksum of the next frame
+    SHORT_READ = "short_read"  # the next frame is truncated
+    GARBAGE = "garbage"  # random bytes in front of the next frame
+    GLITCH = "glitch"  # the next data frame reports the typical wrong values (25.8 / 0.1)
+    NO_REPLY = "no_reply"  # the next command isn't answered
+
+
+class SDS011Emulator(object):
+    """Speaks the SDS011 protocol on the master side of a pseudo-terminal; `port` is the slave device (pyserial).
+
+    Supported: query, sleep/work, report mode, work period, firmware version, device ID, active report mode
+    (1 frame per second) and the work period cycle (30s warm up, 1 frame per period).
+    `time_factor` scales all timings, e.g. 0.01 makes a 1 Hz stream 100 Hz.
+    """
+
+    CMD_LENGTH = 19
+    CMD_HEAD = b"\xaa\xb4"
+    BROADCAST_ID = b"\xff\xff"
+
+    CMD_REPORT_MODE = 0x02
+    CMD_QUERY = 0x04
+    CMD_DEVICE_ID = 0x05
+    CMD_SLEEP = 0x06
+    CMD_FIRMWARE = 0x07
+    CMD_WORK_PERIOD = 0x08
+
+    FRAME_INTERVAL = 1.0  # seconds, active report mode
+    POLL_INTERVAL = 0.01
+    WORK_PERIOD_WARM_UP = 30  # seconds, the sensor works 30s before the frame of a work period is sent
+
+    GLITCH_VALUES = (25.8, 0.1)
+    FIRMWARE = (18, 11, 16)  # year, month, day
+
+    def __init__(self, values=(12.3, 23.4), device_id=b"\xab\xcd", time_factor=1.0):
+        """
+        :param values: (pm25, pm10) or callable returning (pm25, pm10)
+        """
+        self.values = values
+        self.device_id = device_id
+        self.time_factor = time_factor
+
+        # sensor state (like after power on)
+        self.working = True
+        self.active_mode = True
+        self.work_period = 0  # minutes, 0: continuous
+
+        self.commands = []  # received command IDs
+        self.frames_sent = 0
+
+        self._faults = deque()
+        self._lock = threading.Lock()
+        self._master = None
+        self._slave = None
+        self.port = None
+        self._thread = None
+        self._stop = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, _exc_type, _exc_value, _traceback):
+        self.stop()
+
+    def start(self):
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)  # no echo, no line discipline
+        os.set_blocking(self._master, False)  # frames are dropped if nobody reads
+        self.port = os.ttyname(self._slave)
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="sds011-emulator", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop = True
+        if self._thread is not None:
+            self._thread.join(2)
+            self._thread = None
+        for fd in [self._master, self._slave]:
+            if fd is not None:
+                os.close(fd)
+        self._master = None
+        self._slave = None
+
+    def inject(self, fault: Fault, count=1):
+        """The next `count` frames (or commands: `Fault.NO_REPLY`) are broken. Faults are applied in order."""
+        with self._lock:
+            self._faults.extend([fault] * count)
+
+    def _take_fault(self, faults):
+        with self._lock:
+            if self._faults and self._faults[0] in faults:
+                return self._faults.popleft()
+        return None
+
+    def _run(self):
+        buffer = bytearray()
+        time_next_frame = self._now() + self._scaled(self.FRAME_INTERVAL)
+        time_period_start = self._now()
+
+        while not self._stop:
+            now = self._now()
+            if self.working and self.active_mode and self.work_period == 0:
+                while now >= time_next_frame:  # catch up (high frame rates)
+                    self._send_data_frame()
+                    time_next_frame += self._scaled(self.FRAME_INTERVAL)
+            else:
+                time_next_frame = now + self._scaled(self.FRAME_INTERVAL)
+
+            if self.working and self.active_mode and self.work_period > 0 and \
+                    now >= time_period_start + self._scaled(self.WORK_PERIOD_WARM_UP):
+                self._send_data_frame()
+                time_period_start += self._scaled(self.work_period * 60)
+
+            timeout = min(self.POLL_INTERVAL, max(0, time_next_frame - now))
+            readable, _, _ = select.select([self._master], [], [], timeout)
+            if not readable:
+                continue
+            try:
+                buffer += os.read(self._master, 256)
+            except BlockingIOError:
+                continue
+            except OSError:
+                break
+
+            while True:
+                start = buffer.find(self.CMD_HEAD)
+                if start < 0:
+                    del buffer[:max(0, len(buffer) - 1)]
+                    break
+                del buffer[:start]
+                if len(buffer) < self.CMD_LENGTH:
+                    break
+                cmd = bytes(buffer[:self.CMD_LENGTH])
+                del buffer[:self.CMD_LENGTH]
+                if self._handle_command(cmd) == self.CMD_WORK_PERIOD:
+                    time_period_start = self._now()
+
+    def _handle_command(self, cmd):
+        if cmd[18] != FrameParser.TAIL or sum(cmd[2:17]) % 256 != cmd[17]:
+            _logger.debug("invalid command: %s", cmd.hex())
+            return None
+        if cmd[15:17] not in (self.BROADCAST_ID, self.device_id):
+            return None  # other device
+
+        cmd_id, write, value = cmd[2], cmd[3] == 1, cmd[4]
+        self.commands.append(cmd_id)
+        if self._take_fault([Fault.NO_REPLY]):
+            return None
+
+        if cmd_id == self.CMD_SLEEP:
+            if write:
+                self.working = (value == 1)
+            self._send_reply(cmd_id, cmd[3], 1 if self.working else 0)
+        elif not self.working:
+            pass  # a sleeping sensor only answers wake up commands
+        elif cmd_id == self.CMD_QUERY:
+            self._send_data_frame()
+        elif cmd_id == self.CMD_REPORT_MODE:
+            if write:
+                self.active_mode = (value == 0)
+            self._send_reply(cmd_id, cmd[3], 0 if self.active_mode else 1)
+        elif cmd_id == self.CMD_WORK_PERIOD:
+            if write:
+                self.work_period = value
+            self._send_reply(cmd_id, cmd[3], self.work_period)
+        elif cmd_id == self.CMD_FIRMWARE:
+            self._send_frame(FrameParser.REPLY_CMD, bytes([cmd_id]) + bytes(self.FIRMWARE))
+        elif cmd_id == self.CMD_DEVICE_ID:
+            self.device_id = cmd[13:15]
+            self._send_reply(cmd_id, 0, 0)
+        else:
+            _logger.debug("unsupported command: %s", cmd.hex())
+
+        return cmd_id
+
+    def _send_reply(self, cmd_id, rw, value):
+        self._send_frame(FrameParser.REPLY_CMD, bytes([cmd_id, rw, value, 0]))
+
+    def _send_data_frame(self):
+        values = self.values() if callable(self.values) else self.values
+        if self._take_fault([Fault.GLITCH]):
+            values = self.GLITCH_VALUES
+        pm25, pm10 = values
+        self._send_frame(FrameParser.DATA_CMD, struct.pack('<HH', int(round(pm25 * 10)), int(round(pm10 * 10))))
+
+    def _send_frame(self, cmd, data):
+        data = data + self.device_id
+        frame = bytes([FrameParser.HEAD]) + cmd + data + bytes([sum(data) % 256, FrameParser.TAIL])
+
+        fault = self._take_fault([Fault.CHECKSUM, Fault.SHORT_READ, Fault.GARBAGE])
+        if fault == Fault.CHECKSUM:
+            frame = frame[:8] + bytes([(frame[8] + 1) % 256]) + frame[9:]
+        elif fault == Fault.SHORT_READ:
+            frame = frame[:random.randint(1, len(frame) - 1)]
+        elif fault == Fault.GARBAGE:
+            frame = bytes(random.randint(0, 255) for _ in range(random.randint(1, 12))) + frame
+
+        try:
+            os.write(self._master, frame)
+            self.frames_sent += 1
+        except OSError as ex:  # e.g. buffer full (nobody reads)
+            _logger.debug("write failed: %s", ex)
+
+    def _scaled(self, seconds):
+        return seconds * self.time_factor
+
+    @classmethod
+    def _now(cls):
+        return time.monotonic()
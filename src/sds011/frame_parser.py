@@ -0,0 +1,117 @@
+"""Incremental parser for the frames sent by the SDS011.
+"""
+import logging
+import struct
+
+_logger = logging.getLogger(__name__)
+
+
+class Frame(object):
+    """Validated frame sent by the sensor.
+
+    Byte positions:
+        0 - Header
+        1 - Command No. (0xC0 data, 0xC5 command reply)
+        2-7 - Data (data frame: PM2.5 low/high, PM10 low/high, ID; reply: command ID, ...)
+        8 - Checksum - sum of bytes 2-7
+        9 - Tail
+    """
+
+    def __init__(self, raw):
+        self.raw = bytes(raw)
+
+    def __repr__(self):
+        return "Frame({})".format(self.raw.hex())
+
+    @property
+    def cmd(self):
+        return self.raw[1:2]
+
+    @property
+    def is_data(self):
+        return self.cmd == FrameParser.DATA_CMD
+
+    @property
+    def is_reply(self):
+        return self.cmd == FrameParser.REPLY_CMD
+
+    @property
+    def reply_to(self):
+        """command ID (e.g. report mode, sleep) a reply frame belongs to"""
+        return self.raw[2:3] if self.is_reply else None
+
+    def values(self):
+        """@return: (PM2.5, PM10) of a data frame
+        @rtype: tuple(float, float)
+        """
+        raw = struct.unpack('<HH', self.raw[2:6])
+        return raw[0] / 10.0, raw[1] / 10.0
+
+
+class FrameParser(object):
+    """Scans a byte stream for valid frames (head, command no., checksum, tail).
+
+    Partial frames are kept until the next `feed`. After junk or a broken frame the parser resynchronises at the
+    next head byte, so one stray byte doesn't misalign all following replies.
+    """
+
+    FRAME_SIZE = 10
+
+    HEAD = 0xaa
+    TAIL = 0xab
+    DATA_CMD = b"\xc0"
+    REPLY_CMD = b"\xc5"
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self.skipped_bytes = 0
+
+    def __len__(self):
+        """number of buffered bytes (partial frame)"""
+        return len(self._buffer)
+
+    def clear(self):
+        self._buffer.clear()
+
+    def feed(self, data):
+        """Adds received bytes.
+
+        @return: all frames, which could be completed
+        @rtype: list(Frame)
+        """
+        self._buffer += data
+
+        frames = []
+        while True:
+            start = self._buffer.find(self.HEAD)
+            if start < 0:
+                self._skip(len(self._buffer))
+                break
+            if start > 0:
+                self._skip(start)
+            if len(self._buffer) < self.FRAME_SIZE:
+                break
+
+            raw = self._buffer[:self.FRAME_SIZE]
+            if self._is_valid(raw):
+                frames.append(Frame(raw))
+                del self._buffer[:self.FRAME_SIZE]
+            else:
+                self._skip(1)  # resync at next head byte
+
+        return frames
+
+    def _skip(self, count):
+        if count > 0:
+            _logger.debug("skip %s bytes: %s", count, self._buffer[:count].hex())
+            del self._buffer[:count]
+            self.skipped_bytes += count
+
+    @classmethod
+    def _is_valid(cls, raw):
+        if raw[1:2] not in (cls.DATA_CMD, cls.REPLY_CMD) or raw[9] != cls.TAIL:
+            return False
+        if sum(raw[2:8]) % 256 != raw[8]:
+            _logger.warning("checksum error: %s", raw.hex())
+            return False
+        return True
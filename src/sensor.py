@@ -1,12 +1,15 @@
 import logging
 import random
+from enum import Enum
 
 from serial import SerialException
 
 from src.config import Config
 from src.config_key import ConfigKey
 from src.result import ResultState, Result
+from src.sample_window import SampleWindow
 from src.sds011 import SDS011
+from src.sds011.capture import CaptureWriter
 
 _logger = logging.getLogger(__name__)
 
@@ -15,14 +18,43 @@ class SensorError(RuntimeError):
     pass
 
 
+class MeasureMode(Enum):
+    QUERY = "query"  # one queried sample per cycle
+    STREAM = "stream"  # active report mode, aggregate all samples of the measuring window
+    WORK_PERIOD = "work_period"  # the sensor cycles by itself (work period) and pushes one frame per period
+
+    @classmethod
+    def parse(cls, value):
+        if value is None:
+            return cls.QUERY
+        try:
+            return cls(str(value).lower().strip())
+        except ValueError:
+            raise ValueError(f"Invalid '{ConfigKey.MEASURE_MODE.value}' ({value})!")
+
+
 class Sensor:
 
     DEBAULT_ABORT_AFTER_N_ERRORS = 5
 
+    STREAM_FRAMES_PER_SECOND = 1  # active report mode
+    STREAM_EXTRA_FRAMES = 5
+
+    DEFAULT_WORK_PERIOD = 3  # minutes
+
+    WARM_UP_SETTLED_SAMPLES = 5  # consecutive streamed samples, which must agree to end the warm up early
+
+    blocking_io = True  # serial I/O, executed on a worker thread by `Process`
+
     def __init__(self, config):
         self._sensor = None
+        self._capture = None
         self._warmup = False
 
+        self._measure_mode = MeasureMode.parse(config.get(ConfigKey.MEASURE_MODE.value))
+        self._samples = SampleWindow()
+        self._sample_attempts = 0  # burst sampling (query mode)
+
         self._error_ignored = 0
         self._abort_after_n_errors = Config.get_int(config,
                                                     ConfigKey.ABORT_AFTER_N_ERRORS,
@@ -31,29 +63,74 @@ class Sensor:
             self._abort_after_n_errors = 0xffffffff
 
         self._port = Config.get_str(config, ConfigKey.SERIAL_PORT)
+        capture_path = Config.get_str(config, ConfigKey.SERIAL_CAPTURE)
+        self._capture = CaptureWriter(capture_path) if capture_path else None
+
+        # persistent serial session: the port stays open over all cycles, only sleep/work commands are sent
+        self._keep_open = Config.get_bool(config, ConfigKey.SERIAL_KEEP_OPEN, True)
+        self._report_mode_verified = False
+
+        self._work_period = Config.get_int(config, ConfigKey.WORK_PERIOD, self.DEFAULT_WORK_PERIOD)
+        if not 1 <= self._work_period <= 30:
+            raise ValueError(f"'{ConfigKey.WORK_PERIOD.value}' must be within 1..30 minutes ({self._work_period})!")
+        self._work_period_verified = False
 
     def __del__(self):
         self.close()
+        self.disconnect()
+        if self._capture is not None:
+            self._capture.close()
+
+    @property
+    def streaming(self):
+        """Measurements are streamed (active report mode) and collected over a measuring window."""
+        return self._measure_mode == MeasureMode.STREAM
+
+    @property
+    def work_period(self):
+        """Work period (minutes) if the sensor cycles by itself (hardware duty cycle), otherwise None."""
+        return self._work_period if self._measure_mode == MeasureMode.WORK_PERIOD else None
+
+    @property
+    def active_reporting(self):
+        """The sensor sends frames by itself (active report mode)."""
+        return self._measure_mode != MeasureMode.QUERY
 
     def open(self, warm_up: bool = False):
+        """Opens the serial session (if not open yet) and optionally wakes the sensor up."""
         _logger.debug("open(warm_up=%s)", warm_up)
 
-        self._sensor = SDS011(self._port, use_query_mode=True)
-        self._sensor.open()
-        self._warmup = False  # don't know the state!
+        if self._sensor is None:
+            self._sensor = SDS011(self._port, use_query_mode=not self.active_reporting, capture=self._capture)
+            try:
+                self._sensor.open(set_report_mode=not self._keep_open)
+            except Exception:
+                self._sensor = None
+                raise
+            self._report_mode_verified = not self._keep_open  # set blindly with every open otherwise
+            self._warmup = False  # don't know the state!
 
         if warm_up:
             self.warm_up()
 
     def close(self, sleep=True):
+        """Ends a cycle. The serial session is kept open (see `disconnect`) unless configured otherwise."""
         _logger.debug("close(sleep=%s)", sleep)
         if self._sensor is not None:
             if sleep:
                 try:
-                    self._sensor.sleep()
+                    self.sleep()
                 except Exception as ex:
                     _logger.exception(ex)
+                    self.disconnect()  # reopened with the next cycle
 
+            if not self._keep_open:
+                self.disconnect()
+
+    def disconnect(self):
+        """Closes the serial session."""
+        if self._sensor is not None:
+            _logger.debug("disconnect")
             try:
                 self._sensor.close()
             except Exception as ex:
@@ -61,33 +138,192 @@ class Sensor:
             finally:
                 self._sensor = None
                 self._warmup = False
+                self._report_mode_verified = False
+                self._work_period_verified = False
+
+    def cancel_io(self):
+        """Aborts a blocking read of the worker thread (shutdown)."""
+        sensor = self._sensor
+        if sensor is not None:
+            sensor.cancel_read()
+
+    def fileno(self):
+        """File descriptor of the serial port (wait for pushed frames), None if not open."""
+        return self._sensor.fileno() if self._sensor is not None else None
 
     def warm_up(self):
         if self._sensor:
-            self._sensor.sleep(sleep=False)
+            try:
+                self._sensor.sleep(sleep=False)
+                if not self._report_mode_verified:
+                    self._verify_report_mode()  # the sensor must be awake to answer
+                if not self._work_period_verified:
+                    self._verify_work_period()
+            except SerialException:
+                self.disconnect()  # reopened with the next cycle
+                raise
             self._warmup = True
+            self._samples.clear()  # see `warm_up_settled`
             _logger.debug("warming up")
 
+    def warm_up_settled(self, tolerance: float) -> bool:
+        """
+        Collects the frames streamed while warming up. Doesn't block.
+        :param tolerance: relative spread of the recent samples, see `SampleWindow.settled`
+        :return: True if the readings have converged, the measuring window can be started early
+        """
+        if not self.streaming:
+            return False
+        self.collect()
+        return self._samples.settled(self.WARM_UP_SETTLED_SAMPLES, tolerance)
+
+    def _verify_report_mode(self):
+        """Sets the report mode once per session, checked by reading it back."""
+        expected = self.active_reporting
+        active = self._sensor.get_report_mode()
+        if active != expected:
+            _logger.info("set report mode (active=%s; read back: %s)", expected, active)
+            self._sensor.set_report_mode(active=expected)
+            active = self._sensor.get_report_mode()
+
+        self._report_mode_verified = (active == expected)
+        if not self._report_mode_verified:
+            _logger.error("report mode could not be verified (active=%s; read back: %s)!", expected, active)
+
+    def _verify_work_period(self):
+        """
+        Sets the work period once per session, checked by reading it back. Stored in the sensor's flash: continuous
+        (0) for query and stream mode, after the sensor was used in work period mode before.
+        """
+        expected = self.work_period or 0
+        period = self._sensor.get_work_period()
+        if period != expected:
+            _logger.info("set work period (%s min; read back: %s)", expected, period)
+            self._sensor.set_work_period(work_time=expected)
+            period = self._sensor.get_work_period()
+
+        self._work_period_verified = (period == expected)
+        if not self._work_period_verified:
+            _logger.error("work period could not be verified (%s min; read back: %s)!", expected, period)
+
+    def start_work_period(self):
+        """
+        Wakes the sensor and programs its work period (once per session, see `warm_up`). Afterwards the sensor cycles
+        by itself and pushes one frame per period, see `read_reports`.
+        """
+        self.open(warm_up=True)
+
+    def read_reports(self):
+        """Reads the frames pushed by the sensor (work period mode). Doesn't block.
+        @rtype: list(Result)
+        """
+        if self._sensor is None:
+            return []
+
+        try:
+            frames = self._sensor.read_available()
+        except SerialException as ex:
+            _logger.exception(ex)
+            self.disconnect()  # reopened with the next `start_work_period`
+            self._count_error("reading pushed frames failed")
+            return [Result(ResultState.ERROR)]
+
+        results = []
+        for pm25, pm10 in frames:
+            if self.check_measurement(pm10=pm10, pm25=pm25):
+                self._error_ignored = 0
+                results.append(Result(ResultState.OK, pm10=pm10, pm25=pm25))
+            else:
+                self._count_error(f"wrong pushed measurement (pm25={pm25}; pm10={pm10})")
+                results.append(Result(ResultState.ERROR))
+        return results
+
+    def report_missing(self):
+        """No frame was pushed within the expected time (work period mode)."""
+        self._count_error("no frame pushed within work period")
+        self._work_period_verified = False  # program again
+        return Result(ResultState.ERROR)
+
     def sleep(self):
         self._warmup = False
         if self._sensor:
             self._sensor.sleep()
             _logger.debug("sent to sleep")
 
+    def start_measuring(self, time_measuring: float = 0):
+        """
+        Starts the measuring window: older samples (frames of the warm up) are discarded.
+        :param time_measuring: length of the measuring window (seconds) to size the sample buffer (streaming)
+        """
+        self._samples.clear()
+        self._sample_attempts = 0
+        if self.streaming:
+            self._samples.resize(int(time_measuring * self.STREAM_FRAMES_PER_SECOND) + self.STREAM_EXTRA_FRAMES)
+        if self.streaming and self._sensor:
+            try:
+                self._sensor.flush_input()
+            except SerialException as ex:
+                _logger.exception(ex)
+
+    def collect(self):
+        """Collects the streamed frames received so far into the sample window. Doesn't block."""
+        if not self.streaming or self._sensor is None:
+            return
+
+        try:
+            frames = self._sensor.read_available()
+        except SerialException as ex:
+            _logger.exception(ex)
+            self._count_error("reading streamed frames failed")
+            return
+
+        for pm25, pm10 in frames:
+            if self.check_measurement(pm10=pm10, pm25=pm25):
+                self._samples.append(pm25=pm25, pm10=pm10)
+            else:
+                _logger.debug("skip wrong streamed measurement: pm25=%s; pm10=%s!", pm25, pm10)
+
+    def sample(self):
+        """Queries one sample of a burst (query mode). Failures are counted but not raised; see `measure`."""
+        if self._sensor is None:
+            raise SensorError("sensor was not opened!")
+
+        self._sample_attempts += 1
+        try:
+            measurement = self._sensor.query()
+        except SerialException as ex:
+            _logger.error("query burst sample failed: %s", ex)
+            return
+
+        pm25, pm10 = measurement if measurement is not None else (None, None)
+        if self.check_measurement(pm10=pm10, pm25=pm25):
+            self._samples.append(pm25=pm25, pm10=pm10)
+        else:
+            _logger.debug("skip wrong burst sample: pm25=%s; pm10=%s!", pm25, pm10)
+
     def measure(self):
+        """
+        Returns the measurement result. Streamed frames or burst samples (see `sample`) are consolidated,
+        otherwise the sensor is queried once.
+        """
         if self._sensor is None:
             raise SensorError("sensor was not opened!")
         if not self._warmup:
             raise SensorError("sensor was not warmed up before measurement!")
 
         try:
+            if self.streaming:
+                return self._measure_stream()
+            if self._sample_attempts > 0:
+                return self._measure_burst()
             measurement = self._sensor.query()
         except SerialException as ex:
+            self.disconnect()  # reopened with the next cycle
             self._error_ignored += 1
             if self._error_ignored > self._abort_after_n_errors:
                 raise SensorError(ex)
 
-            _logger.error("self._sensor.query() failed, but ignore %s of %s!",
+            _logger.error("reading sensor failed, but ignore %s of %s!",
                           self._error_ignored, self._abort_after_n_errors)
             _logger.exception(ex)
             return Result(ResultState.ERROR)
@@ -110,6 +346,44 @@ class Sensor:
                 self._error_ignored = 0
                 return Result(ResultState.OK, pm10=pm10, pm25=pm25)
 
+    def _measure_stream(self):
+        self.collect()
+        result = self._samples.create_result()
+        self._samples.clear()
+
+        if result.state != ResultState.OK:
+            self._count_error("no valid frames within measuring window")
+        else:
+            self._error_ignored = 0
+
+        return result
+
+    def _measure_burst(self):
+        """
+        Consolidates the burst samples. Wrong samples and outliers are dropped. The whole cycle counts as one error
+        (see `abort_after_n_errors`) only if less than half of the samples were usable.
+        """
+        attempts = self._sample_attempts
+        result = self._samples.create_result(reject_outliers=True)
+        self._samples.clear()
+        self._sample_attempts = 0
+
+        if result.state != ResultState.OK or result.samples * 2 < attempts:
+            self._count_error(f"only {result.samples} of {attempts} burst samples usable")
+            result.state = ResultState.ERROR
+            result.pm10, result.pm25 = None, None
+        else:
+            self._error_ignored = 0
+
+        return result
+
+    def _count_error(self, reason: str):
+        self._error_ignored += 1
+        if self._error_ignored >= self._abort_after_n_errors:
+            raise SensorError(f"{self._error_ignored} wrong measurments ({reason})!")
+
+        _logger.warning("%s (ignore %s of %s)!", reason, self._error_ignored, self._abort_after_n_errors)
+
     @classmethod
     def check_measurement(cls, pm25, pm10):
         if pm25 is None or pm10 is None:
@@ -125,6 +399,8 @@ class Sensor:
 
 class MockSensor(Sensor):
 
+    blocking_io = False
+
     def __init__(self, config):
         super().__init__(config)
 
@@ -137,12 +413,36 @@ class MockSensor(Sensor):
     def close(self, sleep=True):
         _logger.info(f"mocked closed (sleep={sleep})")
 
+    def disconnect(self):
+        _logger.info("mocked disconnect")
+
+    def fileno(self):
+        return None
+
+    def start_work_period(self):
+        _logger.info("mocked start_work_period")
+
+    def read_reports(self):
+        return [self.measure()]
+
     def warm_up(self):
         _logger.info("mocked warm_up")
 
     def sleep(self):
         _logger.info("mocked sleep")
 
+    def warm_up_settled(self, tolerance: float) -> bool:
+        return False
+
+    def start_measuring(self, time_measuring: float = 0):
+        _logger.info("mocked start_measuring")
+
+    def sample(self):
+        _logger.info("mocked sample")
+
+    def collect(self):
+        pass
+
     @classmethod
     def dummy_measure(self):
         return Result(ResultState.OK, pm10=1, pm25=1)
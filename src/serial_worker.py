@@ -0,0 +1,77 @@
+import logging
+import threading
+from concurrent.futures import Future
+from queue import Queue
+
+_logger = logging.getLogger(__name__)
+
+
+class SerialWorker:
+    """
+    Executes blocking I/O (serial port) on a dedicated thread, so the main loop never blocks on the UART.
+
+    `submit` returns a `concurrent.futures.Future`. The notify callback (e.g. `Scheduler.wake_up`) is called from the
+    worker thread whenever a job is done.
+    """
+
+    def __init__(self, name="serial-worker", notify_callback=None):
+        self._notify_callback = notify_callback
+        self._jobs = Queue()
+        self._lock = threading.Lock()
+        self._pending = 0  # queued or running jobs
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    @property
+    def busy(self):
+        """a job is running or queued"""
+        with self._lock:
+            return self._pending > 0
+
+    @property
+    def alive(self):
+        return self._thread.is_alive()
+
+    def submit(self, func, *args, **kwargs) -> Future:
+        if not self._thread.is_alive():
+            raise RuntimeError("serial worker was stopped!")
+
+        future = Future()
+        with self._lock:
+            self._pending += 1
+        self._jobs.put((future, func, args, kwargs))
+        return future
+
+    def stop(self, timeout=None) -> bool:
+        """
+        Stops the thread after the queued jobs.
+        :return: True if the thread has finished within timeout
+        """
+        if self._thread.is_alive():
+            self._jobs.put(None)
+            self._thread.join(timeout)
+        stopped = not self._thread.is_alive()
+        if not stopped:
+            _logger.warning("serial worker still busy (not stopped within %ss)!", timeout)
+        return stopped
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+
+            future, func, args, kwargs = job
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(func(*args, **kwargs))
+                    except BaseException as ex:
+                        future.set_exception(ex)
+            finally:
+                with self._lock:
+                    self._pending -= 1
+
+            if self._notify_callback is not None:
+                self._notify_callback()
@@ -3,16 +3,31 @@ import json
 import logging
 from json import JSONDecodeError
 
+from src.topic_trie import TopicTrie
+
 _logger = logging.getLogger(__name__)
 
 
 class Subscription(abc.ABC):
+    """
+    Input topic (filter, `+` and `#` wildcards allowed). With several matching topics the values are aggregated:
+    - "latest": only the latest value counts (default for plain topics),
+    - "any": the condition fails if it fails for any topic (default for wildcard filters),
+    - "all": the condition fails only if it fails for all topics.
+    """
+
+    AGGREGATE_LATEST = "latest"
+    AGGREGATE_ANY = "any"
+    AGGREGATE_ALL = "all"
+    AGGREGATES = (AGGREGATE_LATEST, AGGREGATE_ANY, AGGREGATE_ALL)
 
     def __init__(self, key):
         self.key = key
         self.topic = None
-        self.attribute = None
+        self.attribute = None  # compiled attribute path (tuple), None for scalar payloads
+        self.aggregate = self.AGGREGATE_LATEST
         self.value = None  # type: str
+        self.values = {}  # topic => latest value (wildcard filters)
         self.extract_error = None
 
     def __str__(self):
@@ -22,6 +37,11 @@ class Subscription(abc.ABC):
         return f'(value={self.value}, topic={self.topic})'
 
     def config(self, data):
+        """
+        :param data: topic; [topic, attribute, ...] for JSON payloads;
+            or {"topic": ..., "attribute": [...] (optional), "aggregate": "latest"|"any"|"all" (optional)}
+        """
+        aggregate = None
         if data is None:
             self.topic = None
         elif isinstance(data, str):
@@ -29,15 +49,37 @@ class Subscription(abc.ABC):
         elif isinstance(data, (list, tuple)):
             if len(data) < 2:
                 raise ValueError(f"Cannot config mqtt subscription '{self.key.value}' ({data})!")
-            self.topic, *self.attribute = data
+            self.topic, *attribute = data
+            self.attribute = tuple(attribute)
+        elif isinstance(data, dict) and data.get("topic"):
+            self.topic = data["topic"]
+            attribute = data.get("attribute")
+            if attribute is not None:
+                self.attribute = tuple(attribute) if isinstance(attribute, (list, tuple)) else (attribute,)
+            aggregate = data.get("aggregate")
         else:
             raise ValueError(f"Cannot extract mqtt subscription for '{self.key.value}' ({data})!")
 
+        if self.topic:
+            try:
+                TopicTrie.validate(self.topic)
+            except ValueError as ex:
+                raise ValueError(f"Cannot config mqtt subscription '{self.key.value}' ({ex})")
+
+        if aggregate is None:
+            wildcard = self.topic and TopicTrie.is_wildcard(self.topic)
+            aggregate = self.AGGREGATE_ANY if wildcard else self.AGGREGATE_LATEST
+        if aggregate not in self.AGGREGATES:
+            raise ValueError(f"Invalid aggregate '{aggregate}' for '{self.key.value}' (expected: {self.AGGREGATES})!")
+        self.aggregate = aggregate
+
     def is_active(self):
         return bool(self.topic)
 
     def matches_topic(self, topic: str) -> bool:
-        return topic == self.topic
+        if not self.topic:
+            return False
+        return TopicTrie.matches(self.topic, topic)
 
     def missing_value(self) -> bool:
         """signal that waiting for notifications"""
@@ -54,25 +96,58 @@ class Subscription(abc.ABC):
             self.extract_json(payload)
 
     def extract_json(self, payload: str):
+        self.extract_document(payload, *self.parse_json(payload))
+
+    @classmethod
+    def parse_json(cls, payload: str):
+        """:return: (document, error) - a JSON object or the reason why it couldn't be parsed"""
+        try:
+            document = json.loads(payload)
+            if not isinstance(document, dict):
+                raise ValueError("Dict expected!")
+            return document, None
+        except (JSONDecodeError, ValueError) as ex:
+            return None, ex
+
+    def extract_document(self, payload: str, document, error=None):
+        """Extracts the value from a payload, which was already parsed (see `parse_json`)"""
         self.extract_error = None
         self.value = None
 
         try:
-            self.value = json.loads(payload)
-            if not isinstance(self.value, dict):
-                raise ValueError("Dict expected!")
+            if error is not None:
+                raise error
 
+            value = document
             for attribute in self.attribute:
-                self.value = self.value[attribute]
+                value = value[attribute]
+            self.value = value
 
-        except (JSONDecodeError, AttributeError, ValueError, KeyError) as ex:
+        except (JSONDecodeError, AttributeError, ValueError, KeyError, IndexError, TypeError) as ex:
             _logger.error(f"Cannot extract '{self.key.value}' from '{str(payload)}'!")
             self.value = None
             self.extract_error = str(ex)
 
-    @abc.abstractmethod
+    def clear(self, topic):
+        """forgets the value of a (wildcard matched) topic, which was cleared (empty payload)"""
+        self.values.pop(topic, None)
+        self.value = list(self.values.values())[-1] if self.values else None
+        self.extract_error = None
+
     def verify(self) -> bool:
         """verifies that the condition are fulfilled"""
+        if not self.is_active():
+            return True
+
+        if self.aggregate == self.AGGREGATE_LATEST or not self.values:
+            return self.verify_value(self.value)
+
+        results = [self.verify_value(value) for value in self.values.values()]
+        return all(results) if self.aggregate == self.AGGREGATE_ANY else any(results)
+
+    @abc.abstractmethod
+    def verify_value(self, value) -> bool:
+        """verifies that the condition are fulfilled for one value"""
         raise NotImplementedError()
 
 
@@ -95,42 +170,110 @@ class RangeSubscription(Subscription):
         if self.min >= self.max:
             raise ValueError(f"Invalid range [{self.min}, {self.max}] for '{self.key.value}'!")
 
-    def verify(self) -> bool:
-        if not self.is_active():
-            return True
-
-        if self.value is None:
+    def verify_value(self, value) -> bool:
+        if value is None:
             _logger.info(f"No subscription value '{self.key.value}' available!")
             return False
 
-        if self.value == "-":
+        if value == "-":
             _logger.info(f"No value for '{self.key.value}' available!")
             return False
 
         try:
-            float_value = float(self.value)
+            float_value = float(value)
         except ValueError:
-            _logger.info(f"Cannot convert '{self.key.value}'.value ({self.value}) to float!")
+            _logger.info(f"Cannot convert '{self.key.value}'.value ({value}) to float!")
             return False
 
         if self.min > float_value or float_value > self.max:
-            _logger.info(f"'{self.key.value}' ({self.value}) outside range [{self.min}, {self.max}].")
+            _logger.info(f"'{self.key.value}' ({value}) outside range [{self.min}, {self.max}].")
             return False
 
         return True
 
 
-class OnHoldSubscription(Subscription):
+class TriggerSubscription(Subscription):
+    """Command topic: every message requests a measurement (payload doesn't matter), see `take_request`."""
 
-    def verify(self) -> bool:
-        if not self.is_active():
-            return True
+    def __init__(self, key):
+        super().__init__(key)
+        self.requests = 0
+
+    def extract(self, payload: str) -> bool:
+        self.value = payload
+        self.requests += 1
+
+    def extract_document(self, payload: str, document, error=None):
+        self.extract(payload)  # the payload doesn't matter
+
+    def clear(self, topic):
+        self.extract("")  # the payload doesn't matter
 
-        # if self.value is None: => doesn't matter, all fine!
+    def take_request(self) -> bool:
+        """:return: True if a measurement was requested since the last call (requests are merged)"""
+        requested = self.requests > 0
+        self.requests = 0
+        return requested
 
-        comp = str(self.value).upper().replace(" ", "").replace("_", "")
+    def missing_value(self) -> bool:
+        return False
+
+    def verify_value(self, value) -> bool:
+        return True
+
+
+class OnHoldSubscription(Subscription):
+
+    def verify_value(self, value) -> bool:
+        # if value is None: => doesn't matter, all fine!
+
+        comp = str(value).upper().replace(" ", "").replace("_", "")
         if comp in ["HOLD", "ONHOLD", "TRUE", "STOP", "1"]:
             _logger.info(f"'ON HOLD' by '{self.key.value}'.")
             return False
 
         return True
+
+
+class SubscriptionIndex:
+    """
+    Subscriptions by topic: each message is looked up once and its payload decoded and parsed (JSON) once, however
+    many subscriptions share the topic (e.g. temperature and humidity of one weather station document).
+    """
+
+    def __init__(self, subscriptions=()):
+        self._trie = TopicTrie()  # topic filter => Subscription
+        self._topics = []
+        for subscription in subscriptions:
+            if subscription.is_active():
+                self._trie.add(subscription.topic, subscription)
+                if subscription.topic not in self._topics:
+                    self._topics.append(subscription.topic)
+
+    @property
+    def topics(self):
+        return list(self._topics)
+
+    def subscriptions(self, topic: str):
+        """@rtype: list(Subscription) - subscriptions whose filter matches the topic (empty if none)"""
+        return self._trie.match(topic)
+
+    @classmethod
+    def extract(cls, subscriptions, topic, payload):
+        """updates the subscriptions (matching one topic) with a payload (str or bytes)"""
+        if isinstance(payload, bytes):
+            payload = payload.decode("utf-8")
+
+        parsed = None
+        for subscription in subscriptions:
+            if not payload and subscription.aggregate != Subscription.AGGREGATE_LATEST:
+                subscription.clear(topic)  # retained message deleted
+                continue
+            if subscription.attribute is None:
+                subscription.extract(payload)
+            else:
+                if parsed is None:
+                    parsed = Subscription.parse_json(payload)
+                subscription.extract_document(payload, *parsed)
+            if subscription.aggregate != Subscription.AGGREGATE_LATEST:
+                subscription.values[topic] = subscription.value
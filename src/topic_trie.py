@@ -0,0 +1,89 @@
+class TopicTrie:
+    """
+    MQTT topic filters (with `+` and `#` wildcards) by level: a topic is matched in time proportional to its depth,
+    independent of the number of filters. Values are returned in the order they were added.
+    """
+
+    class _Node:
+        __slots__ = ("children", "values", "multi_level")
+
+        def __init__(self):
+            self.children = {}  # level (or "+") => node
+            self.values = []  # (order, value) of filters ending here
+            self.multi_level = []  # (order, value) of filters ending here with "#"
+
+    def __init__(self):
+        self._root = self._Node()
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    @classmethod
+    def validate(cls, topic_filter: str):
+        levels = topic_filter.split("/")
+        for index, level in enumerate(levels):
+            if level == "#" and index != len(levels) - 1:
+                raise ValueError(f"'#' must be the last level of the topic filter ({topic_filter})!")
+            if level not in ("#", "+") and ("#" in level or "+" in level):
+                raise ValueError(f"wildcards must occupy an entire level of the topic filter ({topic_filter})!")
+        if not topic_filter:
+            raise ValueError("empty topic filter!")
+        return levels
+
+    @classmethod
+    def is_wildcard(cls, topic_filter: str) -> bool:
+        return "+" in topic_filter or "#" in topic_filter
+
+    @classmethod
+    def matches(cls, topic_filter: str, topic: str) -> bool:
+        """checks a single filter (no index, for occasional checks)"""
+        trie = TopicTrie()
+        trie.add(topic_filter, True)
+        return bool(trie.match(topic))
+
+    def add(self, topic_filter: str, value):
+        node = self._root
+        levels = self.validate(topic_filter)
+        entry = (self._count, value)
+        self._count += 1
+
+        if levels[-1] == "#":
+            levels = levels[:-1]
+            for level in levels:
+                node = node.children.setdefault(level, self._Node())
+            node.multi_level.append(entry)
+        else:
+            for level in levels:
+                node = node.children.setdefault(level, self._Node())
+            node.values.append(entry)
+
+    def match(self, topic: str):
+        """:return: values of all filters matching the topic"""
+        levels = topic.split("/")
+        system_topic = topic.startswith("$")  # not matched by wildcards on the first level
+        found = []
+
+        nodes = [self._root]
+        for depth, level in enumerate(levels):
+            next_nodes = []
+            for node in nodes:
+                if node.multi_level and not (depth == 0 and system_topic):
+                    found.extend(node.multi_level)
+                child = node.children.get(level)
+                if child is not None:
+                    next_nodes.append(child)
+                child = node.children.get("+")
+                if child is not None and not (depth == 0 and system_topic):
+                    next_nodes.append(child)
+            nodes = next_nodes
+            if not nodes:
+                break
+
+        for node in nodes:
+            found.extend(node.values)
+            found.extend(node.multi_level)  # "a/#" matches "a" too
+
+        if len(found) > 1:
+            found.sort(key=lambda entry: entry[0])
+        return [value for _, value in found]
@@ -0,0 +1,192 @@
+import math
+import unittest
+from unittest.mock import MagicMock
+
+from src.bridge import Bridge
+from src.config_key import ConfigKey
+from src.mqtt_connector import MqttConnector
+from src.sensor import MockSensor, SensorError
+
+
+class MockMessage:
+
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+
+class MockBridge(Bridge):
+
+    def __init__(self, time_stop_at):
+        super().__init__()
+        self.time_stop_at = time_stop_at
+        self.virtual_clock = 0
+        self.wait_count = 0
+        self.mqtt_messages = []  # (channel, message)
+        self.incoming_messages = []
+
+    def _create_mqtt_connector(self, _config):
+        mqtt = MqttConnector()
+        mqtt.open = MagicMock()
+        mqtt.close = MagicMock()
+        mqtt.is_open = MagicMock(return_value=True)
+        mqtt.subscribe = MagicMock()
+
+        def publish(message: str, channel: str = None, retain: bool = None, store: bool = False):
+            self.mqtt_messages.append((channel, message))
+
+        def get_messages():
+            messages = self.incoming_messages
+            self.incoming_messages = []
+            return messages
+
+        mqtt.publish = publish
+        mqtt.get_messages = get_messages
+        return mqtt
+
+    def _create_process(self):
+        process = super()._create_process()
+        process._clock = self._clock
+        return process
+
+    def _clock(self):
+        return self.virtual_clock
+
+    def _wait(self, seconds: float, fds=None):
+        self.wait_count += 1
+        self.virtual_clock += math.ceil(max(0, seconds) * 1000) / 1000  # float deltas may be absorbed otherwise
+        for process in self._processes:
+            process.update_timer()
+        if self.virtual_clock >= self.time_stop_at:
+            self._shutdown = True
+
+
+class TestBridge(unittest.TestCase):
+
+    def create_config(self, sensors=None):
+        config = {
+            ConfigKey.MOCK_SENSOR.value: True,
+            ConfigKey.TIME_INTERVAL_MAX.value: 100,
+            ConfigKey.TIME_WARM_UP.value: 10,
+            ConfigKey.MQTT_CHANNEL_OUT_STATE.value: "site/state",
+        }
+        if sensors is not None:
+            config[ConfigKey.SENSORS.value] = sensors
+        return config
+
+    def test_sensor_configs(self):
+        config = self.create_config()
+        self.assertEqual(Bridge.sensor_configs(config), [config])
+
+        config = self.create_config([
+            {ConfigKey.SERIAL_PORT.value: "/dev/ttyUSB0"},
+            {ConfigKey.SERIAL_PORT.value: "/dev/ttyUSB1", ConfigKey.MQTT_CHANNEL_OUT_STATE.value: "workshop/state"},
+        ])
+        configs = Bridge.sensor_configs(config)
+        self.assertEqual(len(configs), 2)
+        self.assertEqual(configs[0][ConfigKey.SERIAL_PORT.value], "/dev/ttyUSB0")
+        self.assertEqual(configs[0][ConfigKey.MQTT_CHANNEL_OUT_STATE.value], "site/state")
+        self.assertEqual(configs[1][ConfigKey.MQTT_CHANNEL_OUT_STATE.value], "workshop/state")
+        self.assertEqual(configs[1][ConfigKey.TIME_WARM_UP.value], 10)
+        self.assertNotIn(ConfigKey.SENSORS.value, configs[1])
+
+        with self.assertRaises(ValueError):
+            Bridge.sensor_configs(self.create_config(["/dev/ttyUSB0"]))
+
+    def test_sensor_configs_exclusive(self):
+        config = self.create_config([{ConfigKey.SERIAL_PORT.value: "/dev/ttyUSB0"}, {}])
+        config[ConfigKey.LIFETIME_FILE.value] = "/var/lib/sds011/lifetime.json"
+        with self.assertRaises(ValueError):
+            Bridge.sensor_configs(config)
+
+        config = self.create_config([{ConfigKey.SERIAL_PORT.value: "/dev/ttyUSB0"},
+                                     {ConfigKey.SERIAL_PORT.value: "/dev/ttyUSB0"}])
+        with self.assertRaises(ValueError):
+            Bridge.sensor_configs(config)
+
+        config = self.create_config([{ConfigKey.MQTT_OUTBOX.value: "/var/lib/sds011/outbox.db"}])
+        with self.assertRaises(ValueError):
+            Bridge.sensor_configs(config)
+
+        config = self.create_config([{ConfigKey.LIFETIME_FILE.value: "indoor.json"},
+                                     {ConfigKey.LIFETIME_FILE.value: "outdoor.json"}])
+        self.assertEqual(len(Bridge.sensor_configs(config)), 2)
+
+    def test_run_shares_connection(self):
+        config = self.create_config([
+            {ConfigKey.MQTT_CHANNEL_OUT_STATE.value: "indoor/state"},
+            {ConfigKey.MQTT_CHANNEL_OUT_STATE.value: "outdoor/state", ConfigKey.TIME_INTERVAL_MAX.value: 50,
+             ConfigKey.MQTT_CHANNEL_IN_HOLD.value: "outdoor/hold"},
+        ])
+
+        bridge = MockBridge(time_stop_at=300)
+        bridge.open(config)
+        processes = list(bridge._processes)
+        mqtt = bridge._mqtt
+
+        self.assertEqual(len(processes), 2)
+        for process in processes:
+            self.assertIs(process._mqtt, mqtt)
+            self.assertIs(process._scheduler, bridge._scheduler)
+            self.assertIsInstance(process._sensor, MockSensor)
+
+        bridge.run()
+
+        mqtt.open.assert_called_once()
+        mqtt.close.assert_called_once()
+        mqtt.subscribe.assert_called_once_with(["outdoor/hold"])
+
+        channels = [c for c, _ in bridge.mqtt_messages]
+        self.assertEqual(set(channels), {"indoor/state", "outdoor/state"})
+        self.assertGreaterEqual(channels.count("indoor/state"), 3)
+        self.assertGreater(channels.count("outdoor/state"), channels.count("indoor/state"))
+
+        # one shared wait per due transition of any sensor (warm up, cool down, interval) + retained messages
+        self.assertLessEqual(bridge.wait_count, 3 * len(channels) + 1)
+
+    def test_run_dispatches_messages(self):
+        config = self.create_config([
+            {ConfigKey.MQTT_CHANNEL_OUT_STATE.value: "indoor/state"},
+            {ConfigKey.MQTT_CHANNEL_OUT_STATE.value: "outdoor/state", ConfigKey.MQTT_CHANNEL_IN_HOLD.value: "hold"},
+        ])
+
+        bridge = MockBridge(time_stop_at=300)
+        bridge.open(config)
+        bridge.incoming_messages = [MockMessage("hold", b"HOLD")]
+        bridge.run()
+
+        outdoor = [m for c, m in bridge.mqtt_messages if c == "outdoor/state"]
+        indoor = [m for c, m in bridge.mqtt_messages if c == "indoor/state"]
+        self.assertTrue(outdoor)
+        self.assertTrue(all("DEACTIVATED" in m for m in outdoor))
+        self.assertTrue(indoor)
+        self.assertFalse(any("DEACTIVATED" in m for m in indoor))
+
+    def test_run_survives_failed_sensor(self):
+        config = self.create_config([
+            {ConfigKey.MQTT_CHANNEL_OUT_STATE.value: "indoor/state"},
+            {ConfigKey.MQTT_CHANNEL_OUT_STATE.value: "outdoor/state"},
+        ])
+
+        bridge = MockBridge(time_stop_at=300)
+        bridge.open(config)
+        failed = bridge._processes[0]
+        failed.step = MagicMock(side_effect=SensorError("broken"))
+        failed.close = MagicMock()
+        bridge.run()
+
+        failed.close.assert_called_once()
+        channels = [c for c, _ in bridge.mqtt_messages]
+        self.assertNotIn("indoor/state", channels)
+        self.assertGreaterEqual(channels.count("outdoor/state"), 3)
+
+    def test_run_all_sensors_failed(self):
+        bridge = MockBridge(time_stop_at=300)
+        bridge.open(self.create_config([{}, {}]))
+        for process in bridge._processes:
+            process.step = MagicMock(side_effect=SensorError("broken"))
+        mqtt = bridge._mqtt
+
+        with self.assertRaises(RuntimeError):
+            bridge.run()
+        mqtt.close.assert_called_once()
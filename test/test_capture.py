@@ -0,0 +1,105 @@
+import os
+import struct
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from src.sds011 import SDS011, capture
+from src.sds011.capture import CaptureWriter, RX, TX
+
+
+def create_frame(pm25, pm10):
+    data = struct.pack('<HH', int(pm25 * 10), int(pm10 * 10)) + b'\xab\xcd'
+    return SDS011.HEAD + SDS011.DATA_CMD + data + bytes([sum(data) % 256]) + SDS011.TAIL
+
+
+class TestCapture(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "test.cap")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write_capture(self):
+        writer = CaptureWriter(self.path)
+        frame2 = create_frame(3.0, 4.0)
+        writer.write(TX, b'\xaa\xb4\x04' + b'\x00' * 16)
+        writer.write(RX, b'\x17' + create_frame(1.0, 2.0) + frame2[:4])  # garbage, split frame
+        writer.write(RX, frame2[4:])
+        writer.write(RX, create_frame(5.0, 6.0)[:8] + b'\x00\xab')  # checksum error
+        writer.write(RX, b'\xaa' + create_frame(25.8, 0.1))
+        writer.close()
+
+        writer = CaptureWriter(self.path)  # append
+        writer.write(RX, create_frame(7.0, 8.0))
+        writer.close()
+
+    def test_records(self):
+        self.write_capture()
+        records = list(capture.read_records(self.path))
+
+        self.assertEqual(len(records), 6)
+        self.assertEqual([r[1] for r in records], [TX, RX, RX, RX, RX, RX])
+        self.assertEqual(records[0][2][:3], b'\xaa\xb4\x04')
+        self.assertTrue(all(records[i][0] <= records[i + 1][0] for i in range(5)))
+
+    def test_no_capture_file(self):
+        with open(self.path, "wb") as file:
+            file.write(b"something else")
+        with self.assertRaises(ValueError):
+            list(capture.read_records(self.path))
+
+    def check_decode(self, use_numpy):
+        records = list(capture.read_records(self.path))
+
+        series = capture.decode_files([self.path], use_numpy=use_numpy)
+
+        self.assertEqual([(s[1], s[2]) for s in series], [(1.0, 2.0), (3.0, 4.0), (25.8, 0.1), (7.0, 8.0)])
+        self.assertEqual(series[1][0], records[2][0])  # timestamp of the completing record
+        return series
+
+    def test_decode_python(self):
+        self.write_capture()
+        self.check_decode(use_numpy=False)
+
+    @unittest.skipIf(capture.numpy is None, "NumPy not installed")
+    def test_decode_numpy(self):
+        self.write_capture()
+        self.assertEqual(self.check_decode(use_numpy=True), self.check_decode(use_numpy=False))
+
+    def test_decode_overlapping(self):
+        # valid frames at 0, 7 (overlaps the first) and 10 (overlaps the second, but not the first)
+        data = bytes([0xaa, 0xc0, 22, 0, 0, 0, 0, 0xaa, 0xc0, 0xab, 0xaa, 0xc0, 0, 0, 0, 0x15, 0xab, 0, 0xc0, 0xab])
+        writer = CaptureWriter(self.path)
+        writer.write(RX, data)
+        writer.close()
+
+        expected = [(2.2, 0.0), (0.0, 537.6)]
+        self.assertEqual([s[1:] for s in capture.decode_file(self.path, use_numpy=False)], expected)
+        if capture.numpy is not None:
+            self.assertEqual([s[1:] for s in capture.decode_file(self.path, use_numpy=True)], expected)
+
+    def test_sds011_capture(self):
+        received = bytearray(create_frame(1.0, 2.0))
+
+        def read(size):
+            data = bytes(received[:size])
+            del received[:size]
+            return data
+
+        serial = MagicMock()
+        type(serial).in_waiting = property(lambda _self: len(received))
+        serial.read = read
+
+        writer = CaptureWriter(self.path)
+        sds011 = SDS011("/dev/null", timeout=0, capture=writer)
+        sds011._serial = serial
+        self.assertEqual(sds011.query(), (1.0, 2.0))
+        writer.close()
+
+        records = list(capture.read_records(self.path))
+        self.assertEqual([r[1] for r in records], [TX, RX])
+        self.assertEqual(records[0][2][2:3], SDS011.QUERY_CMD)
+        self.assertEqual(records[1][2], create_frame(1.0, 2.0))
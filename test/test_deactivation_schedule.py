@@ -0,0 +1,68 @@
+import datetime
+import unittest
+
+import pytz
+
+from src.deactivation_schedule import DeactivationSchedule
+
+
+class TestDeactivationSchedule(unittest.TestCase):
+
+    @classmethod
+    def at(cls, day, hour, minute=0):
+        return datetime.datetime(2020, 1, day, hour, minute, tzinfo=datetime.timezone.utc)  # 2020-01-06: monday
+
+    def test_empty(self):
+        schedule = DeactivationSchedule.compile()
+        self.assertEqual(schedule.state(self.at(6, 12)), (False, None))
+
+    def test_ranges(self):
+        schedule = DeactivationSchedule.compile(ranges=[[0, 299], [300, 359], [1439, 1380]])  # merged
+        self.assertEqual(schedule.state(self.at(6, 0)), (True, 6 * 3600))
+        self.assertEqual(schedule.state(self.at(6, 6)), (False, 17 * 3600))
+        self.assertEqual(schedule.state(self.at(6, 23)), (True, 7 * 3600))  # over midnight: 23:00 .. 06:00
+
+    def test_weekdays(self):
+        schedule = DeactivationSchedule.compile(rules=[
+            {"weekdays": ["sat", "sun"], "from": "22:00", "to": "08:00"},
+            {"weekdays": [0, 1, 2, 3, 4], "from": "9:00", "to": "17:00"},
+        ])
+        self.assertEqual(schedule.state(self.at(10, 23)), (False, 23 * 3600))  # friday => saturday 22:00
+        self.assertEqual(schedule.state(self.at(11, 23)), (True, 9 * 3600))  # saturday => sunday 08:00
+        self.assertEqual(schedule.state(self.at(12, 23)), (True, 9 * 3600))  # sunday => monday 08:00
+        self.assertEqual(schedule.state(self.at(13, 8)), (False, 3600))  # monday 09:00
+
+    def test_dates_and_exceptions(self):
+        schedule = DeactivationSchedule.compile(
+            ranges=[[0, 359]],
+            rules=[{"dates": ["2020-01-07", datetime.date(2020, 1, 8)], "from": "12:00", "to": "13:00"}],
+            exceptions=["2020-01-08"])
+        self.assertEqual(schedule.state(self.at(7, 12, 30)), (True, 30 * 60))
+        self.assertEqual(schedule.state(self.at(8, 0)), (False, 12 * 3600))  # exception, dated rule still applies
+        self.assertEqual(schedule.state(self.at(8, 13)), (False, 11 * 3600))
+
+    def test_table_built_once(self):
+        schedule = DeactivationSchedule.compile(ranges=[[0, 359]])
+        schedule.state(self.at(6, 12))
+        transitions = schedule._transitions
+        self.assertEqual(schedule.state(self.at(9, 12)), (False, 12 * 3600))
+        self.assertIs(schedule._transitions, transitions)  # looked up
+
+        self.assertEqual(schedule.state(self.at(30, 12)), (False, 12 * 3600))  # beyond the lookahead: rebuilt
+        self.assertIsNot(schedule._transitions, transitions)
+
+    def test_daylight_saving_time(self):
+        tz = pytz.timezone("Europe/Berlin")  # 2020-03-29 02:00 => 03:00, 2020-10-25 03:00 => 02:00
+        schedule = DeactivationSchedule.compile(rules=[{"from": "22:00", "to": "06:00"}])
+
+        self.assertEqual(schedule.state(tz.localize(datetime.datetime(2020, 3, 28, 23))), (True, 6 * 3600))
+        self.assertEqual(schedule.state(tz.localize(datetime.datetime(2020, 3, 29, 12))), (False, 10 * 3600))
+        self.assertEqual(schedule.state(tz.localize(datetime.datetime(2020, 10, 24, 23))), (True, 8 * 3600))
+
+    def test_invalid(self):
+        for rules in [[{"from": "25:00", "to": "1:00"}], [{"from": "1:00"}], [{"weekdays": ["xyz"], "from": 0,
+                                                                                "to": 10}]]:
+            with self.assertRaises(ValueError):
+                DeactivationSchedule.compile(rules=rules)
+        with self.assertRaises(ValueError):
+            DeactivationSchedule.compile(exceptions=["2020-13-01"])
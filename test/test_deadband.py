@@ -0,0 +1,55 @@
+import datetime
+import json
+import unittest
+
+from src.config_key import ConfigKey
+from src.deadband import Deadband
+from src.result import Result, ResultKey, ResultState
+
+
+class TestDeadband(unittest.TestCase):
+
+    def setUp(self):
+        self.now = datetime.datetime(2020, 1, 1, 12, 0, 0, tzinfo=datetime.timezone.utc)
+        self.deadband = Deadband()
+        self.deadband.config({
+            ConfigKey.DEADBAND.value: {"PM25": {"absolute": 1, "relative": 0.1}, "pm10": {"absolute": 2}},
+            ConfigKey.HEARTBEAT_INTERVAL.value: 600,
+        })
+
+    def accept(self, seconds, pm25, pm10=10.0, state=ResultState.OK):
+        result = Result(state, pm10=pm10, pm25=pm25, timestamp=self.now + datetime.timedelta(seconds=seconds))
+        return self.deadband.accept(result), result
+
+    def test_deadband(self):
+        self.assertEqual(self.accept(0, 20.0)[0], True)
+        self.assertEqual(self.accept(60, 21.9)[0], False)  # relative band: 2.0
+        self.assertEqual(self.accept(120, 18.1, pm10=11.9)[0], False)
+        accepted, result = self.accept(180, 22.1)  # compared with the last published value, not the last sample
+        self.assertEqual(accepted, True)
+        self.assertEqual(json.loads(result.create_message())[ResultKey.SUPPRESSED.value], 2)
+
+        self.assertEqual(self.accept(240, 22.1, pm10=12.1)[0], True)
+        self.assertEqual(self.accept(300, None, pm10=None)[0], True)  # value vanished
+
+    def test_state_and_heartbeat(self):
+        self.assertEqual(self.accept(0, 20.0)[0], True)
+        self.assertEqual(self.accept(60, 20.0, state=ResultState.ERROR)[0], True)
+        self.assertEqual(self.accept(120, 20.0, state=ResultState.ERROR)[0], False)
+        accepted, result = self.accept(660, 20.0, state=ResultState.ERROR)
+        self.assertEqual((accepted, result.suppressed), (True, 1))
+
+    def test_disabled(self):
+        deadband = Deadband()
+        deadband.config({})
+        result = Result(ResultState.OK, pm10=1, pm25=1)
+        self.assertEqual(deadband.accept(result), True)
+        self.assertNotIn(ResultKey.SUPPRESSED.value, json.loads(result.create_message()))
+
+    def test_config(self):
+        for config in [{ConfigKey.DEADBAND.value: {"PM1": {"absolute": 1}}},
+                       {ConfigKey.DEADBAND.value: {"PM25": {"relative": -1}}},
+                       {ConfigKey.DEADBAND.value: [1, 2]},
+                       {ConfigKey.DEADBAND.value: {"PM25": {"absolute": 1}}, ConfigKey.HEARTBEAT_INTERVAL.value: 0}]:
+            with self.assertRaises(ValueError):
+                Deadband().config(config)
@@ -0,0 +1,123 @@
+import time
+import unittest
+
+from src.config_key import ConfigKey
+from src.result import ResultState
+from src.sds011 import SDS011
+from src.sds011.emulator import SDS011Emulator, Fault
+from src.sensor import Sensor, MeasureMode
+
+
+class TestSDS011Emulator(unittest.TestCase):
+
+    def setUp(self):
+        self.emulator = SDS011Emulator(values=(12.3, 45.6), time_factor=0.02)
+        self.emulator.start()
+        self.sds011 = SDS011(self.emulator.port, timeout=1)
+        self.sds011.open()  # query mode
+
+    def tearDown(self):
+        self.sds011.close()
+        self.emulator.stop()
+
+    def set_timeout(self, timeout):
+        self.sds011._timeout = timeout
+        self.sds011._serial.timeout = timeout
+
+    def test_query(self):
+        self.assertEqual(self.emulator.active_mode, False)
+        self.assertEqual(self.sds011.get_report_mode(), False)
+        self.assertEqual(self.sds011.query(), (12.3, 45.6))
+
+    def test_sleep(self):
+        self.sds011.sleep()
+        self.assertEqual(self.emulator.working, False)
+        self.set_timeout(0.2)
+        self.assertEqual(self.sds011.query(), None)  # no answer while sleeping
+        self.set_timeout(1)
+
+        self.sds011.sleep(sleep=False)
+        self.assertEqual(self.sds011.query(), (12.3, 45.6))
+
+    def test_work_period(self):
+        self.sds011.set_work_period(work_time=5)
+        self.assertEqual(self.emulator.work_period, 5)
+        self.assertEqual(self.sds011.get_work_period(), 5)
+
+    def test_active_mode(self):
+        self.sds011.set_report_mode(active=True)
+        time.sleep(0.2)  # 10 frames (50 Hz)
+        frames = self.sds011.read_available()
+        self.assertGreaterEqual(len(frames), 3)
+        self.assertTrue(all(f == (12.3, 45.6) for f in frames))
+
+    def test_faults(self):
+        self.set_timeout(0.2)  # no valid reply expected
+        self.emulator.inject(Fault.CHECKSUM)
+        self.assertEqual(self.sds011.query(), None)
+
+        self.emulator.inject(Fault.NO_REPLY)
+        self.assertEqual(self.sds011.query(), None)
+
+        self.emulator.inject(Fault.SHORT_READ)
+        self.assertEqual(self.sds011.query(), None)
+
+        self.set_timeout(1)
+        self.emulator.inject(Fault.GARBAGE)
+        self.assertEqual(self.sds011.query(), (12.3, 45.6))  # resync
+
+        self.emulator.inject(Fault.GLITCH)
+        pm25, pm10 = self.sds011.query()
+        self.assertEqual((pm25, pm10), SDS011Emulator.GLITCH_VALUES)
+        self.assertFalse(Sensor.check_measurement(pm25=pm25, pm10=pm10))
+
+    def test_device_id(self):
+        def query(id1, id2):
+            cmd = self.sds011.cmd_begin() + SDS011.QUERY_CMD + b"\x00" * 12
+            self.sds011._execute(self.sds011._finish_cmd(cmd, id1, id2))
+            return self.sds011._get_reply()
+
+        self.set_timeout(0.2)
+        self.assertEqual(query(b"\x01", b"\x02"), None)  # other device
+        self.set_timeout(1)
+        raw = query(b"\xab", b"\xcd")
+        self.assertEqual(SDS011.prepare_frame(raw), (12.3, 45.6))
+        self.assertEqual(raw[6:8], b"\xab\xcd")
+
+
+class TestSensorEmulated(unittest.TestCase):
+
+    def test_measure(self):
+        with SDS011Emulator(values=(7.0, 9.5), time_factor=0.02) as emulator:
+            sensor = Sensor({ConfigKey.SERIAL_PORT.value: emulator.port})
+            try:
+                sensor.open(warm_up=True)
+                self.assertEqual(emulator.working, True)
+                self.assertEqual(emulator.active_mode, False)
+
+                result = sensor.measure()
+                self.assertEqual(result.state, ResultState.OK)
+                self.assertEqual((result.pm25, result.pm10), (7.0, 9.5))
+
+                sensor.close(sleep=True)
+                self.assertEqual(emulator.working, False)
+            finally:
+                sensor.disconnect()
+
+    def test_stream(self):
+        with SDS011Emulator(values=(3.0, 4.0), time_factor=0.02) as emulator:
+            sensor = Sensor({ConfigKey.SERIAL_PORT.value: emulator.port,
+                             ConfigKey.MEASURE_MODE.value: MeasureMode.STREAM.value})
+            try:
+                sensor.open(warm_up=True)
+                sensor.start_measuring(10)
+                emulator.inject(Fault.GLITCH)
+                time.sleep(0.2)
+                sensor.collect()
+
+                result = sensor.measure()
+                self.assertEqual(result.state, ResultState.OK)
+                self.assertEqual((result.pm25, result.pm10), (3.0, 4.0))
+                self.assertGreaterEqual(result.samples, 3)
+            finally:
+                sensor.disconnect()
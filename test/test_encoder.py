@@ -0,0 +1,47 @@
+import datetime
+import json
+import unittest
+from unittest import mock
+
+from src import encoder
+from src.encoder import CompactEncoder, ENCODERS, create_encoder
+from src.result import Result, ResultKey, ResultState
+
+
+class TestEncoder(unittest.TestCase):
+
+    def setUp(self):
+        timestamp = datetime.datetime(2020, 1, 1, 12, 0, 0, tzinfo=datetime.timezone.utc)
+        self.result = Result(ResultState.OK, pm10=12.5, pm25=7.25, timestamp=timestamp)
+        self.result.warm_up = 30
+
+    def test_json(self):
+        self.assertEqual(create_encoder("json").encode(self.result), self.result.create_message())
+
+    def test_compact(self):
+        message = create_encoder("compact").encode(self.result)
+        self.assertEqual(json.loads(message), {"p10": 12.5, "p25": 7.25, "s": "OK", "t": 1577880000, "wu": 30})
+        self.assertNotIn(" ", message)
+        self.assertLess(len(message), len(self.result.create_message()))
+
+    def test_all_keys_mapped(self):
+        self.assertEqual(set(CompactEncoder.KEYS), set(ResultKey))
+        self.assertEqual(len(set(CompactEncoder.KEYS.values())), len(ResultKey))
+
+    @unittest.skipIf(encoder.msgpack is None, "msgpack not installed")
+    def test_msgpack(self):
+        message = create_encoder("msgpack").encode(self.result)
+        self.assertEqual(encoder.msgpack.unpackb(message), CompactEncoder.to_compact_dict(self.result))
+
+    @unittest.skipIf(encoder.cbor2 is None, "cbor2 not installed")
+    def test_cbor(self):
+        message = create_encoder("cbor").encode(self.result)
+        self.assertEqual(encoder.cbor2.loads(message), CompactEncoder.to_compact_dict(self.result))
+
+    def test_create(self):
+        self.assertEqual(set(ENCODERS), {"json", "compact", "msgpack", "cbor"})
+        with self.assertRaises(ValueError):
+            create_encoder("xml")
+        with mock.patch("src.encoder.msgpack", None):
+            with self.assertRaises(ValueError):
+                create_encoder("msgpack")
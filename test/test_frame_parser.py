@@ -0,0 +1,65 @@
+import struct
+import unittest
+
+from src.sds011.frame_parser import FrameParser
+
+
+def create_frame(cmd, data):
+    data = data + b'\x00' * (6 - len(data))
+    return b'\xaa' + cmd + data + bytes([sum(data) % 256]) + b'\xab'
+
+
+def create_data_frame(pm25, pm10):
+    return create_frame(FrameParser.DATA_CMD, struct.pack('<HH', int(pm25 * 10), int(pm10 * 10)) + b'\xab\xcd')
+
+
+def create_reply_frame(cmd_id, value=b'\x00'):
+    return create_frame(FrameParser.REPLY_CMD, cmd_id + b'\x01' + value)
+
+
+class TestFrameParser(unittest.TestCase):
+
+    def test_classify(self):
+        parser = FrameParser()
+        frames = parser.feed(create_data_frame(1.5, 2.5) + create_reply_frame(b'\x02'))
+
+        self.assertEqual(len(frames), 2)
+        self.assertTrue(frames[0].is_data)
+        self.assertEqual(frames[0].values(), (1.5, 2.5))
+        self.assertEqual(frames[0].reply_to, None)
+        self.assertTrue(frames[1].is_reply)
+        self.assertEqual(frames[1].reply_to, b'\x02')
+        self.assertEqual(len(parser), 0)
+
+    def test_partial(self):
+        parser = FrameParser()
+        frame = create_reply_frame(b'\x06')
+
+        self.assertEqual(parser.feed(frame[:3]), [])
+        self.assertEqual(parser.feed(frame[3:9]), [])
+        self.assertEqual(len(parser), 9)
+        frames = parser.feed(frame[9:])
+        self.assertEqual([f.raw for f in frames], [frame])
+
+    def test_resync(self):
+        parser = FrameParser()
+        frame = create_data_frame(3.0, 4.0)
+        broken_checksum = frame[:8] + bytes([(frame[8] + 1) % 256]) + frame[9:]
+        wrong_cmd = create_frame(b'\xc1', b'')
+        wrong_tail = frame[:9] + b'\x00'
+
+        stream = b'\x01' + broken_checksum + b'\xaa' + wrong_cmd + wrong_tail + frame + b'\xaa\xc5'
+        frames = parser.feed(stream)
+
+        self.assertEqual([f.raw for f in frames], [frame])
+        self.assertEqual(len(parser), 2)  # start of next frame
+        self.assertEqual(parser.skipped_bytes, len(stream) - len(frame) - 2)
+
+    def test_junk_only(self):
+        parser = FrameParser()
+        self.assertEqual(parser.feed(b'\x00\x01\x02'), [])
+        self.assertEqual(len(parser), 0)
+
+        parser.feed(b'\xaa\xc0')
+        parser.clear()
+        self.assertEqual(len(parser), 0)
@@ -0,0 +1,35 @@
+import unittest
+
+from src.inbox import Inbox
+
+
+class Message:
+
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+
+class TestInbox(unittest.TestCase):
+
+    def test_latest_per_topic(self):
+        inbox = Inbox()
+        for i in range(1000):
+            inbox.put(Message("humi", str(i)))
+        inbox.put(Message("temp", "20"))
+        inbox.put(Message("humi", "last"))
+
+        messages = inbox.take()
+        self.assertEqual([(m.topic, m.payload) for m in messages], [("temp", "20"), ("humi", "last")])
+        self.assertEqual((inbox.received, inbox.overwritten, inbox.dropped), (1002, 1000, 0))
+        self.assertEqual(inbox.take(), [])
+
+    def test_bounded(self):
+        inbox = Inbox(max_topics=2)
+        for topic in ["a", "b", "a", "c"]:
+            inbox.put(Message(topic, topic))
+        self.assertEqual([m.topic for m in inbox.take()], ["a", "c"])  # "b" was least recently updated
+        self.assertEqual(inbox.dropped, 1)
+
+        with self.assertRaises(ValueError):
+            Inbox(max_topics=0)
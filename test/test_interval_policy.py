@@ -0,0 +1,95 @@
+import datetime
+import unittest
+
+from src.config_key import ConfigKey
+from src.interval_policy import IntervalPolicy, LinearIntervalPolicy, TrendIntervalPolicy
+from src.result import Result, ResultState
+
+
+class TestIntervalPolicy(unittest.TestCase):
+
+    TIME_MIN = 20
+    TIME_MAX = 200
+    DUST_LOWER = 10
+    DUST_UPPER = 80
+
+    def setUp(self):
+        self.now = datetime.datetime(2020, 1, 1, 12, 0, 0, tzinfo=datetime.timezone.utc)
+
+    def create(self, policy_type):
+        policy = IntervalPolicy.create({ConfigKey.INTERVAL_POLICY.value: policy_type})
+        policy.set_limits(self.TIME_MIN, self.TIME_MAX, self.DUST_LOWER, self.DUST_UPPER)
+        return policy
+
+    def add(self, policy, pm10, seconds=60, state=ResultState.OK):
+        self.now += datetime.timedelta(seconds=seconds)
+        result = Result(state, pm10=pm10, pm25=1, timestamp=self.now)
+        policy.add_result(result)
+        return result
+
+    def test_create(self):
+        self.assertIsInstance(IntervalPolicy.create({}), LinearIntervalPolicy)
+        self.assertIsInstance(self.create("Trend"), TrendIntervalPolicy)
+        with self.assertRaises(ValueError):
+            self.create("something")
+        with self.assertRaises(ValueError):
+            IntervalPolicy.create({ConfigKey.INTERVAL_POLICY.value: "trend",
+                                   ConfigKey.INTERVAL_EWMA_TIME.value: 0})
+
+    def test_linear_stale(self):
+        policy = self.create("linear")
+        result = self.add(policy, pm10=self.DUST_UPPER)
+        self.assertEqual(policy.interval(result, self.now), self.TIME_MIN)
+
+        now = self.now + datetime.timedelta(seconds=policy.time_stale + 1)
+        self.assertEqual(policy.interval(result, now), self.TIME_MAX)  # outdated
+
+    def test_trend_rising(self):
+        policy = self.create("trend")
+        for _ in range(5):
+            last = self.add(policy, pm10=5, seconds=self.TIME_MAX)
+        self.assertEqual(policy.interval(last, self.now), self.TIME_MAX)
+
+        # smoke: still below the linear dust limits, but rising fast
+        last = self.add(policy, pm10=20, seconds=self.TIME_MAX)
+        self.assertGreater(policy.slope, TrendIntervalPolicy.DEFAULT_RISE_THRESHOLD)
+        self.assertEqual(policy.interval(last, self.now), self.TIME_MIN)
+
+        linear = self.create("linear")
+        self.assertGreater(linear.interval(last, self.now), self.TIME_MAX / 2)
+
+    def test_trend_stable(self):
+        policy = self.create("trend")
+        last = self.add(policy, pm10=self.DUST_UPPER)
+        self.assertEqual(policy.interval(last, self.now), self.TIME_MIN)
+
+        intervals = []
+        for _ in range(10):
+            last = self.add(policy, pm10=self.DUST_UPPER, seconds=intervals[-1] if intervals else self.TIME_MIN)
+            intervals.append(policy.interval(last, self.now))
+
+        self.assertEqual(intervals, sorted(intervals))  # lengthened step by step
+        self.assertEqual(intervals[-1], self.TIME_MAX)
+
+    def test_trend_grows_per_result(self):
+        policy = self.create("trend")
+        for _ in range(3):
+            last = self.add(policy, pm10=self.DUST_UPPER, seconds=self.TIME_MIN)
+        interval = policy.interval(last, self.now)
+        self.assertGreater(interval, self.TIME_MIN)
+        self.assertEqual([policy.interval(last, self.now) for _ in range(3)], [interval] * 3)  # no growth per call
+
+    def test_trend_stale_and_errors(self):
+        policy = self.create("trend")
+        self.add(policy, pm10=50)
+        error = self.add(policy, pm10=None, state=ResultState.ERROR)
+        self.assertEqual(len(policy.history), 1)
+        self.assertLess(policy.interval(error, self.now), self.TIME_MAX)
+
+        now = self.now + datetime.timedelta(seconds=policy.time_stale + 1)
+        self.assertEqual(policy.interval(error, now), self.TIME_MAX)
+        self.assertEqual(policy.level, 50)  # a getter, reset with the next result
+
+        self.add(policy, pm10=5, seconds=policy.time_stale + 1)
+        self.assertEqual(policy.level, 5)
+        self.assertEqual(len(policy.history), 1)
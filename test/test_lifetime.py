@@ -0,0 +1,78 @@
+import datetime
+import json
+import os
+import tempfile
+import unittest
+
+from src.config_key import ConfigKey
+from src.lifetime import SensorLifetime
+
+
+class TestSensorLifetime(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "lifetime.json")
+        self.now = datetime.datetime(2020, 1, 1, 12, 0, 0, tzinfo=datetime.timezone.utc)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def create(self, target_years=None):
+        config = {ConfigKey.LIFETIME_FILE.value: self.path}
+        if target_years is not None:
+            config[ConfigKey.LIFETIME_TARGET.value] = target_years
+        lifetime = SensorLifetime()
+        lifetime.config(config)
+        lifetime.open(self.now)
+        return lifetime
+
+    def test_config(self):
+        with self.assertRaises(ValueError):
+            SensorLifetime().config({ConfigKey.LIFETIME_TARGET.value: 3})  # nowhere to persist
+        with self.assertRaises(ValueError):
+            self.create(target_years=0)
+        self.assertFalse(SensorLifetime().enabled)
+
+    def test_persisted(self):
+        lifetime = self.create()
+        lifetime.add_on_time(1800, self.now)
+        lifetime.add_on_time(1800, self.now + datetime.timedelta(seconds=1))  # not saved yet (SD card wear)
+        with open(self.path) as file:
+            self.assertEqual(json.load(file)["on_seconds"], 1800)
+        lifetime.close(self.now)
+
+        self.now += datetime.timedelta(days=1)
+        lifetime = self.create()
+        self.assertEqual(lifetime.on_hours, 1)
+        self.assertEqual(lifetime.first_use, self.now - datetime.timedelta(days=1))
+
+        with open(self.path, "w") as file:
+            file.write("{")
+        with self.assertRaises(ValueError):
+            self.create()
+
+    def test_end_of_life(self):
+        lifetime = self.create()
+        self.assertEqual(lifetime.end_of_life(self.now), None)
+
+        lifetime.add_on_time(6 * 3600, self.now)  # 6h per day => 8000h last 1333 days
+        now = self.now + datetime.timedelta(days=1)
+        self.assertEqual((lifetime.end_of_life(now) - now).days, 1332)
+
+    def test_governor(self):
+        lifetime = self.create(target_years=3)  # ~7.3 h per day
+        self.assertEqual(lifetime.stretch_interval(60, 40, self.now), 60)
+        self.assertTrue(lifetime.keep_warm(15, 15, self.now))
+        self.assertFalse(lifetime.keep_warm(16, 15, self.now))
+
+        lifetime.add_on_time(7 * 3600, self.now)  # within the budget
+        now = self.now + datetime.timedelta(days=1)
+        self.assertEqual(lifetime.stretch_interval(60, 40, now), 60)
+
+        lifetime.add_on_time(7 * 3600, now)  # ahead of the budget
+        self.assertGreater(lifetime.pressure(now), 1)
+        stretched = lifetime.stretch_interval(60, 40, now)
+        self.assertAlmostEqual(40 / stretched, lifetime.duty_budget(now))
+        self.assertLessEqual(stretched, 60 * SensorLifetime.MAX_INTERVAL_STRETCH)
+        self.assertFalse(lifetime.keep_warm(10, 15, now))  # waking up is cheaper now
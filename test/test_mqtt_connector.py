@@ -0,0 +1,141 @@
+import unittest
+from unittest import mock
+from unittest.mock import MagicMock
+
+import paho.mqtt.client as mqtt
+
+from src.config_key import ConfigKey
+from src.mqtt_connector import MqttConnector
+
+
+class TestMqttConnectorReconnect(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        self.connector = MqttConnector()
+        self.client = MagicMock()
+        self.connector._mqtt = self.client
+
+        patcher = mock.patch("src.mqtt_connector.time.monotonic", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def connection(self, duration, rc=7):
+        self.connector._on_connect(self.client, None, {"session present": 1}, 0)
+        self.assertTrue(self.connector.is_open())
+        self.now += duration
+        self.connector._on_disconnect(self.client, None, rc)
+
+    def last_min_delay(self):
+        min_delay, max_delay = self.client.reconnect_delay_set.call_args[0]
+        self.assertGreaterEqual(max_delay, min_delay)
+        return min_delay
+
+    def test_disconnect_keeps_running(self):
+        self.connection(60)
+        self.assertFalse(self.connector.is_open())
+        self.assertEqual(self.connector.get_messages(), [])  # no error raised, the process carries on
+
+        self.connection(60)
+        self.client.reconnect_delay_set.assert_not_called()  # would reset paho's exponential backoff
+
+    def test_jittered(self):
+        delays = {self.connector.reconnect_delay()[0] for _ in range(10)}
+        self.assertGreater(len(delays), 1)
+
+    def test_duplicate_client_id(self):
+        for _ in range(MqttConnector.DUPLICATE_CLIENT_COUNT - 1):
+            self.connection(1)
+        self.client.reconnect_delay_set.assert_not_called()
+
+        with self.assertLogs("src.mqtt_connector", level="ERROR") as logs:
+            self.connection(1)
+        self.assertIn("same client id", logs.output[0])
+        self.assertGreaterEqual(self.last_min_delay(), MqttConnector.DUPLICATE_CLIENT_DELAY / 2)
+
+        self.connection(1)
+        self.assertEqual(self.client.reconnect_delay_set.call_count, 1)  # set once
+
+        self.connection(MqttConnector.DUPLICATE_CLIENT_TIME + 1)  # the other client is gone
+        self.assertLess(self.last_min_delay(), MqttConnector.DUPLICATE_CLIENT_DELAY / 2)
+        self.assertEqual(self.client.reconnect_delay_set.call_count, 2)
+
+    def test_regular_disconnect(self):
+        self.connection(1, rc=0)
+        self.client.reconnect_delay_set.assert_not_called()
+
+    def test_resubscribe(self):
+        self.client.subscribe.return_value = (mqtt.MQTT_ERR_SUCCESS, 1)
+        self.connector.subscribe(["hold"])
+        self.client.subscribe.reset_mock()
+
+        self.connection(60)  # session stored by the broker
+        self.client.subscribe.assert_not_called()
+
+        self.connector._on_connect(self.client, None, {"session present": 0}, 0)
+        self.client.subscribe.assert_called_once_with([("hold", 1)])
+
+    def test_connect_refused(self):
+        self.connector._on_connect(self.client, None, {}, 3)  # server unavailable: paho retries
+        self.assertFalse(self.connector.is_open())
+        self.assertEqual(self.connector.get_messages(), [])
+
+        self.connector._on_connect(self.client, None, {}, 5)  # not authorised: no retry (in the main thread)
+        with self.assertRaises(RuntimeError):
+            self.connector.is_open()
+
+
+class TestMqttConnectorSession(unittest.TestCase):
+
+    def open(self, protocol, extra=None):
+        config = {
+            ConfigKey.MQTT_HOST.value: "localhost",
+            ConfigKey.MQTT_CLIENT_ID.value: "test",
+            ConfigKey.MQTT_PROTOCOL.value: protocol,
+            **{k.value: v for k, v in (extra or {}).items()},
+        }
+        with mock.patch("src.mqtt_connector.mqtt.Client") as client_class, \
+                mock.patch("src.mqtt_connector.MqttV5Client") as client_v5_class:
+            MqttConnector().open(config)
+        return client_v5_class if protocol == mqtt.MQTTv5 else client_class
+
+    def test_persistent_session(self):
+        client_class = self.open(mqtt.MQTTv311)
+        self.assertFalse(client_class.call_args[1]["clean_session"])
+
+        client_class = self.open(mqtt.MQTTv311, {ConfigKey.MQTT_CLEAN_SESSION: True})
+        self.assertTrue(client_class.call_args[1]["clean_session"])
+
+    def test_session_expiry(self):
+        client_class = self.open(mqtt.MQTTv5, {ConfigKey.MQTT_SESSION_EXPIRY: 3600})
+        connect_args = client_class.return_value.connect_async.call_args[1]
+        self.assertFalse(connect_args["clean_start"])
+        self.assertEqual(connect_args["properties"].SessionExpiryInterval, 3600)
+
+
+class TestMqttConnectorLastWill(unittest.TestCase):
+
+    def setUp(self):
+        self.connector = MqttConnector()
+        self.connector._last_will = "OFFLINE"
+        self.connector._qos = 1
+        self.connector._retain = False
+        self.connector._open = True
+        self.client = MagicMock()
+        self.client.publish.return_value = MagicMock(mid=1, rc=mqtt.MQTT_ERR_SUCCESS)
+        self.connector._mqtt = self.client
+        self.connector._flush_timeout = 0
+
+    def test_no_global_channel(self):
+        self.connector.close()  # sensors with own channels only
+        self.client.publish.assert_not_called()
+        self.client.loop_stop.assert_called_once()
+        self.client.disconnect.assert_called_once()
+
+    def test_once_per_channel(self):
+        self.connector._channel = "sensor1/state"
+        self.connector.publish_last_will("sensor1/state")  # by the process
+        self.connector.publish_last_will("sensor2/state")
+        self.connector.close()
+        self.assertEqual([c[1]["topic"] for c in self.client.publish.call_args_list],
+                         ["sensor1/state", "sensor2/state"])
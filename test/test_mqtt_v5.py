@@ -0,0 +1,231 @@
+import socket
+import struct
+import threading
+import time
+import unittest
+
+import paho.mqtt.client as mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+
+from src.config_key import ConfigKey
+from src.mqtt_connector import MqttConnector
+from src.mqtt_v5 import TopicAliases
+
+
+class BrokerStub:
+    """Local stand-in for a MQTT broker: accepts connections, acknowledges and records publishes."""
+
+    def __init__(self, topic_alias_maximum=10, refuse_v5=False, v311_only=False):
+        self.topic_alias_maximum = topic_alias_maximum
+        self.refuse_v5 = refuse_v5
+        self.v311_only = v311_only
+        self.connects = []  # (protocol level, CONNECT properties)
+        self.publishes = []  # (topic, payload, PUBLISH properties)
+
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.bind(("127.0.0.1", 0))
+        self._server.listen(5)
+        self._server.settimeout(0.1)
+        self.port = self._server.getsockname()[1]
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._running = False
+        self._thread.join()
+        self._server.close()
+
+    def _serve(self):
+        while self._running:
+            try:
+                connection, _ = self._server.accept()
+            except socket.timeout:
+                continue
+            with connection:
+                connection.settimeout(0.1)
+                self._handle(connection)
+
+    def _read(self, connection, size):
+        data = b""
+        while len(data) < size and self._running:
+            try:
+                chunk = connection.recv(size - len(data))
+            except socket.timeout:
+                continue
+            if not chunk:
+                raise ConnectionError()
+            data += chunk
+        if len(data) < size:
+            raise ConnectionError()
+        return data
+
+    def _read_packet(self, connection):
+        header = self._read(connection, 1)[0]
+        length, multiplier = 0, 1
+        while True:
+            byte = self._read(connection, 1)[0]
+            length += (byte & 0x7f) * multiplier
+            multiplier *= 128
+            if not byte & 0x80:
+                break
+        return header, self._read(connection, length)
+
+    def _handle(self, connection):
+        level = None
+        try:
+            while self._running:
+                header, body = self._read_packet(connection)
+                packet_type = header >> 4
+                if packet_type == 1:  # CONNECT
+                    level = body[6]
+                    properties = None
+                    if level == 5:
+                        properties = Properties(PacketTypes.CONNECT)
+                        properties.unpack(body[10:])
+                    self.connects.append((level, properties))
+                    if level == 5 and self.refuse_v5:
+                        connection.sendall(bytes([0x20, 3, 0, 132, 0]))  # unsupported protocol version
+                        return
+                    if level == 5 and self.v311_only:
+                        connection.sendall(bytes([0x20, 2, 0, 1]))  # MQTTv3: unacceptable protocol version
+                        return
+                    if level == 5:
+                        connack = bytes([0, 0, 3, 0x22]) + struct.pack("!H", self.topic_alias_maximum)
+                    else:
+                        connack = bytes([0, 0])
+                    connection.sendall(bytes([0x20, len(connack)]) + connack)
+                elif packet_type == 3:  # PUBLISH
+                    qos = (header >> 1) & 3
+                    topic_length = struct.unpack("!H", body[:2])[0]
+                    topic = body[2:2 + topic_length].decode()
+                    position = 2 + topic_length
+                    mid = None
+                    if qos:
+                        mid = body[position:position + 2]
+                        position += 2
+                    properties = None
+                    if level == 5:
+                        properties = Properties(PacketTypes.PUBLISH)
+                        _, size = properties.unpack(body[position:])
+                        position += size
+                    self.publishes.append((topic, body[position:], properties))
+                    if qos == 1:
+                        connection.sendall(bytes([0x40, 2]) + mid)
+                elif packet_type == 12:  # PINGREQ
+                    connection.sendall(bytes([0xd0, 0]))
+                elif packet_type == 14:  # DISCONNECT
+                    return
+        except (ConnectionError, OSError):
+            pass
+
+
+class TestMqttConnectorV5(unittest.TestCase):
+
+    def open(self, broker, extra=None):
+        config = {
+            ConfigKey.MQTT_HOST.value: "127.0.0.1",
+            ConfigKey.MQTT_PORT.value: broker.port,
+            ConfigKey.MQTT_CLIENT_ID.value: "test",
+            ConfigKey.MQTT_CHANNEL_OUT_STATE.value: "test/state",
+            ConfigKey.MQTT_PROTOCOL.value: mqtt.MQTTv5,
+            ConfigKey.MQTT_QUALITY.value: 0,
+            ConfigKey.MQTT_SESSION_EXPIRY.value: 3600,
+        }
+        config.update({k.value: v for k, v in (extra or {}).items()})
+        connector = MqttConnector()
+        connector.open(config)
+        self.addCleanup(connector.close)
+        self.wait_for(connector.is_open)
+        return connector
+
+    def wait_for(self, condition, timeout=10):
+        time_end = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > time_end:
+                self.fail("timeout")
+            time.sleep(0.02)
+
+    def create_broker(self, **kwargs):
+        broker = BrokerStub(**kwargs)
+        self.addCleanup(broker.close)
+        return broker
+
+    def test_properties(self):
+        broker = self.create_broker()
+        extra = {ConfigKey.MQTT_MESSAGE_EXPIRY: 600, ConfigKey.MQTT_USER_PROPERTIES: {"node": "n1"}}
+        connector = self.open(broker, extra)
+        self.assertEqual(broker.connects[0][0], 5)
+        self.assertEqual(broker.connects[0][1].SessionExpiryInterval, 3600)
+
+        connector.publish("result 1", store=True)
+        connector.publish("result 2", store=True)
+        connector.publish("ON", "test/actor")  # no result: doesn't expire
+        self.wait_for(lambda: len(broker.publishes) == 3)
+
+        (topic1, payload1, properties1), (topic2, payload2, properties2), (topic3, _, properties3) = broker.publishes
+        self.assertEqual((topic1, payload1, properties1.TopicAlias), ("test/state", b"result 1", 1))
+        self.assertEqual((topic2, payload2, properties2.TopicAlias), ("", b"result 2", 1))  # alias only
+        self.assertEqual((topic3, properties3.TopicAlias), ("test/actor", 2))
+        self.assertEqual(properties1.MessageExpiryInterval, 600)
+        self.assertFalse(hasattr(properties3, "MessageExpiryInterval"))
+        self.assertEqual(properties3.UserProperty, [("node", "n1")])
+
+    def test_no_alias_without_broker_support(self):
+        broker = self.create_broker(topic_alias_maximum=0)
+        connector = self.open(broker)
+        connector.publish("result 1")
+        connector.publish("result 2")
+        self.wait_for(lambda: len(broker.publishes) == 2)
+        self.assertEqual([topic for topic, _, _ in broker.publishes], ["test/state", "test/state"])
+
+    def test_fallback_to_v311(self):
+        broker = self.create_broker(refuse_v5=True)
+        connector = self.open(broker, {ConfigKey.MQTT_MESSAGE_EXPIRY: 600})
+        self.assertEqual([level for level, _ in broker.connects], [5, 4])
+
+        connector.publish("result", store=True)
+        self.wait_for(lambda: len(broker.publishes) == 1)
+        self.assertEqual(broker.publishes[0][:2], ("test/state", b"result"))
+
+    def test_fallback_v311_only_broker(self):
+        broker = self.create_broker(v311_only=True)
+        connector = self.open(broker)
+        self.assertEqual([level for level, _ in broker.connects], [5, 4])
+
+        connector.publish("result")
+        self.wait_for(lambda: len(broker.publishes) == 1)
+
+    def test_no_fallback_unreachable(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(("127.0.0.1", 0))
+        port = server.getsockname()[1]
+        server.close()  # nobody listens
+
+        connector = MqttConnector()
+        connector.open({
+            ConfigKey.MQTT_HOST.value: "127.0.0.1",
+            ConfigKey.MQTT_PORT.value: port,
+            ConfigKey.MQTT_CLIENT_ID.value: "test",
+            ConfigKey.MQTT_PROTOCOL.value: mqtt.MQTTv5,
+        })
+        self.addCleanup(connector.close)
+        time_end = time.monotonic() + 1.5
+        while time.monotonic() < time_end:
+            self.assertFalse(connector.is_open())
+            time.sleep(0.05)
+        self.assertEqual(connector._protocol, mqtt.MQTTv5)
+
+
+class TestTopicAliases(unittest.TestCase):
+
+    def test_resolve(self):
+        aliases = TopicAliases()
+        self.assertEqual(aliases.resolve("a"), ("a", None))  # not connected
+        aliases.reset(1)
+        self.assertEqual(aliases.resolve("a"), ("a", 1))
+        self.assertEqual(aliases.resolve("a"), ("", 1))
+        self.assertEqual(aliases.resolve("b"), ("b", None))  # broker maximum reached
+        aliases.reset(1)  # reconnected
+        self.assertEqual(aliases.resolve("a"), ("a", 1))
@@ -0,0 +1,139 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+import paho.mqtt.client as mqtt
+
+from src.mqtt_connector import MqttConnector
+from src.outbox import Outbox
+
+
+class TestOutbox(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "outbox.db")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_persisted(self):
+        outbox = Outbox(self.path)
+        first = outbox.add("a", "1", 1, False)
+        outbox.add("b", b"2", 0, True)
+        outbox.confirm(first)
+        outbox.close()
+
+        outbox = Outbox(self.path)
+        self.assertEqual(len(outbox), 1)
+        row_id, topic, payload, qos, retain = outbox.pending()[0]
+        self.assertEqual((topic, payload, qos, retain), ("b", b"2", 0, True))
+        self.assertEqual(outbox.pending(after_id=row_id), [])
+        outbox.close()
+
+    def test_bounded(self):
+        outbox = Outbox(self.path, max_messages=3)
+        for i in range(5):
+            outbox.add("a", str(i), 1, False)
+        self.assertEqual([p for _, _, p, _, _ in outbox.pending()], [b"2", b"3", b"4"])  # oldest dropped
+        self.assertEqual(len(outbox.pending(limit=2)), 2)
+        outbox.close()
+
+
+class TestMqttConnectorOutbox(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.mid = 0
+        self.published = []  # (mid, payload)
+
+        self.connector = MqttConnector()
+        self.connector._qos = 1
+        self.connector._retain = False
+        self.connector._channel = "state"
+        self.connector._outbox = Outbox(os.path.join(self.dir.name, "outbox.db"))
+        self.connector._mqtt = MagicMock()
+        self.connector._mqtt.publish.side_effect = self.publish
+
+    def tearDown(self):
+        self.connector._outbox.close()
+        self.dir.cleanup()
+
+    def publish(self, topic, payload, qos, retain, properties=None):
+        self.mid += 1
+        self.published.append((self.mid, payload))
+        return MagicMock(mid=self.mid, rc=mqtt.MQTT_ERR_SUCCESS)
+
+    def ack_all(self):
+        for mid, _ in self.published:
+            self.connector._on_publish(None, None, mid)
+        self.published.clear()
+
+    def test_confirmed(self):
+        self.connector._open = True
+        self.connector.publish("result", store=True)
+        self.assertEqual(len(self.published), 1)
+        self.assertEqual(len(self.connector._outbox), 1)
+
+        self.ack_all()
+        self.assertEqual(len(self.connector._outbox), 0)
+        self.assertEqual(len(self.connector._tracker), 0)
+
+    def test_outage_replayed_in_batches(self):
+        self.connector._open = False
+        count = 2 * MqttConnector.DEFAULT_MAX_INFLIGHT + 5
+        for i in range(count):
+            self.connector.publish(f"result {i}", store=True)
+        self.assertEqual(self.published, [])
+        self.assertEqual(len(self.connector._outbox), count)
+
+        notified = MagicMock()
+        self.connector.set_notify_callback(notified)
+        self.connector._open = True  # reconnected
+        replayed = []
+        while len(replayed) < count:
+            self.connector.get_messages()
+            self.assertLessEqual(len(self.published), MqttConnector.DEFAULT_MAX_INFLIGHT)
+            replayed.extend(payload for _, payload in self.published)
+            self.ack_all()
+
+        self.assertEqual(replayed, [f"result {i}".encode() for i in range(count)])  # in order
+        self.assertEqual(len(self.connector._outbox), 0)
+        self.assertEqual(notified.call_count, 2)  # woken up for the next batch
+
+    def test_qos0_lost_on_disconnect(self):
+        self.connector._qos = 0
+        self.connector._open = True
+        for i in range(3):
+            self.connector.publish(f"result {i}", store=True)
+        self.assertEqual(len(self.connector._tracker), 3)
+        self.published.clear()  # dropped by paho with the connection, never acknowledged
+
+        self.connector._on_disconnect(MagicMock(), None, 1)
+        self.assertEqual(self.connector._tracker.free, MqttConnector.DEFAULT_MAX_INFLIGHT)
+
+        self.connector._open = True  # reconnected
+        self.connector.get_messages()
+        self.assertEqual([p for _, p in self.published], [f"result {i}".encode() for i in range(3)])
+        self.ack_all()
+        self.assertEqual(len(self.connector._outbox), 0)
+
+    def test_qos1_not_resent_on_disconnect(self):
+        self.connector._open = True
+        self.connector._outbox.add("state", "qos 0", 0, False)
+        self.connector.publish("qos 1", store=True)
+        self.connector.get_messages()
+        self.assertEqual([p for _, p in self.published], [b"qos 0", b"qos 1"])
+        self.published.clear()
+
+        self.connector._on_disconnect(MagicMock(), None, 1)
+        self.connector._open = True
+        self.connector.get_messages()
+        self.assertEqual([p for _, p in self.published], [b"qos 0"])  # qos 1: queued and resent by paho
+
+    def test_not_stored(self):
+        self.connector._open = False
+        self.connector.publish("ON", "actor", retain=True)  # queued by paho
+        self.assertEqual(len(self.published), 1)
+        self.assertEqual(len(self.connector._outbox), 0)
@@ -1,20 +1,33 @@
 import datetime
+import json
+import os
 import random
+import signal
+import tempfile
+import threading
+import time
 import unittest
 
 from tzlocal import get_localzone
 
+from src.config_key import ConfigKey
+from src.deactivation_schedule import DeactivationSchedule
+from src.encoder import create_encoder
 from src.mqtt_connector import MqttConnector
-from src.process import Process, SwitchSensor, LoopParams
+from src.process import Process, SwitchSensor, LoopParams, SensorState
 
 from unittest.mock import MagicMock
 
-from src.result import ResultState, Result
-from src.sensor import MockSensor
+from src.result import ResultState, Result, ResultKey
+from src.sds011 import SDS011
+from src.sensor import MockSensor, MeasureMode, Sensor
+from src.serial_worker import SerialWorker
 
 
 class MockProcess(Process):
 
+    TIME_STEP = 40
+
     def __init__(self):
         super().__init__()
 
@@ -25,6 +38,7 @@ class MockProcess(Process):
         self.time_stop_counter = 0
 
         self.mqtt_messages = []
+        self.wait_count = 0
 
         self.now = datetime.datetime(2020, 1, 1, 2, 2, 3, tzinfo=datetime.timezone.utc)
 
@@ -42,18 +56,18 @@ class MockProcess(Process):
         self._sensor.close = MagicMock()
 
     def set_loop_count(self, loop_count=1):
-        self._time_step = 40
-        self._time_interval_max = 4 * self._time_step
-        self._time_warm_up = 2 * self._time_step
+        self._time_interval_max = 4 * self.TIME_STEP
+        self._time_warm_up = 2 * self.TIME_STEP
         self._time_cool_down = 0
-        self.time_stop_at = loop_count * self._time_interval_max + self._time_step
+        self.time_stop_at = loop_count * self._time_interval_max
 
     def create_dummy_loop_params(self):
         lp = LoopParams()
         lp.tlim_interval = self._time_interval_max
         lp.tlim_switching_on = self._time_switching_on if lp.use_switch_actor else 0
         lp.tlim_warming_up = self._time_warm_up + lp.tlim_switching_on
-        lp.tlim_cool_down = lp.tlim_warming_up + self._time_cool_down
+        lp.tlim_measuring = lp.tlim_warming_up
+        lp.tlim_cool_down = lp.tlim_measuring + self._time_cool_down
 
         return lp
 
@@ -65,18 +79,23 @@ class MockProcess(Process):
         self._mqtt.is_open = MagicMock(return_value=True)
         self._mqtt.close = MagicMock()
 
-        def publish(message: str, channel: str = None, retain: bool = None):
+        def publish(message: str, channel: str = None, retain: bool = None, store: bool = False):
             self.mqtt_messages.append(message)
 
         self._mqtt.publish = publish
 
-    def _wait(self, seconds: float):
+    def _wait(self, seconds: float, fds=None):
         # no sleep
+        self.wait_count += 1
         self._time_counter += seconds
         self.time_stop_counter += seconds
         if self.time_stop_counter >= self.time_stop_at:
             self._shutdown = True
 
+    def _wait_for_mqtt_connection(self):
+        super()._wait_for_mqtt_connection()
+        self.time_stop_counter = 0  # count only the measurement loops
+
     def _now(self):
         return self.now
 
@@ -97,6 +116,7 @@ class TestProcessLoopStandard(unittest.TestCase):
 
         result = MockSensor.dummy_measure()
         result.timestamp = process._now()
+        result.warm_up = process._time_warm_up
         message = result.create_message()
 
         for m in process.mqtt_messages:
@@ -108,6 +128,214 @@ class TestProcessLoopStandard(unittest.TestCase):
     def test_loop_n(self):
         self.check_loop_running(loop_count=3)
 
+    def test_close_unregisters_notify_callback(self):
+        process = MockProcess()
+        process.test_open()
+        process.test_mqtt.set_notify_callback(process._scheduler.wake_up)
+
+        process.close()
+        self.assertEqual(process.test_mqtt._notify_callback, None)
+
+    def test_loop_wakes_up_at_transitions_only(self):
+        loop_count = 3
+
+        process = MockProcess()
+        process.test_open(loop_count=loop_count)
+        process.run()
+
+        # per loop: wait for warm up + wait for interval end; + 1 for retained messages
+        self.assertEqual(process.wait_count, 2 * loop_count + 1)
+
+    def test_loop_streaming(self):
+        loop_count = 2
+
+        process = MockProcess()
+        process.test_open(loop_count=loop_count)
+        process._time_measuring = MockProcess.TIME_STEP
+        process.test_sensor._measure_mode = MeasureMode.STREAM
+        process.test_sensor.start_measuring = MagicMock()
+
+        process.run()
+
+        self.assertEqual(process.test_sensor.start_measuring.call_count, loop_count)
+        self.assertEqual(process.test_sensor.measure.call_count, loop_count)
+        # per loop: wait for warm up + measuring window + interval end; + 1 for retained messages
+        self.assertEqual(process.wait_count, 3 * loop_count + 1)
+
+    def test_loop_streaming_warm_up_converged(self):
+        loop_count = 2
+
+        process = MockProcess()
+        process.test_open(loop_count=loop_count)
+        process._time_measuring = MockProcess.TIME_STEP
+        process._time_warm_up_min = 10
+        process._warm_up_tolerance = 0.1
+        process.test_sensor._measure_mode = MeasureMode.STREAM
+        process.test_sensor.start_measuring = MagicMock()
+        process.test_sensor.warm_up_settled = MagicMock(side_effect=[False, False, True] * loop_count)
+
+        process.run()
+
+        self.assertEqual(process.test_sensor.warm_up_settled.call_count, 3 * loop_count)
+        self.assertEqual(process.test_sensor.measure.call_count, loop_count)
+        for message in process.mqtt_messages:
+            self.assertEqual(json.loads(message)[ResultKey.WARM_UP.value], 10 + 2 * Process.TIME_WARM_UP_CHECK)
+
+    def test_warm_up_fixed_without_streaming(self):
+        process = MockProcess()
+        process.test_open()
+        process._warm_up_tolerance = 0.1
+
+        lp = process._determine_loop_params()
+        self.assertFalse(lp.warm_up_check)
+        self.assertEqual(Process._next_time_limit(SensorState.WARMING_UP, lp), process._time_warm_up)
+
+    def test_loop_lifetime(self):
+        loop_count = 3
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            process = MockProcess()
+            process.test_open(loop_count=loop_count)
+            process._lifetime.config({ConfigKey.LIFETIME_FILE.value: os.path.join(temp_dir, "lifetime.json")})
+            process._lifetime.open(process.now)
+
+            process.run()
+
+            # the sensor runs during the warm up only (sent to sleep afterwards)
+            on_hours = [json.loads(m)[ResultKey.ON_HOURS.value] for m in process.mqtt_messages]
+            self.assertEqual(on_hours, [round(i * process._time_warm_up / 3600, 2) for i in range(1, loop_count + 1)])
+            self.assertEqual(process._lifetime.on_hours, loop_count * process._time_warm_up / 3600)
+            self.assertIsNotNone(json.loads(process.mqtt_messages[-1])[ResultKey.END_OF_LIFE.value])
+
+    def test_loop_deadband(self):
+        process = MockProcess()
+        process.test_open(loop_count=3)
+        process._deadband.config({ConfigKey.DEADBAND.value: {"PM25": {"absolute": 5}, "PM10": {"absolute": 5}}})
+
+        process.run()
+
+        self.assertEqual(process.test_sensor.measure.call_count, 3)
+        self.assertEqual(len(process.mqtt_messages), 1)  # unchanged values within the heartbeat interval
+        self.assertEqual(json.loads(process.mqtt_messages[0])[ResultKey.SUPPRESSED.value], 0)
+
+    def test_loop_several_encoders(self):
+        process = MockProcess()
+        process.test_open()
+        process._result_topics.append(("state/compact", create_encoder("compact")))
+        topics = []
+        process._mqtt.publish = lambda message, channel=None, retain=None, store=False: topics.append(channel)
+
+        process.run()
+
+        self.assertEqual(topics, [process._mqtt_out_state, "state/compact"])
+
+    def test_loop_burst(self):
+        loop_count = 2
+
+        process = MockProcess()
+        process.test_open(loop_count=loop_count)
+        process._count_measurements = 3
+        process._time_between_measurements = 5
+        process.test_sensor.start_measuring = MagicMock()
+        process.test_sensor.sample = MagicMock()
+
+        process.run()
+
+        self.assertEqual(process.test_sensor.sample.call_count, 3 * loop_count)
+        self.assertEqual(process.test_sensor.measure.call_count, loop_count)
+        # per loop: wait for warm up + 2 * next sample + interval end; + 1 for retained messages
+        self.assertEqual(process.wait_count, 4 * loop_count + 1)
+
+    def test_burst_samples_float_deadlines(self):
+        process = MockProcess()
+        process.test_open()
+        process._time_warm_up = 25
+        process._count_measurements = 4
+        process._time_between_measurements = 0.1
+        process.test_sensor.sample = MagicMock()
+
+        lp = process._determine_loop_params()
+        self.assertEqual(lp.tlim_measuring, 25 + 3 * 0.1)
+
+        process._time_counter = lp.tlim_warming_up
+        process._take_burst_samples(lp)
+        self.assertEqual(process.test_sensor.sample.call_count, 1)
+        self.assertEqual(Process._next_time_limit(SensorState.MEASURING, lp), 25 + 0.1)
+
+        # end of measuring window: all remaining samples are taken before measuring
+        process._time_counter = lp.tlim_measuring
+        process._take_burst_samples(lp)
+        self.assertEqual(process.test_sensor.sample.call_count, 4)
+        self.assertEqual(Process._next_time_limit(SensorState.MEASURING, lp), lp.tlim_measuring)
+
+    def test_next_time_limit_measuring(self):
+        process = MockProcess()
+        process.test_open()
+
+        lp = process.create_dummy_loop_params()
+        lp.tlim_measuring = lp.tlim_warming_up + 10
+        self.assertEqual(Process._next_time_limit(SensorState.WARMING_UP, lp), lp.tlim_warming_up)
+        self.assertEqual(Process._next_time_limit(SensorState.MEASURING, lp), lp.tlim_measuring)
+        self.assertEqual(Process._next_time_limit(SensorState.WAITING_FOR_RESET, lp), lp.tlim_interval)
+
+    def test_work_period(self):
+        process = MockProcess()
+        process.test_open()
+        process.test_sensor._measure_mode = MeasureMode.WORK_PERIOD
+        process.test_sensor._work_period = 1
+        process.time_stop_at = 3 * 60 - 1
+        process.test_sensor.start_work_period = MagicMock()
+        results = [[], [MockSensor.dummy_measure()], [], [MockSensor.dummy_measure()], [], []]
+        process.test_sensor.read_reports = MagicMock(side_effect=lambda: results.pop(0))
+
+        # frames are pushed after 50s each => no timeout
+        process._wait = MagicMock(side_effect=lambda seconds, fds=None: self.wait_for_frame(process, seconds, 50))
+        process.run()
+
+        process.test_sensor.start_work_period.assert_called_once()
+        process.test_sensor.measure.assert_not_called()
+        self.assertEqual(len(process.mqtt_messages), 2)
+
+    @classmethod
+    def wait_for_frame(cls, process, seconds, frame_after):
+        seconds = min(seconds, frame_after)
+        process._time_counter += seconds
+        process.time_stop_counter += seconds
+        if process.time_stop_counter >= process.time_stop_at:
+            process._shutdown = True
+
+    def test_work_period_missing_frame(self):
+        process = MockProcess()
+        process.test_open()
+        process.test_sensor._measure_mode = MeasureMode.WORK_PERIOD
+        process.test_sensor._work_period = 1
+        process.time_stop_at = 2 * (60 + process.WORK_PERIOD_FRAME_MARGIN)
+        process.test_sensor.start_work_period = MagicMock()
+        process.test_sensor.read_reports = MagicMock(return_value=[])
+
+        process.run()
+
+        self.assertEqual(process.test_sensor.start_work_period.call_count, 2)  # programmed again after timeout
+        self.assertEqual(len(process.mqtt_messages), 1)
+        self.assertIn('"STATE": "ERROR"', process.mqtt_messages[0])
+
+    def test_work_period_on_hold(self):
+        process = MockProcess()
+        process.test_open(loop_count=3)
+        process.test_sensor._measure_mode = MeasureMode.WORK_PERIOD
+        process.test_sensor.start_work_period = MagicMock()
+
+        loop_params = process.create_dummy_loop_params()
+        loop_params.on_hold = True
+        process._determine_loop_params = MagicMock(return_value=loop_params)
+
+        process.run()
+
+        process.test_sensor.start_work_period.assert_not_called()
+        process.test_sensor.close.assert_any_call(sleep=True)
+        message = Result(ResultState.DEACTIVATED, timestamp=process._now()).create_message()
+        self.assertEqual(process.mqtt_messages, [message])  # published once, when the hold state changes
+
     def test_loop_sensor_on_hold(self):
         loop_count = 3
 
@@ -156,6 +384,194 @@ class TestProcessLoopStandard(unittest.TestCase):
             self.assertTrue(m in [message, SwitchSensor.OFF.value])
 
 
+class MockMessage:
+
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+
+class TestProcessHoldEvents(unittest.TestCase):
+
+    def create_process(self, hold_value):
+        process = MockProcess()
+        process.test_open()
+        process._mqtt_in_hold.config("hold")
+        process._mqtt_in_hold.value = hold_value
+        process.start()
+        return process
+
+    def test_resume_at_once(self):
+        process = self.create_process("HOLD")
+        timeout, _ = process.step()
+        self.assertEqual(process._state, SensorState.WAITING_FOR_RESET)
+        self.assertEqual(timeout, process._time_interval_max)
+
+        process._time_counter += 5  # woken up by the message
+        process.dispatch_mqtt_messages([MockMessage("hold", b"OFF")])
+        timeout, _ = process.step()
+
+        self.assertEqual(process._state, SensorState.WARMING_UP)
+        self.assertEqual(timeout, process._time_warm_up)
+        process.test_sensor.open.assert_called_with(warm_up=True)
+
+    def test_hold_interrupts_warm_up(self):
+        process = self.create_process("OFF")
+        process.step()
+        self.assertEqual(process._state, SensorState.WARMING_UP)
+
+        process._time_counter += 5
+        process.dispatch_mqtt_messages([MockMessage("hold", b"HOLD")])
+        timeout, _ = process.step()
+
+        self.assertEqual(process._state, SensorState.WAITING_FOR_RESET)
+        self.assertEqual(process.test_sensor.close.call_count, 1)  # sent to sleep
+        self.assertEqual(process.test_sensor.measure.call_count, 0)
+        self.assertIn("DEACTIVATED", process.mqtt_messages[-1])
+
+    def test_unchanged(self):
+        process = self.create_process("OFF")
+        process.step()
+
+        process._time_counter += 5
+        process.dispatch_mqtt_messages([MockMessage("hold", b"OFF")])
+        timeout, _ = process.step()
+
+        self.assertEqual(process._state, SensorState.WARMING_UP)
+        self.assertEqual(timeout, process._time_warm_up - 5)
+
+
+class TestProcessTrigger(unittest.TestCase):
+
+    def create_process(self):
+        process = MockProcess()
+        process.test_open()
+        process._time_cool_down = 10
+        process._mqtt_in_trigger.config("trigger")
+        process.start()
+        return process
+
+    def trigger(self, process, seconds_later, retain=False):
+        process._time_counter += seconds_later
+        message = MockMessage("trigger", b"")
+        message.retain = retain
+        process.dispatch_mqtt_messages([message])
+        return process.step()
+
+    def test_merged_into_running_measurement(self):
+        process = self.create_process()
+        process.step()
+        self.assertEqual(process._state, SensorState.WARMING_UP)
+
+        timeout, _ = self.trigger(process, 5)
+        self.trigger(process, 1)
+        self.assertEqual(process._state, SensorState.WARMING_UP)
+        self.assertEqual(timeout, process._time_warm_up - 5)
+        self.assertEqual(process.test_sensor.open.call_count, 1)
+
+    def test_warm_sensor(self):
+        process = self.create_process()
+        process.step()
+        process._time_counter = process._time_warm_up
+        process.step()
+        self.assertEqual(process._state, SensorState.COOLING_DOWN)
+        self.assertEqual(process.test_sensor.measure.call_count, 1)
+
+        self.trigger(process, 1)  # measured at once, no warm up
+        self.assertEqual(process._state, SensorState.COOLING_DOWN)
+        self.assertEqual(process.test_sensor.measure.call_count, 2)
+        self.assertEqual(json.loads(process.mqtt_messages[-1])[ResultKey.WARM_UP.value], 0)
+
+    def test_sleeping_sensor(self):
+        process = self.create_process()
+        process.step()
+        process._time_counter = process._time_warm_up + process._time_cool_down
+        process.step()
+        self.assertEqual(process._state, SensorState.WAITING_FOR_RESET)
+
+        self.trigger(process, 1, retain=True)  # ignored
+        self.assertEqual(process._state, SensorState.WAITING_FOR_RESET)
+
+        timeout, _ = self.trigger(process, 1)  # new cycle at once
+        self.assertEqual(process._state, SensorState.WARMING_UP)
+        self.assertEqual(timeout, process._time_warm_up)
+
+    def test_retained_shared_topic(self):
+        process = MockProcess()
+        process.test_open()
+        process._mqtt_in_trigger.config("control")
+        process._mqtt_in_hold.config("control")
+        process.start()
+
+        message = MockMessage("control", b"HOLD")
+        message.retain = True
+        process.dispatch_mqtt_messages([message])
+
+        self.assertEqual(process._mqtt_in_hold.value, "HOLD")  # only the trigger skips retained messages
+        self.assertEqual(process._mqtt_in_trigger.requests, 0)
+
+
+class HangingSerial:
+    """serial port, which doesn't deliver any byte until `cancel_read`"""
+
+    in_waiting = 0
+
+    def __init__(self):
+        self.read_started = threading.Event()
+        self._cancelled = threading.Event()
+
+    def read(self, size=1):
+        self.read_started.set()
+        self._cancelled.wait(5)
+        return b""
+
+    def cancel_read(self):
+        self._cancelled.set()
+
+    def write(self, data):
+        pass
+
+    def close(self):
+        pass
+
+
+class TestProcessSerialWorker(unittest.TestCase):
+
+    def test_shutdown_while_read_hangs(self):
+        process = Process()
+        process._mqtt = MagicMock()
+        process._mqtt.get_messages = MagicMock(return_value=[])
+        process._wait_for_mqtt_connection = MagicMock()
+
+        serial = HangingSerial()
+        sds011 = SDS011("/dev/null")
+        sds011._serial = serial
+        sensor = Sensor({})
+        sensor._sensor = sds011
+        process._sensor = sensor
+        process._worker = SerialWorker("test", process._scheduler.wake_up)
+
+        thread = threading.Thread(target=process.run)
+        thread.start()
+        self.assertTrue(serial.read_started.wait(2))  # wake up command hangs
+
+        # the main loop still handles MQTT messages
+        count = process._mqtt.get_messages.call_count
+        process._scheduler.wake_up()
+        time.sleep(0.05)
+        self.assertGreater(process._mqtt.get_messages.call_count, count)
+
+        time_start = time.monotonic()
+        process._shutdown_gracefully(signal.SIGTERM, None)
+        thread.join(2)
+        latency = time.monotonic() - time_start
+
+        self.assertFalse(thread.is_alive())
+        self.assertLess(latency, 0.1)
+        self.assertEqual(process._sensor, None)
+        self.assertEqual(process._worker, None)
+
+
 class TestProcessCalcIntervalTime(unittest.TestCase):
 
     def test_no_measurement(self):
@@ -212,16 +628,27 @@ class TestProcessCalcIntervalTime(unittest.TestCase):
 
         self.assertAlmostEqual(compare, (time_max + time_min) / 2)
 
+    def test_stale(self):
+        process = MockProcess()
+        process._time_interval_max = 300
+        process._time_interval_min = 100
+
+        timestamp = process.now - datetime.timedelta(seconds=1000)
+        process._last_result = Result(ResultState.OK, pm10=process.DEFAULT_ADAPTIVE_DUST_UPPER + 1, pm25=1,
+                                      timestamp=timestamp)
+
+        self.assertEqual(process._calc_interval_time(), 300)
+
 
 class TestProcessDeactivationRanges(unittest.TestCase):
 
     def test_inactive(self):
         process = MockProcess()
         process.now = datetime.datetime(2020, 1, 1, 2, 2, 3, tzinfo=get_localzone())
-        process._deactivation_ranges = None
 
-        compare = process._active_deactivation_ranges()
-        self.assertEqual(compare, False)
+        deactivated, time_transition = process._deactivation_state()
+        self.assertEqual(deactivated, False)
+        self.assertEqual(time_transition, None)
 
     def test_active(self):
         process = MockProcess()
@@ -229,17 +656,34 @@ class TestProcessDeactivationRanges(unittest.TestCase):
 
         minute_of_day = process.now.minute + 60 * process.now.hour
 
-        process._deactivation_ranges = ((minute_of_day - 3, minute_of_day + 5), (2 * minute_of_day, 3 * minute_of_day))
-        compare = process._active_deactivation_ranges()
-        self.assertEqual(compare, True)
+        process._deactivation = DeactivationSchedule.compile(
+            ranges=((minute_of_day - 3, minute_of_day + 5), (2 * minute_of_day, 3 * minute_of_day)))
+        deactivated, time_transition = process._deactivation_state()
+        self.assertEqual(deactivated, True)
+        self.assertEqual(time_transition, 6 * 60)  # upper minute included
 
-        process._deactivation_ranges = ((2 * minute_of_day, 3 * minute_of_day),)
-        compare = process._active_deactivation_ranges()
-        self.assertEqual(compare, False)
+        process._deactivation = DeactivationSchedule.compile(ranges=((2 * minute_of_day, 3 * minute_of_day),))
+        deactivated, time_transition = process._deactivation_state()
+        self.assertEqual(deactivated, False)
+        self.assertEqual(time_transition, minute_of_day * 60)
 
     def test_error(self):
+        with self.assertRaises(ValueError):
+            DeactivationSchedule.compile(ranges=(("h")))
+
+    def test_loop_params_at_boundary(self):
         process = MockProcess()
-        process._deactivation_ranges = (("h"))
+        process.test_open()
+        process.now = datetime.datetime(2020, 1, 1, 2, 59, 0, tzinfo=get_localzone())
+        process._deactivation = DeactivationSchedule.compile(rules=[{"from": "03:00", "to": "05:00"}])
+
+        # the next cycle starts at the boundary
+        lp = process._determine_loop_params()
+        self.assertEqual(lp.on_hold, False)
+        self.assertEqual(lp.tlim_interval, max(60, lp.tlim_interval_min))
 
-        compare = process._active_deactivation_ranges()
-        self.assertEqual(compare, False)
+        # deactivated: no wake up before the end
+        process.now = datetime.datetime(2020, 1, 1, 3, 0, 0, tzinfo=get_localzone())
+        lp = process._determine_loop_params()
+        self.assertEqual(lp.on_hold, True)
+        self.assertEqual(lp.tlim_interval, 2 * 3600)
@@ -0,0 +1,92 @@
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+import paho.mqtt.client as mqtt
+
+from src.mqtt_connector import MqttConnector
+from src.publish_tracker import LatencyHistogram, PublishTracker
+
+
+class TestPublishTracker(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 100.0
+        self.tracker = PublishTracker(2, clock=lambda: self.now)
+
+    def test_latency(self):
+        self.assertIsNone(self.tracker.sent(1, "a", "1", 1, self.now))
+        self.assertEqual((len(self.tracker), self.tracker.free), (1, 1))
+
+        self.now += 0.2
+        message = self.tracker.acked(1)
+        self.assertAlmostEqual(message.latency, 0.2)
+        self.assertEqual(self.tracker.free, 2)
+        self.assertIsNone(self.tracker.acked(1))  # duplicate
+
+        histogram = self.tracker.histograms()[1]
+        self.assertEqual(histogram.count, 1)
+        self.assertEqual(histogram.quantile(0.5), 0.25)
+
+    def test_acked_before_sent(self):
+        time_sent = self.now
+        self.now += 0.01
+        self.assertIsNone(self.tracker.acked(7))  # paho thread was faster than `publish` returned
+        message = self.tracker.sent(7, "a", "1", 0, time_sent)
+        self.assertAlmostEqual(message.latency, 0.01)
+        self.assertEqual(len(self.tracker), 0)
+
+    def test_wait_empty(self):
+        self.assertTrue(self.tracker.wait_empty(0))
+        self.tracker.sent(1, "a", "1", 1, self.now)
+        self.assertFalse(self.tracker.wait_empty(0.01))
+
+        threading.Timer(0.05, self.tracker.acked, [1]).start()
+        self.assertTrue(self.tracker.wait_empty(5))
+
+    def test_discard(self):
+        self.tracker.sent(1, "a", "1", 0, self.now, row_id=5)
+        self.tracker.sent(2, "a", "2", 1, self.now, row_id=6)
+        self.assertEqual(self.tracker.row_ids(), {5, 6})
+
+        discarded = self.tracker.discard(0)
+        self.assertEqual([m.mid for m in discarded], [1])
+        self.assertEqual((len(self.tracker), self.tracker.free), (1, 1))
+        self.assertEqual(self.tracker.row_ids(), {6})
+
+    def test_histogram(self):
+        histogram = LatencyHistogram()
+        self.assertIsNone(histogram.quantile(0.5))
+        for latency in [0.005] * 90 + [0.3] * 9 + [100]:
+            histogram.add(latency)
+        self.assertEqual(histogram.quantile(0.5), 0.01)
+        self.assertEqual(histogram.quantile(0.95), 0.5)
+        self.assertEqual(histogram.quantile(1), 100)  # overflow bucket
+        self.assertIn("100 acks", str(histogram))
+
+
+class TestMqttConnectorFlush(unittest.TestCase):
+
+    def setUp(self):
+        self.connector = MqttConnector()
+        self.connector._qos = 1
+        self.connector._open = True
+        self.connector._mqtt = MagicMock()
+        self.connector._mqtt.publish.return_value = MagicMock(mid=3, rc=mqtt.MQTT_ERR_SUCCESS)
+
+    def test_flush(self):
+        self.connector.publish("last", "state")
+        self.assertEqual(len(self.connector._tracker), 1)
+
+        with self.assertLogs("src.mqtt_connector", level="WARNING") as logs:
+            self.assertFalse(self.connector.flush(0.01))  # deadline bounded
+        self.assertIn("'state' not acknowledged", logs.output[0])
+
+        threading.Timer(0.05, self.connector._on_publish, [None, None, 3]).start()
+        self.assertTrue(self.connector.flush(5))
+
+    def test_qos0_not_sent(self):
+        self.connector._qos = 0
+        self.connector._mqtt.publish.return_value = MagicMock(mid=4, rc=mqtt.MQTT_ERR_NO_CONN)
+        self.connector.publish("lost", "state")
+        self.assertEqual(len(self.connector._tracker), 0)  # never acknowledged, doesn't block the window
@@ -17,3 +17,16 @@ class TestMeasurement(unittest.TestCase):
         r = Result(ResultState.OK, pm10=0.1, pm25=0.2, timestamp=now)
         m = r.create_message()
         self.assertEqual(m, '{"PM10": 0.1, "PM25": 0.2, "STATE": "OK", "TIMESTAMP": "2020-01-01T02:02:03+00:00"}')
+
+    def test_create_message_aggregated(self):
+        now = datetime.datetime(2020, 1, 1, 2, 2, 3, tzinfo=datetime.timezone.utc)
+
+        r = Result(ResultState.OK, pm10=0.1, pm25=0.2, timestamp=now)
+        r.samples, r.rejected = 3, 1
+        r.pm10_mean, r.pm10_min, r.pm10_max, r.pm10_stdev = 0.2, 0.1, 0.4, 0.12
+        r.pm25_mean, r.pm25_min, r.pm25_max, r.pm25_stdev = 0.3, 0.2, 0.5, 0.13
+        m = r.create_message()
+        self.assertEqual(m, '{"PM10": 0.1, "PM25": 0.2, "STATE": "OK", "TIMESTAMP": "2020-01-01T02:02:03+00:00", '
+                            '"SAMPLES": 3, "REJECTED": 1, "PM10_MEAN": 0.2, "PM10_MIN": 0.1, "PM10_MAX": 0.4, '
+                            '"PM10_STDEV": 0.12, "PM25_MEAN": 0.3, "PM25_MIN": 0.2, "PM25_MAX": 0.5, '
+                            '"PM25_STDEV": 0.13}')
@@ -0,0 +1,98 @@
+import unittest
+
+from src.result import ResultState
+from src.sample_window import SampleWindow
+
+
+class TestSampleWindow(unittest.TestCase):
+
+    def test_empty(self):
+        window = SampleWindow()
+
+        result = window.create_result()
+        self.assertEqual(result.state, ResultState.ERROR)
+        self.assertEqual(result.samples, 0)
+
+    def test_aggregate(self):
+        window = SampleWindow()
+        for pm25, pm10 in [(1.0, 2.0), (3.0, 4.0), (2.0, 100.0)]:
+            window.append(pm25=pm25, pm10=pm10)
+
+        result = window.create_result()
+        self.assertEqual(result.state, ResultState.OK)
+        self.assertEqual(result.samples, 3)
+
+        self.assertEqual(result.pm25, 2.0)  # median
+        self.assertEqual(result.pm25_mean, 2.0)
+        self.assertEqual(result.pm25_min, 1.0)
+        self.assertEqual(result.pm25_max, 3.0)
+
+        self.assertEqual(result.pm10, 4.0)  # median, not affected by the peak
+        self.assertEqual(result.pm10_mean, 35.33)
+        self.assertEqual(result.pm10_min, 2.0)
+        self.assertEqual(result.pm10_max, 100.0)
+
+    def test_bounded(self):
+        window = SampleWindow(max_samples=3)
+        for i in range(10):
+            window.append(pm25=i, pm10=i)
+
+        self.assertEqual(len(window), 3)
+        result = window.create_result()
+        self.assertEqual(result.pm10_min, 7)
+        self.assertEqual(result.pm10_max, 9)
+
+        window.resize(2)
+        self.assertEqual(len(window), 2)
+        self.assertEqual(window.create_result().pm10_min, 8)
+
+        window.clear()
+        self.assertEqual(len(window), 0)
+
+    def test_settled(self):
+        window = SampleWindow()
+        for value in [40, 25, 20.0, 20.5, 19.8]:
+            window.append(pm25=value, pm10=value * 2)
+        self.assertFalse(window.settled(count=6, tolerance=0.1))  # too few samples
+        self.assertFalse(window.settled(count=4, tolerance=0.1))  # still warming up (25)
+
+        window.append(pm25=20.2, pm10=40.5)
+        self.assertTrue(window.settled(count=4, tolerance=0.1))
+        self.assertFalse(window.settled(count=5, tolerance=0.1))
+
+        window.append(pm25=30, pm10=40)
+        self.assertFalse(window.settled(count=4, tolerance=0.1))  # PM2.5 jumped
+
+    def test_reject_outliers(self):
+        window = SampleWindow()
+        for pm25, pm10 in [(5.0, 10.0), (5.2, 10.3), (4.9, 9.8), (5.1, 10.1), (60.0, 95.0)]:
+            window.append(pm25=pm25, pm10=pm10)
+
+        result = window.create_result(reject_outliers=True)
+        self.assertEqual(result.state, ResultState.OK)
+        self.assertEqual(result.samples, 4)
+        self.assertEqual(result.rejected, 1)
+        self.assertEqual(result.pm10_max, 10.3)
+
+        result = window.create_result()  # default: keep all samples
+        self.assertEqual(result.samples, 5)
+        self.assertEqual(result.rejected, 0)
+        self.assertEqual(result.pm10_max, 95.0)
+
+    def test_reject_outliers_keeps_noise(self):
+        window = SampleWindow()
+        for pm25, pm10 in [(1.0, 2.0), (1.0, 2.0), (1.0, 2.0), (2.5, 3.5)]:  # MAD == 0, but within sensor noise
+            window.append(pm25=pm25, pm10=pm10)
+
+        result = window.create_result(reject_outliers=True)
+        self.assertEqual(result.samples, 4)
+        self.assertEqual(result.rejected, 0)
+
+    def test_reject_outliers_too_few_samples(self):
+        window = SampleWindow()
+        window.append(pm25=1.0, pm10=2.0)
+        window.append(pm25=100.0, pm10=200.0)
+
+        result = window.create_result(reject_outliers=True)
+        self.assertEqual(result.samples, 2)
+        self.assertEqual(result.rejected, 0)
@@ -0,0 +1,67 @@
+import os
+import threading
+import time
+import unittest
+
+from src.scheduler import Scheduler
+
+
+class TestScheduler(unittest.TestCase):
+
+    def test_wait_timeout(self):
+        scheduler = Scheduler()
+        time_start = scheduler.now()
+
+        self.assertEqual(scheduler.wait(0.05), False)
+        self.assertGreaterEqual(scheduler.now() - time_start, 0.05)
+        self.assertEqual(scheduler.wakeup_count, 1)
+
+        scheduler.close()
+
+    def test_wake_up_before_wait(self):
+        scheduler = Scheduler()
+
+        scheduler.wake_up()
+        scheduler.wake_up()  # merged
+        self.assertEqual(scheduler.wait(10), True)
+        self.assertEqual(scheduler.wait(0), False)
+
+        scheduler.close()
+
+    def test_wake_up_from_thread(self):
+        scheduler = Scheduler()
+        time_start = scheduler.now()
+
+        timer = threading.Timer(0.05, scheduler.wake_up)
+        timer.start()
+        self.assertEqual(scheduler.wait(10), True)
+        self.assertLess(scheduler.now() - time_start, 5)
+
+        timer.join()
+        scheduler.close()
+        scheduler.wake_up()  # ignored after close
+
+    def test_now_is_monotonic(self):
+        self.assertAlmostEqual(Scheduler.now(), time.monotonic(), delta=1)
+
+    def test_wake_up_closed_pipe(self):
+        scheduler = Scheduler()
+        pipe_write = scheduler._pipe_write
+        os.close(pipe_write)  # simulate a closed (or reused) file descriptor
+
+        scheduler.wake_up()  # no exception
+
+        os.close(scheduler._pipe_read)
+        scheduler._pipe_read, scheduler._pipe_write = None, None
+
+    def test_wait_for_fd(self):
+        scheduler = Scheduler()
+        pipe_read, pipe_write = os.pipe()
+
+        self.assertEqual(scheduler.wait(0, fds=[pipe_read]), False)
+        os.write(pipe_write, b"x")
+        self.assertEqual(scheduler.wait(10, fds=[pipe_read]), True)
+
+        os.close(pipe_read)
+        os.close(pipe_write)
+        scheduler.close()
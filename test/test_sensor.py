@@ -1,8 +1,12 @@
-import datetime
+import struct
 import unittest
+from unittest.mock import MagicMock, patch
 
-from src.result import Result, ResultState
-from src.sensor import Sensor
+from serial import SerialException
+
+from src.result import ResultState
+from src.sds011 import SDS011
+from src.sensor import Sensor, SensorError
 
 
 class TestSensor(unittest.TestCase):
@@ -19,3 +23,295 @@ class TestSensor(unittest.TestCase):
         self.assertEqual(Sensor.check_measurement(None, None), False)
         self.assertEqual(Sensor.check_measurement(None, 10), False)
         self.assertEqual(Sensor.check_measurement(10, None), False)
+
+    def test_measure_stream(self):
+        sensor = Sensor({"measure_mode": "stream"})
+        self.assertEqual(sensor.streaming, True)
+
+        sensor._sensor = MagicMock()
+        sensor._warmup = True
+
+        sensor.start_measuring()
+        sensor._sensor.flush_input.assert_called_once()
+
+        sensor._sensor.read_available.return_value = [(1.0, 2.0), (25.8, 0.1), (3.0, 4.0)]  # glitch is skipped
+        sensor.collect()
+        sensor._sensor.read_available.return_value = [(2.0, 3.0)]
+        result = sensor.measure()
+
+        self.assertEqual(result.state, ResultState.OK)
+        self.assertEqual(result.samples, 3)
+        self.assertEqual(result.pm25, 2.0)
+        self.assertEqual(result.pm10, 3.0)
+
+        sensor._sensor.read_available.return_value = []
+        result = sensor.measure()
+        self.assertEqual(result.state, ResultState.ERROR)
+        sensor._sensor = None
+
+    def test_collect_serial_error(self):
+        sensor = Sensor({"measure_mode": "stream", "abort_after_n_errors": 2})
+        sensor._sensor = MagicMock()
+        sensor._sensor.read_available.side_effect = SerialException("test")
+
+        sensor.collect()
+        self.assertEqual(sensor._error_ignored, 1)
+        with self.assertRaises(SensorError):
+            sensor.collect()
+        sensor._sensor = None
+
+    def test_stream_window_size(self):
+        sensor = Sensor({"measure_mode": "stream"})
+        sensor.start_measuring(300)
+        self.assertEqual(sensor._samples._samples.maxlen, 300 * Sensor.STREAM_FRAMES_PER_SECOND
+                         + Sensor.STREAM_EXTRA_FRAMES)
+
+    def test_warm_up_settled(self):
+        sensor = Sensor({"measure_mode": "stream"})
+        sensor._sensor = MagicMock()
+        sensor.warm_up()
+
+        sensor._sensor.read_available.return_value = [(60.0, 80.0), (30.0, 45.0), (21.0, 30.0)]
+        self.assertEqual(sensor.warm_up_settled(0.1), False)
+        sensor._sensor.read_available.return_value = [(20.0, 30.5), (20.5, 29.5), (20.1, 30.2), (20.3, 30.0)]
+        self.assertEqual(sensor.warm_up_settled(0.1), True)
+
+        sensor.start_measuring()  # warm up frames are discarded
+        self.assertEqual(len(sensor._samples), 0)
+        sensor._sensor = None
+
+    @classmethod
+    def create_burst_sensor(cls, measurements):
+        sensor = Sensor({"abort_after_n_errors": 5})
+        sensor._sensor = MagicMock()
+        sensor._sensor.query.side_effect = measurements
+        sensor._warmup = True
+        sensor.start_measuring()
+        for _ in measurements:
+            sensor.sample()
+        return sensor
+
+    def test_measure_burst_outlier(self):
+        sensor = self.create_burst_sensor([(5.0, 10.0), (5.2, 10.3), (80.0, 120.0), (4.9, 9.8)])
+
+        result = sensor.measure()
+        self.assertEqual(result.state, ResultState.OK)
+        self.assertEqual(result.samples, 3)
+        self.assertEqual(result.rejected, 1)
+        self.assertEqual(result.pm10, 10.0)
+        self.assertIn('"REJECTED": 1', result.create_message())
+        self.assertEqual(sensor._error_ignored, 0)
+        sensor._sensor = None
+
+    def test_measure_burst_single_bad_sample(self):
+        sensor = self.create_burst_sensor([(5.0, 10.0), (25.8, 0.1), (5.1, 10.1)])
+        sensor._error_ignored = 2
+
+        result = sensor.measure()
+        self.assertEqual(result.state, ResultState.OK)
+        self.assertEqual(result.samples, 2)
+        self.assertEqual(sensor._error_ignored, 0)
+        sensor._sensor = None
+
+    def test_measure_burst_mostly_failing(self):
+        sensor = self.create_burst_sensor([(5.0, 10.0), None, (25.8, 0.1), SerialException("test")])
+
+        result = sensor.measure()
+        self.assertEqual(result.state, ResultState.ERROR)
+        self.assertEqual(result.pm10, None)
+        self.assertEqual(result.pm25, None)
+        self.assertEqual(sensor._error_ignored, 1)  # the whole burst counts as one error
+        sensor._sensor = None
+
+    def test_measure_burst_abort(self):
+        sensor = self.create_burst_sensor([None, None])
+        sensor._error_ignored = 4
+
+        with self.assertRaises(SensorError):
+            sensor.measure()
+        sensor._sensor = None
+
+
+class TestSensorSession(unittest.TestCase):
+
+    @classmethod
+    def create_sensor(cls, config=None):
+        sensor = Sensor(config or {})
+        sds011_class = MagicMock()
+        sds011_class.return_value.get_report_mode.return_value = False  # query mode
+        sds011_class.return_value.get_work_period.return_value = 0  # continuous
+        sds011_class.return_value.query.return_value = (1.0, 2.0)
+        return sensor, sds011_class
+
+    def test_keep_open(self):
+        sensor, sds011_class = self.create_sensor()
+        sds011 = sds011_class.return_value
+
+        with patch("src.sensor.SDS011", sds011_class):
+            for _ in range(3):
+                sensor.open(warm_up=True)
+                self.assertEqual(sensor.measure().state, ResultState.OK)
+                sensor.close(sleep=True)
+
+        self.assertEqual(sds011_class.call_count, 1)
+        sds011.open.assert_called_once_with(set_report_mode=False)
+        self.assertEqual(sds011.get_report_mode.call_count, 1)  # verified once per session
+        sds011.set_report_mode.assert_not_called()
+        self.assertEqual(sds011.sleep.call_count, 6)  # work + sleep per cycle
+        sds011.close.assert_not_called()
+
+        sensor.disconnect()
+        sds011.close.assert_called_once()
+
+    def test_report_mode_corrected(self):
+        sensor, sds011_class = self.create_sensor({"measure_mode": "stream"})
+        sds011 = sds011_class.return_value
+        sds011.get_report_mode.side_effect = [False, True]
+
+        with patch("src.sensor.SDS011", sds011_class):
+            sensor.open(warm_up=True)
+
+        sds011.set_report_mode.assert_called_once_with(active=True)
+        self.assertEqual(sensor._report_mode_verified, True)
+        sensor.disconnect()
+
+    def test_work_period_reset(self):
+        sensor, sds011_class = self.create_sensor({"measure_mode": "stream"})
+        sds011 = sds011_class.return_value
+        sds011.get_report_mode.return_value = True
+        sds011.get_work_period.side_effect = [5, 0]  # left over from work period mode (flash)
+
+        with patch("src.sensor.SDS011", sds011_class):
+            sensor.open(warm_up=True)
+            sensor.open(warm_up=True)
+
+        sds011.set_work_period.assert_called_once_with(work_time=0)
+        self.assertEqual(sds011.get_work_period.call_count, 2)  # once per session
+        self.assertEqual(sensor._work_period_verified, True)
+        sensor.disconnect()
+
+    def test_reopen_after_error(self):
+        sensor, sds011_class = self.create_sensor()
+        sds011 = sds011_class.return_value
+
+        with patch("src.sensor.SDS011", sds011_class):
+            sensor.open(warm_up=True)
+            sds011.query.side_effect = SerialException("test")
+            self.assertEqual(sensor.measure().state, ResultState.ERROR)
+            sds011.close.assert_called_once()
+
+            sds011.query.side_effect = None
+            sensor.open(warm_up=True)
+            self.assertEqual(sensor.measure().state, ResultState.OK)
+
+        self.assertEqual(sds011_class.call_count, 2)
+        self.assertEqual(sds011.get_report_mode.call_count, 2)  # new session => verified again
+        sensor.disconnect()
+
+    def test_work_period(self):
+        sensor, sds011_class = self.create_sensor({"measure_mode": "work_period", "work_period": 5})
+        sds011 = sds011_class.return_value
+        sds011.get_report_mode.return_value = True
+        sds011.get_work_period.side_effect = [0, 5]
+        self.assertEqual(sensor.work_period, 5)
+
+        with patch("src.sensor.SDS011", sds011_class):
+            sensor.start_work_period()
+            sensor.start_work_period()  # programmed once per session
+
+        sds011_class.assert_called_once_with(None, use_query_mode=False, capture=None)
+        sds011.set_work_period.assert_called_once_with(work_time=5)
+
+        sds011.read_available.return_value = [(1.0, 2.0), (25.8, 0.1)]
+        results = sensor.read_reports()
+        self.assertEqual([r.state for r in results], [ResultState.OK, ResultState.ERROR])
+        self.assertEqual(sensor._error_ignored, 1)
+
+        self.assertEqual(sensor.report_missing().state, ResultState.ERROR)
+        self.assertEqual(sensor._work_period_verified, False)
+        sensor.disconnect()
+
+    def test_work_period_invalid(self):
+        with self.assertRaises(ValueError):
+            Sensor({"measure_mode": "work_period", "work_period": 31})
+
+    def test_no_keep_open(self):
+        sensor, sds011_class = self.create_sensor({"serial_keep_open": False})
+        sds011 = sds011_class.return_value
+
+        with patch("src.sensor.SDS011", sds011_class):
+            sensor.open(warm_up=True)
+            sensor.close(sleep=True)
+
+        sds011.open.assert_called_once_with(set_report_mode=True)
+        sds011.get_report_mode.assert_not_called()
+        sds011.close.assert_called_once()
+
+
+class TestSDS011(unittest.TestCase):
+
+    @classmethod
+    def create_frame(cls, pm25, pm10):
+        data = struct.pack('<HH', int(pm25 * 10), int(pm10 * 10)) + b'\xab\xcd'
+        return SDS011.HEAD + SDS011.DATA_CMD + data + bytes([sum(data) % 256]) + SDS011.TAIL
+
+    def test_prepare_frame(self):
+        frame = self.create_frame(12.3, 45.6)
+        self.assertEqual(SDS011.prepare_frame(frame), (12.3, 45.6))
+
+        broken = frame[:8] + bytes([(frame[8] + 1) % 256]) + frame[9:]
+        self.assertEqual(SDS011.prepare_frame(broken), None)
+        self.assertEqual(SDS011.prepare_frame(frame[:9]), None)
+
+    def test_read_available(self):
+        received = bytearray(b'\x01\xaa\x02' + self.create_frame(1.0, 2.0) + self.create_frame(3.0, 4.0)[:6])
+
+        def read(size):
+            data = bytes(received[:size])
+            del received[:size]
+            return data
+
+        serial = MagicMock()
+        type(serial).in_waiting = property(lambda _self: len(received))
+        serial.read = read
+
+        sds011 = SDS011("/dev/null")
+        sds011._serial = serial
+
+        self.assertEqual(sds011.read_available(), [(1.0, 2.0)])  # junk skipped, partial frame kept
+        self.assertEqual(sds011.read_available(), [])
+
+        received += self.create_frame(3.0, 4.0)[6:]
+        self.assertEqual(sds011.read_available(), [(3.0, 4.0)])
+
+    @classmethod
+    def create_serial(cls, received):
+        def read(size):
+            data = bytes(received[:size])
+            del received[:size]
+            return data
+
+        serial = MagicMock()
+        type(serial).in_waiting = property(lambda _self: len(received))
+        serial.read = read
+        return serial
+
+    def test_reply_resync(self):
+        reply = SDS011.HEAD + SDS011.REPLY_CMD + b'\x02\x00\x00\x00\xff\xff\x00' + SDS011.TAIL  # active
+        other_reply = SDS011.HEAD + SDS011.REPLY_CMD + b'\x06\x00\x00\x00\xff\xff\x04' + SDS011.TAIL
+        received = bytearray(b'\x17' + self.create_frame(1.0, 2.0) + other_reply + reply)
+
+        sds011 = SDS011("/dev/null", timeout=0)
+        sds011._serial = self.create_serial(received)
+
+        self.assertEqual(sds011.get_report_mode(), True)  # stray byte and uncorrelated frames skipped
+        self.assertEqual(sds011.read_available(), [(1.0, 2.0)])  # data frame was queued
+
+    def test_reply_timeout(self):
+        received = bytearray(self.create_frame(1.0, 2.0))
+
+        sds011 = SDS011("/dev/null", timeout=0)
+        sds011._serial = self.create_serial(received)
+
+        self.assertEqual(sds011.get_work_period(), None)
+        self.assertEqual(sds011.read(), (1.0, 2.0))
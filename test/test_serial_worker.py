@@ -0,0 +1,45 @@
+import threading
+import unittest
+
+from src.serial_worker import SerialWorker
+
+
+class TestSerialWorker(unittest.TestCase):
+
+    def test_submit(self):
+        notified = threading.Event()
+        worker = SerialWorker(notify_callback=notified.set)
+
+        future = worker.submit(lambda a, b: a + b, 1, b=2)
+        self.assertEqual(future.result(timeout=2), 3)
+        self.assertTrue(notified.wait(2))
+
+        self.assertTrue(worker.stop(2))
+        self.assertFalse(worker.alive)
+        with self.assertRaises(RuntimeError):
+            worker.submit(print)
+
+    def test_exception(self):
+        worker = SerialWorker()
+
+        def fail():
+            raise ValueError("broken")
+
+        future = worker.submit(fail)
+        with self.assertRaises(ValueError):
+            future.result(timeout=2)
+        self.assertTrue(worker.stop(2))
+
+    def test_busy(self):
+        release = threading.Event()
+        worker = SerialWorker()
+        self.assertFalse(worker.busy)
+
+        future = worker.submit(release.wait, 2)
+        self.assertTrue(worker.busy)
+        self.assertFalse(worker.stop(0.01))  # job is hanging
+
+        release.set()
+        self.assertTrue(future.result(timeout=2))
+        self.assertTrue(worker.stop(2))
+        self.assertFalse(worker.busy)
@@ -1,8 +1,9 @@
 import json
 import unittest
+from unittest import mock
 
 from src.config_key import ConfigKey
-from src.subscription import RangeSubscription, OnHoldSubscription
+from src.subscription import RangeSubscription, OnHoldSubscription, SubscriptionIndex, TriggerSubscription
 
 
 class TestRangeSubscription(unittest.TestCase):
@@ -114,3 +115,90 @@ class TestOnHoldSubscription(unittest.TestCase):
 
         s.extract(" true ")
         self.assertEqual(s.verify(), False)
+
+
+class TestTriggerSubscription(unittest.TestCase):
+
+    def test_requests_merged(self):
+        s = TriggerSubscription(ConfigKey.MQTT_CHANNEL_IN_TRIGGER)
+        s.config("trigger")
+        self.assertEqual(s.take_request(), False)
+
+        s.extract("")
+        s.extract("now")
+        self.assertEqual(s.verify(), True)
+        self.assertEqual(s.take_request(), True)
+        self.assertEqual(s.take_request(), False)
+
+
+class TestSubscriptionIndex(unittest.TestCase):
+
+    def test_shared_topic_parsed_once(self):
+        temp = RangeSubscription(ConfigKey.MQTT_CHANNEL_IN_TEMP)
+        temp.config(("weather", "outdoor", "temp"))
+        humi = RangeSubscription(ConfigKey.MQTT_CHANNEL_IN_HUMI)
+        humi.config(("weather", "outdoor", "humi"))
+        hold = OnHoldSubscription(ConfigKey.MQTT_CHANNEL_IN_HOLD)
+        hold.config("hold")
+        index = SubscriptionIndex([temp, humi, hold, TriggerSubscription(ConfigKey.MQTT_CHANNEL_IN_TRIGGER)])
+
+        self.assertEqual(index.topics, ["weather", "hold"])
+        self.assertEqual(index.subscriptions("other"), [])
+
+        subscriptions = index.subscriptions("weather")
+        self.assertEqual(subscriptions, [temp, humi])
+        payload = json.dumps({"outdoor": {"temp": 21.5, "humi": 60}}).encode()
+        with mock.patch("src.subscription.json.loads", side_effect=json.loads) as loads:
+            SubscriptionIndex.extract(subscriptions, "weather", payload)
+        self.assertEqual(loads.call_count, 1)
+        self.assertEqual((temp.value, humi.value), (21.5, 60))
+
+        SubscriptionIndex.extract(subscriptions, "weather", b"[1, 2]")
+        self.assertEqual((temp.value, humi.value), (None, None))
+        self.assertIsNotNone(temp.extract_error)
+
+    def test_wildcard_aggregate(self):
+        windows = OnHoldSubscription(ConfigKey.MQTT_CHANNEL_IN_HOLD)
+        windows.config("house/+/window")
+        self.assertEqual(windows.aggregate, OnHoldSubscription.AGGREGATE_ANY)
+        self.assertTrue(windows.matches_topic("house/bath/window"))
+        index = SubscriptionIndex([windows])
+
+        def receive(topic, payload):
+            SubscriptionIndex.extract(index.subscriptions(topic), topic, payload)
+
+        receive("house/bath/window", b"false")
+        receive("house/kitchen/window", b"true")  # any window open => hold
+        receive("house/kitchen/door", b"true")  # not matched
+        self.assertEqual(windows.verify(), False)
+        windows.aggregate = OnHoldSubscription.AGGREGATE_ALL
+        self.assertEqual(windows.verify(), True)
+        receive("house/bath/window", b"true")
+        self.assertEqual(windows.verify(), False)
+
+        receive("house/bath/window", b"false")
+        windows.aggregate = OnHoldSubscription.AGGREGATE_ANY
+        self.assertEqual(windows.verify(), False)
+        receive("house/kitchen/window", b"false")
+        self.assertEqual(windows.verify(), True)
+
+        receive("house/bath/window", b"true")
+        receive("house/bath/window", b"")  # cleared (retained message deleted)
+        self.assertEqual(list(windows.values), ["house/kitchen/window"])
+        self.assertEqual(windows.verify(), True)
+        receive("house/kitchen/window", b"")
+        self.assertEqual((windows.values, windows.value), ({}, None))
+
+    def test_config_dict(self):
+        temp = RangeSubscription(ConfigKey.MQTT_CHANNEL_IN_TEMP)
+        temp.config({"topic": "weather/+", "attribute": "temp", "aggregate": "all"})
+        self.assertEqual((temp.attribute, temp.aggregate), (("temp",), "all"))
+        temp.set_range((-20, 40))
+        index = SubscriptionIndex([temp])
+        SubscriptionIndex.extract(index.subscriptions("weather/north"), "weather/north", '{"temp": 50}')
+        SubscriptionIndex.extract(index.subscriptions("weather/south"), "weather/south", '{"temp": 20}')
+        self.assertEqual(temp.verify(), True)  # not all out of range
+
+        for invalid in [{"topic": "a/#/b"}, {"topic": "a", "aggregate": "most"}]:
+            with self.assertRaises(ValueError):
+                RangeSubscription(ConfigKey.MQTT_CHANNEL_IN_TEMP).config(invalid)
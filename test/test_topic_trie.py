@@ -0,0 +1,34 @@
+import unittest
+
+from src.topic_trie import TopicTrie
+
+
+class TestTopicTrie(unittest.TestCase):
+
+    def setUp(self):
+        self.trie = TopicTrie()
+        for topic_filter in ["house/+/window", "house/#", "house/kitchen/window", "+/+/+", "#", "house/+"]:
+            self.trie.add(topic_filter, topic_filter)
+
+    def test_match(self):
+        self.assertEqual(self.trie.match("house/kitchen/window"),
+                         ["house/+/window", "house/#", "house/kitchen/window", "+/+/+", "#"])  # order of adding
+        self.assertEqual(self.trie.match("house"), ["house/#", "#"])  # "#" includes the parent level
+        self.assertEqual(self.trie.match("house/garage"), ["house/#", "#", "house/+"])
+        self.assertEqual(self.trie.match("garden/pond/level"), ["+/+/+", "#"])
+        self.assertEqual(self.trie.match("$SYS/broker/load"), [])  # wildcards don't match the first level
+
+    def test_empty_levels(self):
+        trie = TopicTrie()
+        trie.add("a/+/c", 1)
+        self.assertEqual(trie.match("a//c"), [1])
+        self.assertEqual(trie.match("a/c"), [])
+
+    def test_invalid(self):
+        for topic_filter in ["", "a/#/b", "a/b#", "a+/b"]:
+            with self.assertRaises(ValueError):
+                TopicTrie().add(topic_filter, 1)
+
+    def test_matches(self):
+        self.assertTrue(TopicTrie.matches("house/+/window", "house/bath/window"))
+        self.assertFalse(TopicTrie.matches("house/+/window", "house/bath/door"))